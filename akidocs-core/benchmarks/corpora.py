@@ -0,0 +1,72 @@
+"""Synthetic Markdown corpora for benchmarks, each generated at a given size."""
+
+from collections.abc import Callable
+
+PROSE_WORDS = (
+    "Lorem ipsum dolor sit amet, consectetur adipiscing elit, sed do eiusmod "
+    "tempor incididunt ut labore et dolore magna aliqua. Ut enim ad minim "
+    "veniam, quis nostrud exercitation ullamco laboris nisi ut aliquip ex ea "
+    "commodo consequat. "
+)
+
+
+def _repeat_to(unit: str, size: int) -> str:
+    repeats = size // len(unit) + 1
+    return (unit * repeats)[:size]
+
+
+def plain_prose(size: int) -> str:
+    """Single paragraph of plain prose, size characters long."""
+    return _repeat_to(PROSE_WORDS, size)
+
+
+def prose(size: int) -> str:
+    """Paragraphs of plain prose, separated by blank lines."""
+    return _repeat_to(PROSE_WORDS * 4 + "\n\n", size)
+
+
+def emphasis(size: int) -> str:
+    """Paragraphs of bold, italic and code spans nested inside each other."""
+    unit = (
+        "Some ***bold italic*** and **bold with *italic* inside** then "
+        "*italic with **bold *and italic* inside** again* and `code *not "
+        "styled*` in **bold `code` bold**.\n\n"
+    )
+    return _repeat_to(unit, size)
+
+
+def unmatched(size: int) -> str:
+    """Paragraphs of alternating unmatched ** and * runs.
+
+    Worst case for closer search, exponential in the old recursive engine.
+    """
+    unit = "**a * " * 40 + "\n\n"
+    return _repeat_to(unit, size)
+
+
+def headers(size: int) -> str:
+    """Thousands of short headers of all levels, without paragraphs."""
+    lines = []
+    length = 0
+    number = 0
+    while length < size:
+        line = f"{'#' * (number % 6 + 1)} Header number {number}\n"
+        lines.append(line)
+        length += len(line)
+        number += 1
+    return "".join(lines)[:size]
+
+
+def long_paragraph(size: int) -> str:
+    """One paragraph of size characters, with soft and hard line breaks."""
+    unit = PROSE_WORDS.rstrip() + "\n" + PROSE_WORDS.rstrip() + "  \n"
+    return _repeat_to(unit, size).rstrip()
+
+
+CORPORA: dict[str, Callable[[int], str]] = {
+    "prose": prose,
+    "emphasis": emphasis,
+    "unmatched": unmatched,
+    "headers": headers,
+    "long_paragraph": long_paragraph,
+}
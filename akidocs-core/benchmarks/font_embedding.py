@@ -0,0 +1,83 @@
+"""Size and time per document with a TrueType font, by way of embedding.
+
+Compares embedding the whole font, the subset of glyphs used with the font
+parsed for every document (FPDF.add_font), and the subset with the font
+parsed once per process (font_files.add_font).
+
+Run from akidocs-core: uv run python -m benchmarks.font_embedding FONT.ttf
+"""
+
+import argparse
+import dataclasses
+import time
+from collections.abc import Callable
+from pathlib import Path
+
+from fpdf import FPDF
+
+from akidocs_core import font_files
+from akidocs_core.renderer import render_pdf
+from akidocs_core.style_base import FontFile
+from akidocs_core.styles import GENERIC
+from akidocs_core.tokenizer import tokenize
+from benchmarks.corpora import prose
+
+AddFont = Callable[[FPDF, str, str, Path], None]
+
+
+def _add_font_per_document(pdf: FPDF, family: str, style: str, path: Path) -> None:
+    pdf.add_font(family, style, str(path))
+
+
+def _add_full_font(pdf: FPDF, family: str, style: str, path: Path) -> None:
+    pdf.add_font(family, style, str(path))
+    font = pdf.fonts[family.lower() + style]
+    # Subset keeps every glyph of the font
+    font.subset.get_all_glyph_names = font.ttfont.getGlyphOrder
+
+
+MODES: dict[str, AddFont] = {
+    "full embed": _add_full_font,
+    "subset, parse per document": _add_font_per_document,
+    "subset, parse once": font_files.add_font,
+}
+
+
+def measure(tokens, style, add_font: AddFont, repeats: int) -> tuple[float, int]:
+    """Mean seconds per document and PDF size in bytes."""
+    original = font_files.add_font
+    font_files.add_font = add_font
+    try:
+        font_files.clear()
+        # First document parses the font in every mode
+        size = len(render_pdf(tokens, style))
+        start = time.perf_counter()
+        for _ in range(repeats):
+            render_pdf(tokens, style)
+        return (time.perf_counter() - start) / repeats, size
+    finally:
+        font_files.add_font = original
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("font", type=Path, help="TrueType font file")
+    parser.add_argument("--repeats", type=int, default=20)
+    args = parser.parse_args(argv)
+
+    style = dataclasses.replace(
+        GENERIC, font_family="Body", font_files=(FontFile("Body", args.font),)
+    )
+    print(f"{args.font.name}: {args.font.stat().st_size} bytes")
+    for size in (500, 5_000, 50_000):
+        tokens = tokenize(prose(size))
+        for mode, add_font in MODES.items():
+            seconds, pdf_bytes = measure(tokens, style, add_font, args.repeats)
+            print(
+                f"{size:>7} chars  {mode:<27} {seconds * 1000:8.1f} ms"
+                f"  {pdf_bytes:>9} bytes"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,30 @@
+"""Inline tokenizer throughput on plain prose, in MB/s.
+
+Run from akidocs-core: uv run python -m benchmarks.inline_throughput
+"""
+
+import time
+
+from akidocs_core.inline_tokenizer import INLINE_ENGINES, tokenize_inline
+from benchmarks.corpora import plain_prose
+
+
+def measure(text: str, engine: str, repeats: int = 5) -> float:
+    """Best throughput over repeats, in MB/s of UTF-8 input."""
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        tokenize_inline(text, engine=engine)
+        best = min(best, time.perf_counter() - start)
+    return len(text.encode("utf-8")) / best / 1_000_000
+
+
+def main() -> None:
+    for size in (10_000, 100_000, 1_000_000):
+        text = plain_prose(size)
+        for engine in INLINE_ENGINES:
+            print(f"{engine:>9}  {size:>9} chars  {measure(text, engine):8.2f} MB/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+"""Speedup of rendering a long document in parallel worker processes.
+
+Run from akidocs-core: uv run python -m benchmarks.parallel_render
+"""
+
+import os
+import time
+
+from akidocs_core.renderer import render_pdf
+from akidocs_core.styles import GENERIC
+from akidocs_core.tokenizer import tokenize
+from benchmarks.corpora import prose
+
+
+def measure(tokens, jobs: int, repeats: int = 3) -> float:
+    """Best seconds over repeats to render tokens with jobs."""
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        render_pdf(tokens, GENERIC, jobs)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main() -> None:
+    cores = os.process_cpu_count() or 1
+    print(f"{cores} CPU cores")
+    for size in (300_000, 1_000_000):
+        tokens = tokenize(prose(size))
+        serial = measure(tokens, 1)
+        print(f"{size:>9} chars  jobs  1  {serial:7.2f} s")
+        for jobs in sorted({2, 4, cores} - {1}):
+            seconds = measure(tokens, jobs)
+            print(
+                f"{size:>9} chars  jobs {jobs:>2}  {seconds:7.2f} s"
+                f"  {serial / seconds:5.2f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
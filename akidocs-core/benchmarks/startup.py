@@ -0,0 +1,63 @@
+"""CLI startup time: import time of akidocs_core.cli, and wall time of commands
+that convert nothing, each in a fresh interpreter.
+
+Run from akidocs-core: uv run python -m benchmarks.startup
+"""
+
+import subprocess
+import sys
+import time
+
+# Commands that should never import fpdf
+STARTUP_COMMANDS = {
+    "help": ["--help"],
+    "version": ["--version"],
+}
+
+
+def import_time(module: str) -> float:
+    """Cumulative import time of module in seconds, from python -X importtime."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    # Lines are "import time: self [us] | cumulative | imported package"
+    for line in result.stderr.splitlines():
+        fields = line.removeprefix("import time:").split("|")
+        if len(fields) == 3 and fields[2].strip() == module:
+            return int(fields[1]) / 1_000_000
+    raise ValueError(f"{module} not found in -X importtime output")
+
+
+def command_time(args: list[str]) -> float:
+    """Wall time in seconds of python -m akidocs_core with args."""
+    start = time.perf_counter()
+    subprocess.run(
+        [sys.executable, "-m", "akidocs_core", *args],
+        capture_output=True,
+        check=True,
+    )
+    return time.perf_counter() - start
+
+
+def run_startup(repeats: int = 5) -> dict[str, float]:
+    """Best of repeats for each startup benchmark, keyed as startup/name."""
+    results = {
+        "startup/import_cli": min(
+            import_time("akidocs_core.cli") for _ in range(repeats)
+        )
+    }
+    for name, args in STARTUP_COMMANDS.items():
+        results[f"startup/{name}"] = min(command_time(args) for _ in range(repeats))
+    return results
+
+
+def main() -> None:
+    for key, seconds in run_startup().items():
+        print(f"{key:<24} {seconds * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
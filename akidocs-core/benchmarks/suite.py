@@ -0,0 +1,203 @@
+"""Benchmark suite timing tokenize, tokenize_inline and render_pdf per corpus.
+
+Every stage is timed separately on each corpus in benchmarks.corpora, and
+render_pdf once per style in STYLES, followed by CLI startup benchmarks
+from benchmarks.startup. Results can be saved as JSON and compared against
+an earlier run to spot regressions between commits.
+
+Run from akidocs-core:
+    uv run python -m benchmarks.suite --output before.json
+    uv run python -m benchmarks.suite --compare before.json
+"""
+
+import argparse
+import gc
+import json
+import platform
+import subprocess
+import sys
+import time
+from collections.abc import Callable
+from datetime import UTC, datetime
+from importlib.metadata import version
+from pathlib import Path
+
+from akidocs_core.inline_tokenizer import tokenize_inline
+from akidocs_core.renderer import render_pdf
+from akidocs_core.styles import STYLES
+from akidocs_core.tokenizer import iter_blocks, tokenize
+from benchmarks.corpora import CORPORA
+from benchmarks.startup import run_startup
+
+DEFAULT_SIZE = 20_000
+DEFAULT_REPEATS = 3
+DEFAULT_THRESHOLD = 0.10
+
+
+def best_time(func: Callable[[], object], repeats: int) -> float:
+    """Fastest of repeats calls to func in seconds, with GC paused as in timeit."""
+    best = float("inf")
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(repeats):
+            start = time.perf_counter()
+            func()
+            best = min(best, time.perf_counter() - start)
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+    return best
+
+
+def _inline_sources(text: str) -> list[str]:
+    return [source for _, source in iter_blocks(text.replace("\r\n", "\n").split("\n"))]
+
+
+def _tokenize_inline_all(sources: list[str]) -> None:
+    for source in sources:
+        tokenize_inline(source)
+
+
+def _git_commit() -> str | None:
+    try:
+        result = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+        )
+    except OSError:
+        # git not installed
+        return None
+    # Not run from a git checkout
+    if result.returncode != 0:
+        return None
+    return result.stdout.strip()
+
+
+def run_suite(
+    size: int = DEFAULT_SIZE,
+    repeats: int = DEFAULT_REPEATS,
+    corpora: dict[str, Callable[[int], str]] = CORPORA,
+    startup: bool = True,
+) -> dict:
+    """Time every stage on every corpus, returning JSON-ready results.
+
+    Results are keyed as corpus/stage, or corpus/render_pdf/style for
+    rendering, and startup/name for startup, with the best time in seconds.
+    """
+    # Style aliases share one Style, time each only once
+    styles = {style.name: style for style in STYLES.values()}
+
+    results: dict[str, float] = {}
+    for corpus_name, generate in corpora.items():
+        text = generate(size)
+        sources = _inline_sources(text)
+        tokens = tokenize(text)
+
+        results[f"{corpus_name}/tokenize"] = best_time(lambda: tokenize(text), repeats)
+        results[f"{corpus_name}/tokenize_inline"] = best_time(
+            lambda: _tokenize_inline_all(sources), repeats
+        )
+        for style_name, style in styles.items():
+            results[f"{corpus_name}/render_pdf/{style_name}"] = best_time(
+                lambda: render_pdf(tokens, style), repeats
+            )
+
+    if startup:
+        results.update(run_startup(repeats))
+
+    return {
+        "meta": {
+            "akidocs_core": version("akidocs-core"),
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "date": datetime.now(UTC).isoformat(timespec="seconds"),
+            "size": size,
+            "repeats": repeats,
+        },
+        "results": results,
+    }
+
+
+def compare(
+    baseline: dict, current: dict, threshold: float = DEFAULT_THRESHOLD
+) -> tuple[list[str], list[str]]:
+    """Compare results of two runs, returning report lines and regressed keys.
+
+    A benchmark regresses when it takes more than threshold (as a fraction)
+    longer than in baseline. Benchmarks missing from either run are skipped.
+    """
+    lines = []
+    regressions = []
+    for key, seconds in current["results"].items():
+        before = baseline["results"].get(key)
+        if before is None:
+            continue
+        change = seconds / before - 1 if before else 0.0
+        marker = ""
+        if change > threshold:
+            marker = "  REGRESSION"
+            regressions.append(key)
+        lines.append(
+            f"{key:<40} {before * 1000:10.2f} ms {seconds * 1000:10.2f} ms "
+            f"{change:+8.1%}{marker}"
+        )
+    return lines, regressions
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks.suite", description=__doc__.splitlines()[0]
+    )
+    parser.add_argument(
+        "--size",
+        type=int,
+        default=DEFAULT_SIZE,
+        help="Characters per corpus (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--repeats",
+        type=int,
+        default=DEFAULT_REPEATS,
+        help="Runs per benchmark, fastest is kept (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--no-startup",
+        action="store_true",
+        help="Skip CLI startup benchmarks",
+    )
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    parser.add_argument(
+        "--compare", help="Compare against results JSON of an earlier run"
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=DEFAULT_THRESHOLD,
+        help="Slowdown counted as regression, as a fraction (default: %(default)s)",
+    )
+    args = parser.parse_args(argv)
+
+    current = run_suite(args.size, args.repeats, startup=not args.no_startup)
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(current, indent=2) + "\n")
+
+    if not args.compare:
+        for key, seconds in current["results"].items():
+            print(f"{key:<40} {seconds * 1000:10.2f} ms")
+        return 0
+
+    baseline = json.loads(Path(args.compare).read_text())
+    lines, regressions = compare(baseline, current, args.threshold)
+    print("\n".join(lines))
+    if regressions:
+        print(f"{len(regressions)} regressed by more than {args.threshold:.0%}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
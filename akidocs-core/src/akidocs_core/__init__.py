@@ -1 +1,2 @@
-# empty
+# Same as version in pyproject.toml, checked by test_cli
+__version__ = "0.4.0.dev0"
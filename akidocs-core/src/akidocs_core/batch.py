@@ -0,0 +1,179 @@
+import time
+from collections.abc import Iterator
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+from dataclasses import dataclass
+from pathlib import Path
+
+from akidocs_core.cache import BuildCache
+from akidocs_core.convert import convert_file
+from akidocs_core.inline_cache import CacheUpdates, InlineCache, set_active, using
+from akidocs_core.style_base import Style
+from akidocs_core.styles import STYLES
+
+MARKDOWN_SUFFIXES = (".md", ".markdown")
+
+
+class BatchError(Exception):
+    """Batch inputs cannot be turned into a valid list of jobs."""
+
+
+@dataclass
+class BatchJob:
+    input_path: Path
+    output_path: Path
+
+
+@dataclass
+class BatchResult:
+    job: BatchJob
+    seconds: float
+    error: str | None = None
+    cached: bool = False
+    # Inline cache entries and stats from a worker process, merged by run_jobs
+    inline_updates: CacheUpdates | None = None
+
+
+def _markdown_files(directory: Path) -> Iterator[Path]:
+    for path in sorted(directory.rglob("*")):
+        if path.is_file() and path.suffix.lower() in MARKDOWN_SUFFIXES:
+            yield path
+
+
+def collect_jobs(inputs: list[Path], output_dir: Path) -> list[BatchJob]:
+    """Name outputs for input files and directories.
+
+    A file becomes output_dir/<stem>.pdf. Markdown files found in a directory
+    keep their path relative to it, so dir/a/b.md becomes output_dir/a/b.pdf.
+    """
+    jobs: list[BatchJob] = []
+    for input_path in inputs:
+        if input_path.is_dir():
+            for path in _markdown_files(input_path):
+                relative = path.relative_to(input_path).with_suffix(".pdf")
+                jobs.append(BatchJob(path, output_dir / relative))
+        else:
+            jobs.append(BatchJob(input_path, output_dir / f"{input_path.stem}.pdf"))
+    _check_unique_outputs(jobs)
+    return jobs
+
+
+def read_manifest(manifest_path: Path, output_dir: Path | None) -> list[BatchJob]:
+    """Read jobs from manifest, one input per line, optionally TAB and output.
+
+    Blank lines and lines starting with # are ignored. Relative paths are
+    relative to the manifest. Lines without output are named as in
+    collect_jobs, or placed next to their input when output_dir is None.
+    """
+    base_dir = manifest_path.parent
+    jobs: list[BatchJob] = []
+    for line_number, line in enumerate(
+        manifest_path.read_text(encoding="utf-8").splitlines(), start=1
+    ):
+        if not line.strip() or line.lstrip().startswith("#"):
+            continue
+        fields = line.split("\t")
+        if len(fields) > 2:
+            raise BatchError(
+                f"{manifest_path}:{line_number}: expected input and optional output"
+            )
+        input_path = base_dir / fields[0].strip()
+        if len(fields) == 2:
+            jobs.append(BatchJob(input_path, base_dir / fields[1].strip()))
+        elif output_dir is not None:
+            jobs.extend(collect_jobs([input_path], output_dir))
+        else:
+            jobs.append(BatchJob(input_path, input_path.with_suffix(".pdf")))
+    _check_unique_outputs(jobs)
+    return jobs
+
+
+def _check_unique_outputs(jobs: list[BatchJob]) -> None:
+    seen: dict[Path, Path] = {}
+    for job in jobs:
+        key = job.output_path.resolve()
+        if key in seen:
+            raise BatchError(
+                f"{seen[key]} and {job.input_path} would both write {job.output_path}"
+            )
+        seen[key] = job.input_path
+
+
+def convert_job(
+    job: BatchJob, style: Style, cache: BuildCache | None = None
+) -> BatchResult:
+    """Convert one job, returning its duration and error instead of raising."""
+    start = time.perf_counter()
+    try:
+        job.output_path.parent.mkdir(parents=True, exist_ok=True)
+        cached = convert_file(job.input_path, job.output_path, style, cache)
+    except Exception as e:
+        # Keep going with remaining jobs, error is reported with the result
+        return BatchResult(job, time.perf_counter() - start, str(e) or repr(e))
+    return BatchResult(job, time.perf_counter() - start, cached=cached)
+
+
+def _convert_job_with_style_name(
+    job: BatchJob, style_name: str, cache: BuildCache | None
+) -> BatchResult:
+    # Runs in worker process, style is looked up there instead of pickled
+    return convert_job(job, STYLES[style_name], cache)
+
+
+# Inline cache of this worker process, set by _start_worker
+_worker_cache: InlineCache | None = None
+
+
+def _start_worker(cache: InlineCache | None) -> None:
+    global _worker_cache
+    _worker_cache = cache
+    set_active(cache)
+
+
+def _convert_job_in_worker(
+    job: BatchJob, style_name: str, cache: BuildCache | None
+) -> BatchResult:
+    result = _convert_job_with_style_name(job, style_name, cache)
+    if _worker_cache is not None:
+        result.inline_updates = _worker_cache.take_updates()
+    return result
+
+
+def run_jobs(
+    jobs: list[BatchJob],
+    style_name: str,
+    max_workers: int = 1,
+    cache: BuildCache | None = None,
+    inline_cache: InlineCache | None = None,
+) -> Iterator[BatchResult]:
+    """Convert jobs, yielding results in input order as they become available.
+
+    With max_workers above 1, jobs are spread over a pool of worker processes.
+    Errors, including a crashed worker, are reported in the job's result.
+    With inline_cache, blocks are inline tokenized through it; workers start
+    with a copy and send new entries back to be merged into it.
+    """
+    if max_workers <= 1 or len(jobs) <= 1:
+        with nullcontext() if inline_cache is None else using(inline_cache):
+            for job in jobs:
+                yield _convert_job_with_style_name(job, style_name, cache)
+        return
+
+    with ProcessPoolExecutor(
+        max_workers=min(max_workers, len(jobs)),
+        initializer=_start_worker,
+        initargs=(inline_cache,),
+    ) as executor:
+        futures = [
+            executor.submit(_convert_job_in_worker, job, style_name, cache)
+            for job in jobs
+        ]
+        for job, future in zip(jobs, futures, strict=True):
+            try:
+                result = future.result()
+            except Exception as e:
+                yield BatchResult(job, 0.0, str(e) or repr(e))
+                continue
+            if inline_cache is not None and result.inline_updates is not None:
+                inline_cache.merge(result.inline_updates)
+            yield result
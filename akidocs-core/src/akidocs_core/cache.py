@@ -0,0 +1,150 @@
+import dataclasses
+import hashlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+
+from akidocs_core.style_base import Style
+
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+# Digests of font files, by (resolved path, modification time, size)
+_font_digests: dict[tuple[str, int, int], bytes] = {}
+
+
+@dataclass
+class _Index:
+    """Sizes of cache entries by key, least recently used first, and their sum."""
+
+    sizes: OrderedDict[str, int]
+    total: int
+
+
+# Entry index of each cache directory, scanned once per process and then kept
+# up to date by store and fetch
+_indexes: dict[Path, _Index] = {}
+
+
+def default_cache_dir() -> Path:
+    """Cache directory from AKIDOCS_CACHE_DIR, or the platform's user cache."""
+    if override := os.environ.get("AKIDOCS_CACHE_DIR"):
+        return Path(override)
+    if sys.platform == "win32" and (local := os.environ.get("LOCALAPPDATA")):
+        return Path(local) / "akidocs" / "cache"
+    if sys.platform == "darwin":
+        return Path.home() / "Library" / "Caches" / "akidocs"
+    if xdg := os.environ.get("XDG_CACHE_HOME"):
+        return Path(xdg) / "akidocs"
+    return Path.home() / ".cache" / "akidocs"
+
+
+def file_digest(path: Path) -> bytes:
+    """SHA-256 of file content, read in blocks instead of all at once."""
+    with path.open("rb") as file:
+        return hashlib.file_digest(file, "sha256").digest()
+
+
+def _font_digest(path: Path) -> bytes:
+    """SHA-256 of font file content, hashed once per version of the file."""
+    stat = path.stat()
+    key = (str(path.resolve()), stat.st_mtime_ns, stat.st_size)
+    digest = _font_digests.get(key)
+    if digest is None:
+        digest = file_digest(path)
+        _font_digests[key] = digest
+    return digest
+
+
+@dataclass
+class BuildCache:
+    """On-disk cache of rendered PDFs, keyed by input, style and version.
+
+    Least recently used entries are evicted once the cache grows past
+    max_bytes. Entries are written atomically, so worker processes can share
+    one cache directory. Each process scans the directory once and then
+    counts only its own stores, so entries other processes add meanwhile
+    count toward max_bytes from the next run on.
+    """
+
+    directory: Path
+    version: str
+    max_bytes: int = DEFAULT_MAX_BYTES
+
+    def key(self, source_digest: bytes, style: Style) -> str:
+        """Cache key of input with source_digest (see file_digest) and style."""
+        style_fields = json.dumps(
+            dataclasses.asdict(style), sort_keys=True, default=str
+        )
+        # Font files can change under the same path
+        fonts = [_font_digest(Path(font.path)) for font in style.font_files]
+        digest = hashlib.sha256()
+        for part in (self.version.encode(), style_fields.encode(), *fonts):
+            digest.update(len(part).to_bytes(8, "big"))
+            digest.update(part)
+        digest.update(source_digest)
+        return digest.hexdigest()
+
+    def _entry(self, key: str) -> Path:
+        return self.directory / f"{key}.pdf"
+
+    def _index(self) -> _Index:
+        directory = self.directory.absolute()
+        index = _indexes.get(directory)
+        if index is None:
+            entries = []
+            for path in directory.glob("*.pdf"):
+                try:
+                    stat = path.stat()
+                except FileNotFoundError:
+                    # Removed by another process meanwhile
+                    continue
+                entries.append((stat.st_mtime, path.stem, stat.st_size))
+            sizes = OrderedDict((key, size) for _, key, size in sorted(entries))
+            index = _Index(sizes, sum(sizes.values()))
+            _indexes[directory] = index
+        return index
+
+    def fetch(self, key: str, output_path: Path) -> bool:
+        """Copy cached PDF to output_path, returning False if there is none."""
+        entry = self._entry(key)
+        try:
+            shutil.copyfile(entry, output_path)
+            # Mark as recently used for eviction
+            entry.touch()
+        except FileNotFoundError:
+            return False
+        index = self._index()
+        if key in index.sizes:
+            index.sizes.move_to_end(key)
+        return True
+
+    def store(self, key: str, pdf_path: Path) -> None:
+        """Add PDF at pdf_path to cache, evicting old entries if over size."""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        index = self._index()
+        fd, temp_name = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        os.close(fd)
+        try:
+            shutil.copyfile(pdf_path, temp_name)
+            size = os.path.getsize(temp_name)
+            os.replace(temp_name, self._entry(key))
+        except BaseException:
+            Path(temp_name).unlink(missing_ok=True)
+            raise
+        index.total += size - index.sizes.pop(key, 0)
+        index.sizes[key] = size
+        if index.total > self.max_bytes:
+            self.evict()
+
+    def evict(self) -> None:
+        """Remove least recently used entries until cache fits in max_bytes."""
+        index = self._index()
+        while index.total > self.max_bytes and index.sizes:
+            key, size = index.sizes.popitem(last=False)
+            self._entry(key).unlink(missing_ok=True)
+            index.total -= size
@@ -1,27 +1,232 @@
 import argparse
+import dataclasses
 import os
 import sys
-from importlib.metadata import version
+import time
 from pathlib import Path
 
+from akidocs_core import __version__
+from akidocs_core.cache import DEFAULT_MAX_BYTES, BuildCache, default_cache_dir
 from akidocs_core.opener import open_file
-from akidocs_core.renderer import render_pdf
+from akidocs_core.style_base import Style
 from akidocs_core.styles import STYLES
-from akidocs_core.tokenizer import tokenize
 
+# Inline tokenization cache file in build cache directory, used in batch mode
+INLINE_CACHE_FILE = "inline-cache.json"
+# The inline cache file gets 1/INLINE_CACHE_SHARE of the cache size limit
+INLINE_CACHE_SHARE = 16
 
-def main():
-    pkg_version = version("akidocs-core")
+# Modules that import fpdf (convert, batch, watch) are imported where a
+# conversion runs, so --help, --version and argument errors start fast
+
+
+class _Parser(argparse.ArgumentParser):
+    """Parser with package version in its default description.
+
+    The default is used unless another description is given.
+    """
+
+    def format_help(self) -> str:
+        if self.description is None:
+            self.description = (
+                f"Convert Markdown files to PDF - akidocs-core {__version__}"
+            )
+        return super().format_help()
+
+
+class _VersionAction(argparse.Action):
+    def __init__(self, option_strings, dest=argparse.SUPPRESS, help=None):
+        super().__init__(
+            option_strings, dest=dest, default=argparse.SUPPRESS, nargs=0, help=help
+        )
+
+    def __call__(self, parser, namespace, values, option_string=None):
+        print(f"akidocs-core {__version__}")
+        parser.exit()
+
+
+def _overwrite_refusal(output_path: Path, args: argparse.Namespace) -> str | None:
+    """Ask about existing output file, returning message if it must be kept."""
+    if not output_path.exists() or args.force:
+        return None
+    if args.non_interactive:
+        return f"Error: {output_path} already exists"
+    response = input(f"{output_path} already exists. Overwrite? [y/N] ")
+    if response.lower() != "y":
+        return f"Aborted: {output_path} already exists"
+    return None
+
+
+def _cached_note(cached: bool) -> str:
+    return " (cached)" if cached else ""
+
+
+def _run_batch(
+    parser: argparse.ArgumentParser,
+    args: argparse.Namespace,
+    style: Style,
+    cache: BuildCache | None,
+) -> None:
+    if args.open or args.watch:
+        parser.error("--open and --watch cannot be used in batch mode")
+    if args.timings or args.profile:
+        parser.error("--timings and --profile cannot be used in batch mode")
+    if args.jobs < 0:
+        parser.error("--jobs must be 0 or more")
+    if args.jobs == 0:
+        args.jobs = os.process_cpu_count() or 1
+
+    from akidocs_core.batch import BatchError, collect_jobs, read_manifest, run_jobs
+    from akidocs_core.inline_cache import InlineCache
+
+    output_dir = Path(args.output_dir) if args.output_dir else None
+    try:
+        jobs = []
+        if args.manifest:
+            jobs.extend(read_manifest(Path(args.manifest), output_dir))
+        if args.paths:
+            if output_dir is None:
+                parser.error("input files with --manifest also need --output-dir")
+            jobs.extend(collect_jobs([Path(path) for path in args.paths], output_dir))
+    except (BatchError, OSError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    batch_start = time.perf_counter()
+    failed = 0
+    # Check inputs and ask about overwrites before any conversion starts
+    runnable = []
+    for job in jobs:
+        if not job.input_path.exists():
+            print(f"Error: File not found: {job.input_path}", file=sys.stderr)
+            failed += 1
+            continue
+        refusal = _overwrite_refusal(job.output_path, args)
+        if refusal:
+            print(refusal, file=sys.stderr)
+            failed += 1
+            continue
+        runnable.append(job)
+
+    # Blocks repeated across files are inline tokenized once, also over runs.
+    # Its file takes a share of the cache size limit, the PDFs get the rest.
+    inline_cache = None
+    if cache is not None:
+        inline_max_bytes = cache.max_bytes // INLINE_CACHE_SHARE
+        cache = dataclasses.replace(cache, max_bytes=cache.max_bytes - inline_max_bytes)
+        inline_cache_path = cache.directory / INLINE_CACHE_FILE
+        inline_cache = InlineCache.load(
+            inline_cache_path, cache.version, max_bytes=inline_max_bytes
+        )
 
-    parser = argparse.ArgumentParser(
+    for result in run_jobs(runnable, args.style, args.jobs, cache, inline_cache):
+        job = result.job
+        if result.error:
+            print(f"Error: {job.input_path}: {result.error}", file=sys.stderr)
+            failed += 1
+            continue
+        print(
+            f"From {job.input_path.name} ({style.font_family}, {style.name}) "
+            f"to {job.output_path.name} in {result.seconds:.3f} s"
+            + _cached_note(result.cached)
+        )
+
+    # Only misses add entries
+    if inline_cache is not None and inline_cache.stats.misses:
+        inline_cache.save(inline_cache_path, cache.version)
+
+    elapsed = time.perf_counter() - batch_start
+    summary = f"Converted {len(jobs) - failed} of {len(jobs)} files in {elapsed:.2f} s"
+    if failed:
+        summary += f", {failed} failed"
+    # Nothing to report if every file came from the build cache
+    if inline_cache is not None and inline_cache.stats.hits + inline_cache.stats.misses:
+        stats = inline_cache.stats
+        summary += (
+            f", inline cache {stats.hits} hits, {stats.misses} misses "
+            f"({stats.hit_rate:.0%} hit rate)"
+        )
+    print(summary)
+    if failed:
+        sys.exit(1)
+
+
+def _add_serve_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument(
+        "--socket",
+        help="Socket path (default: akidocs.sock in XDG_RUNTIME_DIR, or "
+        "akidocs-UID.sock in the temp directory)",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=1,
+        help="Convert this many documents in parallel, 0 for one per CPU core "
+        "(default: 1)",
+    )
+
+
+def _serve_main(parser: argparse.ArgumentParser, args: argparse.Namespace) -> None:
+    if args.jobs < 0:
+        parser.error("--jobs must be 0 or more")
+    jobs = args.jobs or os.process_cpu_count() or 1
+
+    from akidocs_core.serve import ConversionServer, ServeError, default_socket_path
+
+    socket_path = Path(args.socket) if args.socket else default_socket_path()
+    try:
+        server = ConversionServer(socket_path, jobs)
+    except (ServeError, OSError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+    with server:
+        print(f"Serving on {socket_path} with {jobs} workers, press Ctrl+C to stop")
+        sys.stdout.flush()
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            print("Stopped serving")
+
+
+def main():
+    parser = _Parser(prog="aki")
+    commands = parser.add_subparsers(dest="command", required=True)
+    # Same program name, as "aki convert" is usually run as plain "aki"
+    convert_parser = commands.add_parser(
+        "convert",
         prog="aki",
-        description=f"Convert Markdown files to PDF - akidocs-core {pkg_version}",
+        help="Convert Markdown files to PDF (default command)",
+        epilog="Run 'aki serve --help' for the long-running conversion server. "
+        "To convert a file named serve or convert, give it as ./serve or after "
+        "'aki convert'.",
     )
+    _add_convert_arguments(convert_parser)
+    serve_parser = commands.add_parser(
+        "serve",
+        help="Run conversion server",
+        description="Keep converting Markdown to PDF for clients of a Unix "
+        "domain socket, with fonts loaded once",
+    )
+    _add_serve_arguments(serve_parser)
+
+    argv = sys.argv[1:]
+    # Without a command, arguments are those of convert, including --help
+    if not argv or argv[0] not in commands.choices:
+        argv = ["convert", *argv]
+    args = parser.parse_args(argv)
+    if args.command == "serve":
+        _serve_main(serve_parser, args)
+    else:
+        _convert_main(convert_parser, args)
+
+
+def _add_convert_arguments(parser: argparse.ArgumentParser) -> None:
     parser.add_argument(
         "-v",
         "--version",
-        action="version",
-        version=f"akidocs-core {pkg_version}",
+        action=_VersionAction,
+        help="show program's version number and exit",
     )
     parser.add_argument(
         "-o",
@@ -48,38 +253,130 @@ def main():
         action="store_true",
         help="Overwrite output file without prompting or erroring",
     )
-    parser.add_argument("input", help="Input Markdown file")
-    parser.add_argument("output", help="Output PDF file")
+    parser.add_argument(
+        "-w",
+        "--watch",
+        action="store_true",
+        help="Keep running and rebuild the PDF whenever the input file changes",
+    )
+    parser.add_argument(
+        "-d",
+        "--output-dir",
+        help="Batch mode: convert every input file, and Markdown files in input "
+        "directories, to PDF files in this directory",
+    )
+    parser.add_argument(
+        "-m",
+        "--manifest",
+        help="Batch mode: read inputs from file, one per line, each optionally "
+        "followed by TAB and output path",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=1,
+        help="Batch mode: convert this many files in parallel, 0 for one per "
+        "CPU core (default: 1)",
+    )
+    parser.add_argument(
+        "--timings",
+        action="store_true",
+        help="Report time and peak memory of each conversion stage: read, "
+        "block tokenize, inline tokenize, render and write",
+    )
+    parser.add_argument(
+        "--profile",
+        metavar="FILE",
+        help="Write cProfile statistics of the conversion to this file",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Always convert, without reading or writing the build cache",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        help="Build cache directory (default: AKIDOCS_CACHE_DIR or user cache)",
+    )
+    parser.add_argument(
+        "--cache-size",
+        type=int,
+        default=DEFAULT_MAX_BYTES // (1024 * 1024),
+        help="Build cache size limit in MiB, least recently used PDFs are "
+        "evicted beyond it (default: %(default)s)",
+    )
+    parser.add_argument(
+        "paths",
+        nargs="*",
+        metavar="path",
+        help="Input Markdown file and output PDF file, or in batch mode any "
+        "number of input files and directories",
+    )
+
+
+def _convert_main(parser: argparse.ArgumentParser, args: argparse.Namespace) -> None:
+    style = STYLES[args.style]
+
+    cache = None
+    # Cached output would skip the stages being measured
+    if not (args.no_cache or args.timings or args.profile):
+        cache = BuildCache(
+            Path(args.cache_dir) if args.cache_dir else default_cache_dir(),
+            __version__,
+            args.cache_size * 1024 * 1024,
+        )
 
-    args = parser.parse_args()
+    if args.output_dir or args.manifest:
+        _run_batch(parser, args, style, cache)
+        return
 
-    input_path = Path(args.input)
-    output_path = Path(args.output)
+    if args.jobs != 1:
+        parser.error("--jobs needs batch mode (--output-dir or --manifest)")
+
+    if len(args.paths) != 2:
+        parser.error("expected input and output file, or --output-dir for batch mode")
+
+    input_path = Path(args.paths[0])
+    output_path = Path(args.paths[1])
 
     if not input_path.exists():
         print(f"Error: File not found: {input_path}", file=sys.stderr)
         sys.exit(1)
 
-    if output_path.exists() and not args.force:
-        if args.non_interactive:
-            print(f"Error: {output_path} already exists", file=sys.stderr)
-            sys.exit(1)
-        else:
-            response = input(f"{output_path} already exists. Overwrite? [y/N] ")
-            if response.lower() != "y":
-                print(f"Aborted: {output_path} already exists", file=sys.stderr)
-                sys.exit(1)
+    refusal = _overwrite_refusal(output_path, args)
+    if refusal:
+        print(refusal, file=sys.stderr)
+        sys.exit(1)
 
-    style = STYLES[args.style]
+    from akidocs_core.convert import convert_file, convert_file_timed, format_timings
 
-    text = input_path.read_text(encoding="utf-8")
-    tokens = tokenize(text)
-    pdf_bytes = render_pdf(tokens, style)
-    output_path.write_bytes(pdf_bytes)
+    profiler = None
+    if args.profile:
+        import cProfile
+
+        profiler = cProfile.Profile()
+    if profiler:
+        profiler.enable()
+    try:
+        if args.timings:
+            timings = convert_file_timed(input_path, output_path, style)
+            cached = False
+        else:
+            cached = convert_file(input_path, output_path, style, cache)
+    finally:
+        if profiler:
+            profiler.disable()
+            profiler.dump_stats(args.profile)
 
     print(
         f"From {input_path.name} ({style.font_family}, {style.name}) to {output_path.name}"
+        + _cached_note(cached)
     )
+    if args.timings:
+        print(format_timings(timings))
+    if args.profile:
+        print(f"Profile written to {args.profile}")
     if args.open:
         print(f"Opening {output_path}")
         if not os.environ.get("AKIDOCS_TEST_MODE"):
@@ -89,6 +386,14 @@ def main():
                 f"Failed to open due to AKIDOCS_TEST_MODE being {os.environ.get('AKIDOCS_TEST_MODE')}"
             )
 
+    if args.watch:
+        from akidocs_core.watch import watch
+
+        try:
+            watch(input_path, output_path, style, build_first=False)
+        except KeyboardInterrupt:
+            print("Stopped watching")
+
 
 if __name__ == "__main__":
     main()
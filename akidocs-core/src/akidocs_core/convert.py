@@ -0,0 +1,96 @@
+import time
+import tracemalloc
+from collections.abc import Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+
+from akidocs_core.cache import BuildCache, file_digest
+from akidocs_core.renderer import _build_pdf, write_pdf
+from akidocs_core.style_base import Style
+from akidocs_core.tokenizer import block_to_token, iter_blocks, iter_tokens
+
+
+@dataclass
+class StageTiming:
+    name: str
+    seconds: float
+    # Peak traced memory allocated during stage, above what it started with
+    peak_bytes: int
+
+
+def convert_file(
+    input_path: Path, output_path: Path, style: Style, cache: BuildCache | None = None
+) -> bool:
+    """Convert Markdown file to PDF file, streaming tokens into the renderer.
+
+    With cache, an earlier PDF of the same input and style is copied instead.
+    Returns True if output came from cache.
+    """
+    if cache is not None:
+        key = cache.key(file_digest(input_path), style)
+        if cache.fetch(key, output_path):
+            return True
+
+    with input_path.open(encoding="utf-8") as input_file:
+        write_pdf(iter_tokens(input_file), output_path, style)
+
+    if cache is not None:
+        cache.store(key, output_path)
+    return False
+
+
+@contextmanager
+def _measure(name: str, timings: list[StageTiming]) -> Iterator[None]:
+    tracemalloc.reset_peak()
+    start_bytes, _ = tracemalloc.get_traced_memory()
+    start = time.perf_counter()
+    yield
+    seconds = time.perf_counter() - start
+    _, peak_bytes = tracemalloc.get_traced_memory()
+    timings.append(StageTiming(name, seconds, peak_bytes - start_bytes))
+
+
+def convert_file_timed(
+    input_path: Path, output_path: Path, style: Style
+) -> list[StageTiming]:
+    """Convert like convert_file without cache, measuring each stage.
+
+    Stages run one after another instead of streaming, so that read, block
+    tokenize, inline tokenize, render and write each get their own wall time
+    and peak memory. Memory tracing slows all stages down.
+    """
+    timings: list[StageTiming] = []
+    was_tracing = tracemalloc.is_tracing()
+    if not was_tracing:
+        tracemalloc.start()
+    try:
+        with _measure("read", timings):
+            text = input_path.read_text(encoding="utf-8")
+        with _measure("block", timings):
+            # Same line splitting as tokenize
+            blocks = list(iter_blocks(text.replace("\r\n", "\n").split("\n")))
+        with _measure("inline", timings):
+            tokens = [block_to_token(block) for block in blocks]
+        with _measure("render", timings):
+            pdf = _build_pdf(tokens, style)
+        with _measure("write", timings):
+            pdf.output(output_path)
+    finally:
+        if not was_tracing:
+            tracemalloc.stop()
+    return timings
+
+
+def format_timings(timings: list[StageTiming]) -> str:
+    """Table of stage timings, with share of total time and peak memory."""
+    total = sum(timing.seconds for timing in timings)
+    lines = [f"{'Stage':<8} {'Time':>10} {'Share':>6} {'Peak memory':>12}"]
+    for timing in timings:
+        share = timing.seconds / total if total else 0.0
+        lines.append(
+            f"{timing.name:<8} {timing.seconds:>8.3f} s {share:>6.0%} "
+            f"{timing.peak_bytes / (1024 * 1024):>8.2f} MiB"
+        )
+    lines.append(f"{'total':<8} {total:>8.3f} s")
+    return "\n".join(lines)
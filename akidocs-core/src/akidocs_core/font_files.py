@@ -0,0 +1,90 @@
+"""TrueType fonts of styles, parsed once per process.
+
+FPDF.add_font parses the whole font with fontTools for every document, and
+output subsets that parsed font in place, so it cannot be shared between
+documents. Instead, metrics parsed from each file are kept for the life of the
+process, one entry per path, replaced when the file's modification time or size
+changes. Every document gets a copy of them with its own subset map and a
+lazily loaded fontTools font over the file bytes, so batch workers and the
+conversion server parse each file once. Output still embeds only the glyphs a
+document uses.
+
+Relies on fpdf internals: TTFFont attributes and FPDF.fonts. With an fpdf
+whose TTFFont lacks any of _FONT_ATTRIBUTES, fonts are added with
+FPDF.add_font instead.
+"""
+
+import copy
+import io
+from pathlib import Path
+
+from fontTools import ttLib
+from fpdf import FPDF
+from fpdf.enums import TextEmphasis
+from fpdf.font_type_3 import get_color_font_object
+from fpdf.fonts import SubsetMap, TTFFont
+
+# TTFFont attributes add_font sets or copies, as of fpdf2 2.8
+_FONT_ATTRIBUTES = (
+    "i",
+    "fontkey",
+    "emphasis",
+    "ttfont",
+    "desc",
+    "cw",
+    "missing_glyphs",
+    "biggest_size_pt",
+    "subset",
+    "color_font",
+    "palette_index",
+)
+
+# Parsed font and file bytes, or None if fpdf's fonts cannot be copied, with
+# the modification time and size they are for, by resolved path
+_parsed: dict[str, tuple[int, int, tuple[TTFFont, bytes] | None]] = {}
+
+
+def _load(path: Path) -> tuple[TTFFont, bytes] | None:
+    stat = path.stat()
+    key = str(path.resolve())
+    cached = _parsed.get(key)
+    if cached is not None and cached[:2] == (stat.st_mtime_ns, stat.st_size):
+        return cached[2]
+    data = path.read_bytes()
+    # Parsed for a throwaway document, only its metrics are kept
+    parsed = TTFFont(FPDF(), path, "", "")
+    parsed.close()
+    entry = None
+    if all(hasattr(parsed, name) for name in _FONT_ATTRIBUTES):
+        entry = (parsed, data)
+    _parsed[key] = (stat.st_mtime_ns, stat.st_size, entry)
+    return entry
+
+
+def add_font(pdf: FPDF, family: str, style: str, path: Path) -> None:
+    """Register TrueType font file on pdf, like FPDF.add_font but parsed once."""
+    entry = _load(Path(path))
+    if entry is None:
+        pdf.add_font(family, style, str(path))
+        return
+    parsed, data = entry
+    font = copy.copy(parsed)
+    font.i = len(pdf.fonts) + 1
+    font.fontkey = family.lower() + style
+    font.emphasis = TextEmphasis.coerce(style)
+    font.ttfont = ttLib.TTFont(io.BytesIO(data), recalcTimestamp=False, lazy=True)
+    # Output numbers the descriptor object, and looking up a missing
+    # character adds it to widths, so each font gets its own
+    font.desc = copy.copy(parsed.desc)
+    font.cw = copy.copy(parsed.cw)
+    font.missing_glyphs = []
+    font.biggest_size_pt = 0
+    font.subset = SubsetMap(font)
+    if parsed.color_font is not None:
+        font.color_font = get_color_font_object(pdf, font, font.palette_index)
+    pdf.fonts[font.fontkey] = font
+
+
+def clear() -> None:
+    """Forget parsed fonts, so the next document parses its files again."""
+    _parsed.clear()
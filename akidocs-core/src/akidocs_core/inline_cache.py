@@ -0,0 +1,289 @@
+"""Bounded LRU cache of inline tokenization, keyed by exact block text.
+
+Documents generated from templates repeat the same headers and paragraphs
+across many files. While a cache is active (set_active or using), block_to_token
+looks block text up in it before calling tokenize_inline.
+
+Entries are tuples of frozen InlineText tokens, and every lookup of the same
+text returns the same tuple, so blocks repeated across documents share their
+tokens.
+"""
+
+import json
+import os
+import tempfile
+from collections import OrderedDict
+from collections.abc import Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Self
+
+from akidocs_core.inline_tokenizer import tokenize_inline
+from akidocs_core.token_buffer import STYLE_BITS, mask_styles, style_mask
+from akidocs_core.tokens import InlineText
+
+DEFAULT_MAX_ENTRIES = 100_000
+# Limit on the size of all entries, as they are saved, and so on the file
+DEFAULT_MAX_BYTES = 32 * 1024 * 1024
+# Longer blocks are rarely repeated and would crowd out those that are
+DEFAULT_MAX_SOURCE_CHARS = 4096
+
+# Inline tokens of one block, shared by every lookup of its text
+Entry = tuple[InlineText, ...]
+# Entry as JSON-friendly (content, style mask) pairs, for files and pickling
+EncodedEntry = list[tuple[str, int]]
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def add(self, other: Self) -> None:
+        self.hits += other.hits
+        self.misses += other.misses
+        self.evictions += other.evictions
+
+
+@dataclass
+class CacheUpdates:
+    """Entries added and stats counted since the last take_updates."""
+
+    entries: list[tuple[str, EncodedEntry]] = field(default_factory=list)
+    stats: CacheStats = field(default_factory=CacheStats)
+
+
+# Style masks run from 0 to one less than this
+_MASK_COUNT = 1 << len(STYLE_BITS)
+
+
+def _encode(entry: Entry) -> EncodedEntry:
+    return [(inline.content, style_mask(inline.styles)) for inline in entry]
+
+
+def _decode(encoded: EncodedEntry) -> Entry:
+    entry = []
+    for content, mask in encoded:
+        if not 0 <= mask < _MASK_COUNT:
+            raise ValueError(f"style mask out of range: {mask}")
+        entry.append(InlineText(content, mask_styles(mask)))
+    return tuple(entry)
+
+
+def _decode_saved(item: object) -> tuple[str, Entry]:
+    """Source and entry of one item saved in a file, raising if malformed."""
+    source, encoded = item
+    entry = _decode(encoded)
+    if not isinstance(source, str) or not all(
+        isinstance(inline.content, str) for inline in entry
+    ):
+        raise TypeError("saved entry is not text")
+    return source, entry
+
+
+# Errors decoding saved entries that are not as save wrote them
+_MALFORMED = (KeyError, IndexError, TypeError, ValueError)
+
+
+# JSON punctuation and style mask around each run and entry
+_RUN_OVERHEAD = 10
+_ENTRY_OVERHEAD = 10
+
+
+def _entry_size(source: str, entry: Entry) -> int:
+    """About the size of entry in a saved file, counting characters as bytes."""
+    return (
+        _ENTRY_OVERHEAD
+        + len(source)
+        + sum(len(inline.content) + _RUN_OVERHEAD for inline in entry)
+    )
+
+
+class InlineCache:
+    """Inline tokens of up to max_entries block texts, in LRU order.
+
+    Blocks longer than max_source_chars are tokenized but never cached.
+    Least recently used entries are also evicted once all entries would take
+    more than about max_bytes saved.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        max_source_chars: int = DEFAULT_MAX_SOURCE_CHARS,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+    ) -> None:
+        self.max_entries = max_entries
+        self.max_source_chars = max_source_chars
+        self.max_bytes = max_bytes
+        self.stats = CacheStats()
+        self._entries: OrderedDict[str, Entry] = OrderedDict()
+        # Sum of _entry_size of entries
+        self._bytes = 0
+        # Sources added since last take_updates, and stats at that point
+        self._new_sources: list[str] = []
+        self._taken_stats = CacheStats()
+
+    def tokenize(self, source: str) -> Entry:
+        """Inline tokens of source, from cache if seen before.
+
+        Every call for the same cached source returns the same tuple.
+        """
+        entry = self._entries.get(source)
+        if entry is not None:
+            self._entries.move_to_end(source)
+            self.stats.hits += 1
+            return entry
+
+        self.stats.misses += 1
+        entry = tuple(tokenize_inline(source))
+        if len(source) <= self.max_source_chars:
+            self._store(source, entry)
+            self._new_sources.append(source)
+        return entry
+
+    def _store(self, source: str, entry: Entry) -> None:
+        previous = self._entries.pop(source, None)
+        if previous is not None:
+            self._bytes -= _entry_size(source, previous)
+        self._entries[source] = entry
+        self._bytes += _entry_size(source, entry)
+        while self._entries and (
+            len(self._entries) > self.max_entries or self._bytes > self.max_bytes
+        ):
+            evicted, evicted_entry = self._entries.popitem(last=False)
+            self._bytes -= _entry_size(evicted, evicted_entry)
+            self.stats.evictions += 1
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, source: str) -> bool:
+        return source in self._entries
+
+    def take_updates(self) -> CacheUpdates:
+        """Entries and stats since previous call, for merging into another cache.
+
+        Used by batch worker processes to send what they learned back.
+        """
+        updates = CacheUpdates(
+            [
+                (source, _encode(self._entries[source]))
+                for source in self._new_sources
+                if source in self._entries
+            ],
+            CacheStats(
+                self.stats.hits - self._taken_stats.hits,
+                self.stats.misses - self._taken_stats.misses,
+                self.stats.evictions - self._taken_stats.evictions,
+            ),
+        )
+        self._new_sources = []
+        self._taken_stats = CacheStats(
+            self.stats.hits, self.stats.misses, self.stats.evictions
+        )
+        return updates
+
+    def merge(self, updates: CacheUpdates) -> None:
+        """Add entries and stats taken from another cache."""
+        for source, encoded in updates.entries:
+            if source not in self._entries:
+                self._store(source, _decode(encoded))
+        self.stats.add(updates.stats)
+
+    def _encoded_entries(self) -> list[tuple[str, EncodedEntry]]:
+        # Least recently used first, so loading restores the same order
+        return [(source, _encode(entry)) for source, entry in self._entries.items()]
+
+    def __getstate__(self) -> dict:
+        return {
+            "max_entries": self.max_entries,
+            "max_source_chars": self.max_source_chars,
+            "max_bytes": self.max_bytes,
+            "entries": self._encoded_entries(),
+        }
+
+    def __setstate__(self, state: dict) -> None:
+        self.__init__(
+            state["max_entries"], state["max_source_chars"], state["max_bytes"]
+        )
+        for source, encoded in state["entries"]:
+            self._store(source, _decode(encoded))
+
+    def save(self, path: Path, version: str) -> None:
+        """Write entries to path atomically, tagged with akidocs-core version."""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, temp_name = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as file:
+                json.dump(
+                    {"version": version, "entries": self._encoded_entries()},
+                    file,
+                    ensure_ascii=False,
+                )
+            os.replace(temp_name, path)
+        except BaseException:
+            Path(temp_name).unlink(missing_ok=True)
+            raise
+
+    @classmethod
+    def load(
+        cls,
+        path: Path,
+        version: str,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        max_source_chars: int = DEFAULT_MAX_SOURCE_CHARS,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+    ) -> Self:
+        """Cache with entries saved at path.
+
+        Empty if the file is missing, unreadable, malformed or saved by
+        another version.
+        """
+        cache = cls(max_entries, max_source_chars, max_bytes)
+        try:
+            text = path.read_text(encoding="utf-8")
+        except OSError:
+            return cache
+        try:
+            saved = json.loads(text)
+        except ValueError:
+            return cache
+        if not isinstance(saved, dict) or saved.get("version") != version:
+            return cache
+        try:
+            entries = [_decode_saved(item) for item in saved["entries"]]
+        except _MALFORMED:
+            return cache
+        for source, entry in entries:
+            cache._store(source, entry)
+        return cache
+
+
+# Read directly by block_to_token, change only with set_active
+active: InlineCache | None = None
+
+
+def set_active(cache: InlineCache | None) -> InlineCache | None:
+    """Use cache in block_to_token, or None to stop. Returns previous cache."""
+    global active
+    previous = active
+    active = cache
+    return previous
+
+
+@contextmanager
+def using(cache: InlineCache) -> Iterator[InlineCache]:
+    """Use cache while in the with block."""
+    previous = set_active(cache)
+    try:
+        yield cache
+    finally:
+        set_active(previous)
@@ -1,31 +1,70 @@
-from akidocs_core.tokens import Bold, Code, InlineStyles, InlineText, Italic
+import re
+import time
+from bisect import bisect_left
+from collections.abc import Generator
+from dataclasses import dataclass
+
+from akidocs_core import instrumentation
+from akidocs_core.tokens import (
+    BOLD,
+    CODE_STYLES,
+    ITALIC,
+    InlineStyles,
+    InlineText,
+    canonical_styles,
+    combine_styles,
+)
 
 DELIMITERS: list[tuple[str, frozenset[InlineStyles]]] = [
-    ("***", frozenset({Bold(), Italic()})),
-    ("**", frozenset({Bold()})),
-    ("*", frozenset({Italic()})),
+    ("***", canonical_styles(frozenset({BOLD, ITALIC}))),
+    ("**", canonical_styles(frozenset({BOLD}))),
+    ("*", canonical_styles(frozenset({ITALIC}))),
 ]
 
+# Characters that can open or close a section, everything else is plain text
+_SPECIAL_CHAR = re.compile(r"[*`]")
+
+
+def _next_special(text: str, pos: int, end: int) -> int:
+    """Position of next character in text[pos:end] that can start a section."""
+    match = _SPECIAL_CHAR.search(text, pos, end)
+    return match.start() if match else end
+
+
+# Closer index shared by one tokenize_inline_recursive call and all its nested
+# sections. Maps (delim, content_start_pos, end) to _find_closing result, all
+# as absolute offsets into the paragraph. The section end is part of the key,
+# because closers past it are out of reach for sections nested inside.
+ClosingIndex = dict[tuple[str, int, int], int]
 
-def _claimed_by_longer(text: str, provided_delim: str, pos: int) -> bool:
+
+def _claimed_by_longer(
+    text: str, provided_delim: str, pos: int, end: int, closing_index: ClosingIndex
+) -> bool:
     """Check if in this position a longer delimiter has valid claim."""
     for check_delim, _ in DELIMITERS:
         # If check_delim is shorter than provided_delim
         if len(check_delim) <= len(provided_delim):
             continue
         # If no check_delim at this position
-        if text[pos : pos + len(check_delim)] != check_delim:
+        if not text.startswith(check_delim, pos, end):
             continue
         # If longer delimiter has valid pair, recursive to _find_closing
-        if _find_closing(text, check_delim, pos + len(check_delim)) != -1:
+        content_start_pos = pos + len(check_delim)
+        if (
+            _find_closing(text, check_delim, content_start_pos, end, closing_index)
+            != -1
+        ):
             return True
     return False
 
 
-def _skip_nested_at(text: str, provided_delim: str, pos: int) -> int | None:
+def _skip_nested_at(
+    text: str, provided_delim: str, pos: int, end: int, closing_index: ClosingIndex
+) -> int | None:
     """When searching for closing delimiter, skip over nested sections that use different delimiter."""
     if text[pos] == "`":
-        close = text.find("`", pos + 1)
+        close = text.find("`", pos + 1, end)
         if close != -1:
             return close + 1
 
@@ -34,10 +73,11 @@ def _skip_nested_at(text: str, provided_delim: str, pos: int) -> int | None:
         if check_delim == provided_delim:
             continue
         # If no match found for check_delim, then skip
-        if text[pos : pos + len(check_delim)] != check_delim:
+        if not text.startswith(check_delim, pos, end):
             continue
         # If this delimiter has a valid closer, recursive
-        close = _find_closing(text, check_delim, pos + len(check_delim))
+        content_start_pos = pos + len(check_delim)
+        close = _find_closing(text, check_delim, content_start_pos, end, closing_index)
         if close != -1:
             # Then return position after closing delimiter
             return close + len(check_delim)
@@ -45,28 +85,48 @@ def _skip_nested_at(text: str, provided_delim: str, pos: int) -> int | None:
     return None
 
 
-def _find_closing(text: str, delim: str, content_start_pos: int) -> int:
+def _find_closing(
+    text: str,
+    delim: str,
+    content_start_pos: int,
+    end: int,
+    closing_index: ClosingIndex,
+) -> int:
     """Find closing delimiter's starting position, skipping nested sections."""
+    # Every position passed on the way has the same answer, remember them all
+    visited_positions: list[int] = []
+    closing_pos = -1
+
     current_pos = content_start_pos
-    while current_pos < len(text):
+    while current_pos < end:
+        # If already resolved from here by an earlier search
+        known = closing_index.get((delim, current_pos, end))
+        if known is not None:
+            closing_pos = known
+            break
+        visited_positions.append(current_pos)
+
         # If found potential closing delimiter
-        if text[current_pos : current_pos + len(delim)] == delim:
+        if text.startswith(delim, current_pos, end):
             # If not claimed by longer
-            if not _claimed_by_longer(text, delim, current_pos):
-                return current_pos
+            if not _claimed_by_longer(text, delim, current_pos, end, closing_index):
+                closing_pos = current_pos
+                break
 
         # Check if different delimiter opens and closes at this position
-        skip_to_pos = _skip_nested_at(text, delim, current_pos)
+        skip_to_pos = _skip_nested_at(text, delim, current_pos, end, closing_index)
         if skip_to_pos is not None:
             current_pos = skip_to_pos
         else:
             current_pos += 1
 
-    return -1
+    for pos in visited_positions:
+        closing_index[(delim, pos, end)] = closing_pos
+    return closing_pos
 
 
 def _find_styled_section(
-    text: str, pos: int
+    text: str, pos: int, end: int, closing_index: ClosingIndex
 ) -> tuple[str, frozenset[InlineStyles], int] | None:
     """Find a styled section that STARTS at pos. Returns (delim, inline_styles, end_pos) or None."""
     # Longest delimiter that opened, but failed to close
@@ -75,11 +135,13 @@ def _find_styled_section(
     # Iterate in correct order, as specified by DELIMITERS
     for delim, inline_styles in DELIMITERS:
         # If current delimiter, does not find match at current position
-        if text[pos : pos + len(delim)] != delim:
+        if not text.startswith(delim, pos, end):
             continue
 
         # Search for matching closer delimiter
-        content_end_pos = _find_closing(text, delim, pos + len(delim))
+        content_end_pos = _find_closing(
+            text, delim, pos + len(delim), end, closing_index
+        )
         # If none found, record as failed, if longer than previous failed
         if content_end_pos == -1:
             longest_failed_opener_len = max(longest_failed_opener_len, len(delim))
@@ -95,67 +157,404 @@ def _find_styled_section(
     return None
 
 
-def tokenize_inline(
-    text: str, inherited_styles: frozenset[InlineStyles] = frozenset()
+def tokenize_inline_recursive(
+    text: str,
+    inherited_styles: frozenset[InlineStyles] = frozenset(),
+    start: int = 0,
+    end: int | None = None,
+) -> list[InlineText]:
+    """Reference engine, recursing on the content of each styled section."""
+    start, end, _ = slice(start, end).indices(len(text))
+    inherited_styles = canonical_styles(inherited_styles)
+    return _tokenize_section(text, start, end, inherited_styles, {})
+
+
+def _tokenize_section(
+    text: str,
+    start: int,
+    end: int,
+    inherited_styles: frozenset[InlineStyles],
+    closing_index: ClosingIndex,
 ) -> list[InlineText]:
+    """Tokenize text[start:end], recursing with offsets into the same text."""
     inline_tokens: list[InlineText] = []
-    text_buffer = ""
-    pos = 0
+    # Plain text waiting to be emitted is always text[buffer_start:pos]
+    buffer_start = start
+    pos = start
+
+    while pos < end:
+        # Skip whole run of plain text, nothing can open in it
+        if text[pos] not in "*`":
+            pos = _next_special(text, pos, end)
+            continue
 
-    while pos < len(text):
         if text[pos] == "`":
-            close = text.find("`", pos + 1)
+            close = text.find("`", pos + 1, end)
             if close != -1:
-                if text_buffer:
+                if buffer_start < pos:
                     inline_tokens.append(
-                        InlineText(content=text_buffer, styles=inherited_styles)
+                        InlineText(
+                            content=text[buffer_start:pos], styles=inherited_styles
+                        )
                     )
-                    text_buffer = ""
                 inner_content = text[pos + 1 : close]
-                combined_styles = inherited_styles | frozenset({Code()})
+                combined_styles = combine_styles(inherited_styles, CODE_STYLES)
                 inline_tokens.append(
                     InlineText(content=inner_content, styles=combined_styles)
                 )
-                pos = close + 1
+                pos = buffer_start = close + 1
                 continue
             # Unclosed backtick — fall through to treat as literal character
 
-        section = _find_styled_section(text, pos)
+        section = _find_styled_section(text, pos, end, closing_index)
 
-        # No match for style in section
+        # No match for style in section, character stays in text buffer
         if section is None:
-            text_buffer += text[pos]
             pos += 1
             continue
 
         # Styled section was found, unpack section
         delim, styles, content_end_pos = section
 
-        # Add accumulated text buffer to inline_tokens, and flush text buffer
-        if text_buffer:
+        # Add accumulated text buffer to inline_tokens
+        if buffer_start < pos:
             inline_tokens.append(
-                InlineText(content=text_buffer, styles=inherited_styles)
+                InlineText(content=text[buffer_start:pos], styles=inherited_styles)
             )
-            text_buffer = ""
 
-        # Extract content between delimiters
-        inner_content = text[pos + len(delim) : content_end_pos]
+        # Content between delimiters, as offsets
+        content_start_pos = pos + len(delim)
         # Combine new styles and inherited styles
-        combined_styles = inherited_styles | styles
+        combined_styles = combine_styles(inherited_styles, styles)
 
         # Recursive call, to parse inner content for nested styles
-        if inner_content:
-            inner_inline_tokens = tokenize_inline(inner_content, combined_styles)
+        if content_start_pos < content_end_pos:
+            inner_inline_tokens = _tokenize_section(
+                text, content_start_pos, content_end_pos, combined_styles, closing_index
+            )
             inline_tokens.extend(inner_inline_tokens)
         # If section is empty, emit empty token with the styles
         else:
             inline_tokens.append(InlineText(content="", styles=combined_styles))
 
-        # Move position past closing delimiter
-        pos = content_end_pos + len(delim)
+        # Move position past closing delimiter, text buffer starts there
+        pos = buffer_start = content_end_pos + len(delim)
+
+    # After loop, add accumulated text buffer to inline_tokens
+    if buffer_start < end:
+        inline_tokens.append(
+            InlineText(content=text[buffer_start:end], styles=inherited_styles)
+        )
+
+    return inline_tokens
+
+
+# Delimiter-stack engine
+#
+# Produces the same output as the recursive reference engine above, without
+# recursing. Plain text can never open or close anything, so the engine works
+# on the list of special character positions only, addressed by ordinal.
+# Sections opened along the way go on an explicit stack, and closer searches
+# run as generators on a stack of their own.
+#
+# Closer searches are remembered in one table for the whole paragraph. The
+# result of a search depends on the end of the section it runs in, but only
+# through the characters it looked at: a result is the same for every end from
+# its horizon, one past the last character looked at, up to the end it was
+# found with. A nested section ends earlier than its parent, so results found
+# for the parent are reused for as long as their horizon lies in the nested
+# section, and only searches that looked past its end run again. Searches that
+# reach the end of their section, and those that relied on them, have the end
+# itself as horizon.
+#
+# Sections nested as deep as the paragraph is long, like
+# "**x *y " * n + " y* x**" * n, take linear time and memory this way, where
+# a closer table per section took O(n * depth). Inputs whose closers keep
+# lying past the end of the nested section, like "**a * " * n, grow a little
+# faster than linear, see test_inline_scaling.
+
+# Longest delimiter, checks at a position look at most this far past it
+_MAX_DELIM_LEN = max(len(delim) for delim, _ in DELIMITERS)
+
+
+class _ClosingTable:
+    """Closer searches of one paragraph, as ordinals of its special characters."""
+
+    def __init__(self, text: str, specials: list[int]) -> None:
+        self.text = text
+        self.specials = specials
+        count = len(specials)
+        # Ordinal of the first backtick after each special character, -1 if none
+        self.next_backtick = [-1] * (count + 1)
+        following = -1
+        for j in range(count - 1, -1, -1):
+            self.next_backtick[j] = following
+            if text[specials[j]] == "`":
+                following = j
+        # Per delimiter and ordinal: (closer ordinal or -1, horizon, end)
+        self.results: list[list[tuple[int, int, int] | None]] = [
+            [None] * (count + 1) for _ in DELIMITERS
+        ]
+
+    def _known(self, k: int, j: int, end: int) -> tuple[int, int] | None:
+        result = self.results[k][j]
+        if result is not None and result[1] <= end <= result[2]:
+            return result[0], result[1]
+        return None
+
+    def find(self, k: int, j: int, end: int) -> int:
+        """Ordinal of what _find_closing returns for DELIMITERS[k], -1 if none.
+
+        The section's content starts at special character j, or after the
+        last one if j is their count, and the section ends at end.
+        """
+        known = self._known(k, j, end)
+        if known is not None:
+            return known[0]
+        limit = bisect_left(self.specials, end)
+        searches = [self._search(k, j, end, limit)]
+        answer = None
+        while searches:
+            try:
+                k, j = searches[-1].send(answer)
+            except StopIteration as done:
+                searches.pop()
+                answer = done.value
+                continue
+            answer = self._known(k, j, end)
+            if answer is None:
+                searches.append(self._search(k, j, end, limit))
+        return answer[0]
+
+    def _search(
+        self, k: int, j: int, end: int, limit: int
+    ) -> Generator[tuple[int, int], tuple[int, int] | None, tuple[int, int]]:
+        """Same scan as _find_closing, over specials[j:limit].
+
+        Yields (delimiter index, ordinal) of each closer it needs, and gets
+        back (closer, horizon). Returns (closer, horizon) of its own.
+        """
+        text = self.text
+        specials = self.specials
+        delim = DELIMITERS[k][0]
+        # Ordinals passed on the way, and horizon of what was looked at in each
+        visited: list[int] = []
+        horizons: list[int] = []
+        # Horizon of where the search stopped
+        horizon = 0
+        current = j
+        while True:
+            if current >= limit:
+                closer = -1
+                horizon = end
+                break
+            known = self._known(k, current, end)
+            if known is not None:
+                closer, horizon = known
+                break
+            visited.append(current)
+            pos = specials[current]
+            step_horizon = min(pos + _MAX_DELIM_LEN, end)
+
+            # Potential closer, if not claimed by longer
+            if text.startswith(delim, pos, end):
+                claimed = False
+                for m, (check_delim, _) in enumerate(DELIMITERS):
+                    if len(check_delim) <= len(delim) or not text.startswith(
+                        check_delim, pos, end
+                    ):
+                        continue
+                    close, close_horizon = yield m, current + len(check_delim)
+                    step_horizon = max(step_horizon, close_horizon)
+                    if close != -1:
+                        claimed = True
+                        break
+                if not claimed:
+                    horizons.append(step_horizon)
+                    closer = current
+                    break
+
+            # Skip over nested section starting here, same as _skip_nested_at
+            skip_to = current + 1
+            close = self.next_backtick[current] if text[pos] == "`" else -1
+            if close != -1 and specials[close] < end:
+                step_horizon = max(step_horizon, specials[close] + 1)
+                skip_to = close + 1
+            else:
+                for m, (check_delim, _) in enumerate(DELIMITERS):
+                    if m == k or not text.startswith(check_delim, pos, end):
+                        continue
+                    close, close_horizon = yield m, current + len(check_delim)
+                    step_horizon = max(step_horizon, close_horizon)
+                    if close != -1:
+                        skip_to = close + len(check_delim)
+                        break
+            horizons.append(step_horizon)
+            current = skip_to
+
+        # Every ordinal passed on the way has the same answer, which depends on
+        # what was looked at from there on
+        for ordinal, step_horizon in zip(
+            reversed(visited), reversed(horizons), strict=True
+        ):
+            horizon = max(horizon, step_horizon)
+            self.results[k][ordinal] = (closer, horizon, end)
+        return closer, horizon
+
+
+@dataclass
+class _Frame:
+    """Section being tokenized, covering text[start:end]."""
+
+    end: int
+    styles: frozenset[InlineStyles]
+    # Special characters of the section end before specials[last]
+    last: int
+    # Next special character to look at, and start of pending plain text
+    next: int
+    buffer_start: int
+
+
+def tokenize_inline_stack(
+    text: str,
+    inherited_styles: frozenset[InlineStyles] = frozenset(),
+    start: int = 0,
+    end: int | None = None,
+) -> list[InlineText]:
+    """Delimiter-stack engine, equivalent to tokenize_inline_recursive."""
+    start, end, _ = slice(start, end).indices(len(text))
+    inherited_styles = canonical_styles(inherited_styles)
+    specials = [match.start() for match in _SPECIAL_CHAR.finditer(text, start, end)]
+    closing = _ClosingTable(text, specials)
+    inline_tokens: list[InlineText] = []
+    stack = [_Frame(end, inherited_styles, len(specials), 0, start)]
+
+    while stack:
+        frame = stack[-1]
+
+        # No special characters left, flush text buffer and return to parent
+        if frame.next >= frame.last:
+            if frame.buffer_start < frame.end:
+                inline_tokens.append(
+                    InlineText(
+                        content=text[frame.buffer_start : frame.end],
+                        styles=frame.styles,
+                    )
+                )
+            stack.pop()
+            continue
+
+        # Plain text before this position stays in text buffer
+        pos = specials[frame.next]
+
+        if text[pos] == "`":
+            close_ordinal = closing.next_backtick[frame.next]
+            if close_ordinal != -1 and specials[close_ordinal] < frame.end:
+                close = specials[close_ordinal]
+                if frame.buffer_start < pos:
+                    inline_tokens.append(
+                        InlineText(
+                            content=text[frame.buffer_start : pos], styles=frame.styles
+                        )
+                    )
+                inline_tokens.append(
+                    InlineText(
+                        content=text[pos + 1 : close],
+                        styles=combine_styles(frame.styles, CODE_STYLES),
+                    )
+                )
+                frame.next = close_ordinal + 1
+                frame.buffer_start = close + 1
+                continue
+
+        # Same rules as _find_styled_section, with closers from the table
+        section = None
+        longest_failed_opener_len = 0
+        for k, (delim, inline_styles) in enumerate(DELIMITERS):
+            if not text.startswith(delim, pos, frame.end):
+                continue
+            close = closing.find(k, frame.next + len(delim), frame.end)
+            if close == -1:
+                longest_failed_opener_len = max(longest_failed_opener_len, len(delim))
+                continue
+            if specials[close] + len(delim) <= pos + longest_failed_opener_len:
+                continue
+            section = delim, inline_styles, close
+            break
+
+        # No match for style in section, character stays in text buffer
+        if section is None:
+            frame.next += 1
+            continue
+
+        delim, styles, close = section
+        if frame.buffer_start < pos:
+            inline_tokens.append(
+                InlineText(content=text[frame.buffer_start : pos], styles=frame.styles)
+            )
 
-    # After loop, add accumulated text buffer to inline_tokens, and flush text buffer
-    if text_buffer:
-        inline_tokens.append(InlineText(content=text_buffer, styles=inherited_styles))
+        # Parent resumes after closing delimiter once nested section is done
+        content_first = frame.next + len(delim)
+        content_start_pos = pos + len(delim)
+        content_end_pos = specials[close]
+        frame.next = close + len(delim)
+        frame.buffer_start = content_end_pos + len(delim)
+        combined_styles = combine_styles(frame.styles, styles)
+        if content_start_pos < content_end_pos:
+            stack.append(
+                _Frame(
+                    content_end_pos,
+                    combined_styles,
+                    close,
+                    content_first,
+                    content_start_pos,
+                )
+            )
+        else:
+            inline_tokens.append(InlineText(content="", styles=combined_styles))
 
     return inline_tokens
+
+
+INLINE_ENGINES = {
+    "stack": tokenize_inline_stack,
+    "recursive": tokenize_inline_recursive,
+}
+
+
+def tokenize_inline(
+    text: str,
+    inherited_styles: frozenset[InlineStyles] = frozenset(),
+    engine: str = "stack",
+    start: int = 0,
+    end: int | None = None,
+) -> list[InlineText]:
+    """Tokenize inline styles of text, with engine from INLINE_ENGINES.
+
+    With start and end, only text[start:end] is tokenized, as if it were passed
+    on its own, without copying it out of text first.
+    """
+    if instrumentation.sink is None:
+        return INLINE_ENGINES[engine](text, inherited_styles, start, end)
+
+    began = time.perf_counter()
+    result = INLINE_ENGINES[engine](text, inherited_styles, start, end)
+    seconds = time.perf_counter() - began
+    first, last, _ = slice(start, end).indices(len(text))
+    instrumentation.emit(
+        "tokenize_inline",
+        seconds,
+        chars_in=max(last - first, 0),
+        inline_tokens=len(result),
+    )
+    return result
+
+
+def coalesce_inline(tokens: list[InlineText]) -> list[InlineText]:
+    """Drop empty runs without styles, which write nothing.
+
+    Other runs are kept as they are, also adjacent runs with equal styles and
+    empty styled runs: fpdf wraps the text of each write call on its own, so
+    writing joined text could break lines elsewhere. Tokens are not modified.
+    """
+    return [token for token in tokens if token.content or token.styles]
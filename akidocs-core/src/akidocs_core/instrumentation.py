@@ -0,0 +1,65 @@
+"""Structured events from tokenizing and rendering, for embedding applications.
+
+Register a callback with set_sink to receive an Event after each call to
+tokenize, iter_tokens (once exhausted), tokenize_inline, render_pdf and
+write_pdf. With no sink registered, instrumented functions only check that
+sink is None, and count and time nothing.
+
+Calls nest: tokenize emits one tokenize_inline event per block before its
+own, also for blocks tokenized in worker processes, which send their events
+back to be emitted in order. Rendering tokens streamed from iter_tokens includes their
+tokenizing time, which the iter_tokens event reports separately.
+"""
+
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+
+
+@dataclass(frozen=True)
+class Event:
+    """One instrumented call.
+
+    counts holds what applies to the call, from: chars_in, bytes_in, tokens,
+    inline_tokens, pages and font_switches.
+    """
+
+    name: str
+    seconds: float
+    counts: dict[str, int] = field(default_factory=dict)
+
+
+Sink = Callable[[Event], None]
+
+# Read directly by instrumented functions, change only with set_sink
+sink: Sink | None = None
+
+
+def set_sink(new_sink: Sink | None) -> Sink | None:
+    """Register callback for events, or None to stop. Returns previous sink.
+
+    The sink is called synchronously, in the thread doing the work, and its
+    exceptions propagate to the instrumented call.
+    """
+    global sink
+    previous = sink
+    sink = new_sink
+    return previous
+
+
+@contextmanager
+def recording() -> Iterator[list[Event]]:
+    """Collect events into a list while in the with block."""
+    events: list[Event] = []
+    previous = set_sink(events.append)
+    try:
+        yield events
+    finally:
+        set_sink(previous)
+
+
+def emit(name: str, seconds: float, **counts: int) -> None:
+    """Send event to sink, if one is registered."""
+    current = sink
+    if current is not None:
+        current(Event(name, seconds, counts))
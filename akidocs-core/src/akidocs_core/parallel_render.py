@@ -0,0 +1,364 @@
+"""Rendering of long documents in parallel worker processes.
+
+Blocks are split into one chunk per worker. Each worker renders its chunk
+starting from the page, vertical position and font where serial rendering
+would be at the chunk's first block, and the pages of all chunks are joined
+into one document.
+
+How many lines a block wraps into does not depend on where it starts, as
+every block starts at the left margin, so page positions follow from line
+counts. Start positions are first found from line counts estimated with a word
+wrap over the core font widths of the style. Workers report the real line
+counts, so chunks rendered from a wrong estimate are rendered again from exact
+positions. Should chunks still not line up, the document is rendered serially.
+Output always equals serial rendering.
+
+Joining relies on fpdf internals: page contents, the resource catalog and the
+lazily written font selection of each page.
+"""
+
+import itertools
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+
+from fpdf import FPDF
+from fpdf.fonts import CORE_FONTS_CHARWIDTHS
+
+from akidocs_core.renderer import (
+    Block,
+    Font,
+    RenderPlan,
+    _BlockPlan,
+    _blocks,
+    _build_pdf_from_blocks,
+    _FontState,
+    _new_pdf,
+    _render_blocks,
+    render_plan,
+)
+from akidocs_core.style_base import Style
+
+# Below this many characters of text, starting worker processes costs more
+# than rendering in parallel saves
+PARALLEL_MIN_CHARS = 200_000
+
+# Width of characters missing from core font metrics, in 1/1000 of font size
+_DEFAULT_CHAR_WIDTH = 500
+# fpdf lets text exceed line width by this much, lines of monospace text
+# often fill it exactly
+_WIDTH_TOLERANCE = 1e-9
+
+# Position as (page number from 1, y in mm)
+Position = tuple[int, float]
+
+
+@dataclass(frozen=True)
+class _ChunkStart:
+    position: Position
+    # Font current when chunk starts, None if no text came before
+    font: Font | None
+    first: bool
+
+
+@dataclass
+class _ChunkResult:
+    # Content of each page, first page without what starting it wrote
+    contents: list[bytes]
+    # Resources used by each page, keyed by (page within chunk, resource type)
+    resources: dict[tuple, set] = field(default_factory=dict)
+    end: Position = (1, 0.0)
+    # Line feeds inside each block, one less than its lines
+    line_feeds: list[int] = field(default_factory=list)
+
+
+class _LineCountingFPDF(FPDF):
+    """FPDF that counts ln calls, including those write makes between lines."""
+
+    line_feeds = 0
+
+    def ln(self, h=None) -> None:
+        self.line_feeds += 1
+        super().ln(h)
+
+
+def _font_key(font: Font) -> str:
+    # As FPDF.set_font names fonts: lowercase family and sorted style letters
+    family, style, _ = font
+    return family.lower() + style
+
+
+def _register_fonts(pdf: FPDF, fonts: list[Font]) -> None:
+    # fpdf numbers fonts in order of first set_font, so every chunk and the
+    # joined document register them in the order serial rendering uses them.
+    # Before the first page, set_font writes nothing.
+    for family, style, size_pt in fonts:
+        pdf.set_font(family, style=style, size=size_pt)
+
+
+def _render_chunk(
+    blocks: list[Block], style: Style, start: _ChunkStart, fonts_used: list[Font]
+) -> _ChunkResult:
+    """Render blocks from start, as serial rendering would reach them."""
+    plan = render_plan(style)
+    pdf = _new_pdf(plan, _LineCountingFPDF)
+    _register_fonts(pdf, fonts_used)
+    pdf.add_page()
+    # Serial rendering is in the middle of this page, without a page start
+    preamble = 0 if start.first else len(pdf.pages[1].contents)
+    pdf.y = start.position[1]
+
+    fonts = _FontState(pdf)
+    if start.font is not None:
+        fonts.set_font(start.font)
+        # Earlier text already selected this font in the page's content
+        pdf.current_font_is_set_on_page = True
+
+    line_feeds = []
+    for block in blocks:
+        before = pdf.line_feeds
+        _render_blocks(pdf, fonts, plan, (block,))
+        # Not counting the ln after the block
+        line_feeds.append(pdf.line_feeds - before - 1)
+
+    contents = [bytes(page.contents) for page in pdf.pages.values()]
+    contents[0] = contents[0][preamble:]
+    return _ChunkResult(
+        contents,
+        dict(pdf._resource_catalog.resources_per_page),
+        (pdf.page, pdf.y),
+        line_feeds,
+    )
+
+
+def _estimate_line_feeds(
+    runs: list[tuple[str, frozenset]], block: _BlockPlan, pdf: FPDF
+) -> int:
+    """Line feeds write would make in block, from a word wrap over font widths.
+
+    Follows fpdf's line breaking closely, but only needs to be right most of
+    the time.
+    """
+    full_width = (
+        pdf.w - pdf.l_margin - pdf.r_margin - 2 * pdf.c_margin + _WIDTH_TOLERANCE
+    )
+    x = 0.0
+    line_feeds = 0
+    for content, styles in runs:
+        font = block.fonts[styles]
+        widths = CORE_FONTS_CHARWIDTHS.get(_font_key(font), {})
+        scale = font[2] * 0.001 / pdf.k
+        space = widths.get(" ", _DEFAULT_CHAR_WIDTH) * scale
+        # First line of each write continues from x
+        max_width = full_width - x
+        line_width = 0.0
+        for i, line in enumerate(content.split("\n")):
+            if i:
+                line_feeds += 1
+                max_width = full_width
+                line_width = 0.0
+            for j, word in enumerate(line.split(" ")):
+                if j:
+                    if line_width + space > max_width:
+                        # Space that does not fit is dropped at the break
+                        line_feeds += 1
+                        max_width = full_width
+                        line_width = 0.0
+                    else:
+                        line_width += space
+                word_width = (
+                    sum(widths.get(char, _DEFAULT_CHAR_WIDTH) for char in word) * scale
+                )
+                if line_width + word_width > max_width and line_width:
+                    line_feeds += 1
+                    max_width = full_width
+                    line_width = 0.0
+                while word_width > max_width:
+                    # Word longer than a line is broken between characters
+                    line_feeds += 1
+                    word_width -= max_width
+                    max_width = full_width
+                line_width += word_width
+        # Next write continues where this one's text ends
+        if max_width == full_width:
+            x = line_width
+        else:
+            x += line_width
+    return line_feeds
+
+
+def _positions(
+    blocks: list[Block], line_feeds: list[int], plan: RenderPlan, pdf: FPDF
+) -> list[Position]:
+    """Start of every block, and end of the last, from its line feeds.
+
+    Repeats the arithmetic of serial rendering: write checks for a page break
+    before each line and moves down by line height between lines, and each
+    block ends with ln of its advance.
+    """
+    top = pdf.t_margin
+    trigger = pdf.page_break_trigger
+    page = 1
+    y = top
+    positions = []
+    for (level, runs), feeds in zip(blocks, line_feeds, strict=True):
+        positions.append((page, y))
+        block = plan.block(level)
+        line_height = block.line_height
+        if runs:
+            for line in range(feeds + 1):
+                if line:
+                    y += line_height
+                if y + line_height > trigger:
+                    page += 1
+                    y = top
+        y += block.advance
+    positions.append((page, y))
+    return positions
+
+
+def _fonts_used(blocks: list[Block], plan: RenderPlan) -> list[Font]:
+    """Fonts in order of first use, one per font key, as serial sets them."""
+    fonts: dict[str, Font] = {}
+    for level, runs in blocks:
+        block_fonts = plan.block(level).fonts
+        for _, styles in runs:
+            font = block_fonts[styles]
+            fonts.setdefault(_font_key(font), font)
+    return list(fonts.values())
+
+
+def _chunk_bounds(blocks: list[Block], chunks: int) -> list[int]:
+    """Indexes splitting blocks into chunks of about equal text length."""
+    sizes = [sum(len(content) for content, _ in runs) for _, runs in blocks]
+    total = sum(sizes)
+    bounds = [0]
+    done = 0
+    for index, size in enumerate(sizes):
+        if done >= total * len(bounds) / chunks and index > bounds[-1]:
+            bounds.append(index)
+        done += size
+    bounds.append(len(blocks))
+    return bounds
+
+
+def _chunk_starts(
+    blocks: list[Block],
+    bounds: list[int],
+    positions: list[Position],
+    plan: RenderPlan,
+) -> list[_ChunkStart]:
+    starts = []
+    font = None
+    for chunk, start in enumerate(bounds[:-1]):
+        starts.append(_ChunkStart(positions[start], font, chunk == 0))
+        # Font current after chunk is that of its last run
+        for level, runs in blocks[start : bounds[chunk + 1]]:
+            for _, styles in runs:
+                font = plan.block(level).fonts[styles]
+    return starts
+
+
+def _lines_up(starts: list[_ChunkStart], results: list[_ChunkResult]) -> bool:
+    """Whether each chunk ended where the next was started."""
+    for start, result, next_start in zip(starts, results, starts[1:], strict=False):
+        page, y = result.end
+        if (start.position[0] + page - 1, y) != next_start.position:
+            return False
+    return True
+
+
+def _join(
+    results: list[_ChunkResult],
+    starts: list[_ChunkStart],
+    plan: RenderPlan,
+    fonts_used: list[Font],
+) -> FPDF:
+    # Plain FPDF, as fonts were set in worker processes, not on this document
+    pdf = _new_pdf(plan)
+    _register_fonts(pdf, fonts_used)
+    contents: list[bytearray] = []
+    resources = pdf._resource_catalog.resources_per_page
+    for start, result in zip(starts, results, strict=True):
+        first, *rest = result.contents
+        if start.first:
+            contents.append(bytearray(first))
+        else:
+            # Chunk starts in the middle of previous chunk's last page
+            contents[-1] += first
+        offset = start.position[0] - 1
+        for (page, resource_type), names in result.resources.items():
+            resources[(offset + page, resource_type)] |= names
+        contents.extend(bytearray(content) for content in rest)
+
+    for content in contents:
+        pdf.add_page()
+        pdf.pages[pdf.page].contents = content
+    return pdf
+
+
+def build_pdf_parallel(
+    tokens, style: Style, jobs: int = 0, pdf_class: type[FPDF] = FPDF
+) -> FPDF:
+    """Render tokens like _build_pdf, in jobs worker processes.
+
+    jobs 0 means one per CPU core. Documents shorter than PARALLEL_MIN_CHARS
+    and styles with font files are rendered serially, into an instance of
+    pdf_class. Documents joined from worker processes are plain FPDF.
+    """
+    blocks = [(level, list(runs)) for level, runs in _blocks(tokens)]
+    if jobs == 0:
+        jobs = os.process_cpu_count() or 1
+    chars = sum(len(content) for _, runs in blocks for content, _ in runs)
+    plan = render_plan(style)
+    # Text in font files is written as glyph codes numbered per document, so
+    # pages using them cannot be joined
+    if jobs <= 1 or len(blocks) < 2 or chars < PARALLEL_MIN_CHARS or plan.font_files:
+        return _build_pdf_from_blocks(blocks, style, pdf_class)
+
+    # Only for page geometry, as fpdf computes it
+    geometry = _new_pdf(plan)
+    fonts_used = _fonts_used(blocks, plan)
+    bounds = _chunk_bounds(blocks, jobs)
+    chunks = [blocks[start:end] for start, end in itertools.pairwise(bounds)]
+
+    estimated = [
+        _estimate_line_feeds(runs, plan.block(level), geometry)
+        for level, runs in blocks
+    ]
+    starts = _chunk_starts(
+        blocks, bounds, _positions(blocks, estimated, plan, geometry), plan
+    )
+
+    with ProcessPoolExecutor(max_workers=min(jobs, len(chunks))) as executor:
+        results = list(
+            executor.map(
+                _render_chunk,
+                chunks,
+                [style] * len(chunks),
+                starts,
+                [fonts_used] * len(chunks),
+            )
+        )
+        if not _lines_up(starts, results):
+            line_feeds = [feeds for result in results for feeds in result.line_feeds]
+            exact = _chunk_starts(
+                blocks, bounds, _positions(blocks, line_feeds, plan, geometry), plan
+            )
+            redo = [
+                chunk for chunk, start in enumerate(exact) if start != starts[chunk]
+            ]
+            redone = executor.map(
+                _render_chunk,
+                [chunks[chunk] for chunk in redo],
+                [style] * len(redo),
+                [exact[chunk] for chunk in redo],
+                [fonts_used] * len(redo),
+            )
+            for chunk, result in zip(redo, redone, strict=True):
+                results[chunk] = result
+            starts = exact
+
+    if not _lines_up(starts, results):
+        return _build_pdf_from_blocks(blocks, style, pdf_class)
+    return _join(results, starts, plan, fonts_used)
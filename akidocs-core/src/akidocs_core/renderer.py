@@ -1,91 +1,390 @@
+import os
+import time
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass, fields
+from functools import cache, lru_cache
+from pathlib import Path
+from typing import BinaryIO
+
 from fpdf import FPDF
 
+from akidocs_core import font_files, instrumentation
+from akidocs_core.inline_tokenizer import coalesce_inline
 from akidocs_core.style_base import Style, mm_to_pt
 from akidocs_core.styles import GENERIC
+from akidocs_core.token_buffer import STYLE_BITS, TokenBuffer, mask_styles
 from akidocs_core.tokens import (
-    Bold,
-    Code,
+    BOLD,
+    CODE,
+    ITALIC,
     Header,
+    InlineStyles,
     InlineText,
-    Italic,
     Paragraph,
     Token,
 )
 
 
-def _render_inline_tokens(
-    pdf: FPDF,
-    tokens: list[InlineText],
+@cache
+def _resolve_font(
+    styles: frozenset[InlineStyles],
     base_style: str,
-    size_pt: float,
-    line_height: float,
     font_family: str,
     code_font_family: str,
     code_font_style: str,
-) -> None:
-    for token in tokens:
-        if Code() in token.styles:
-            style = code_font_style
-        else:
-            style = base_style
-            if Bold() in token.styles:
-                style += "B"
-            if Italic() in token.styles:
-                style += "I"
-            style = "".join(sorted(set(style)))
-        active_font = code_font_family if Code() in token.styles else font_family
-        pdf.set_font(active_font, style=style, size=size_pt)
-        pdf.write(line_height, token.content)
-
-
-def _render_header(
-    pdf: FPDF, level: int, content: list[InlineText], style: Style
-) -> None:
-    size_mm = style.header_font_sizes.get(level, style.base_font_size)
-    size_pt = mm_to_pt(size_mm)
-    line_height = size_mm * style.header_line_height_factor
-    _render_inline_tokens(
-        pdf,
-        content,
-        style.header_base_font_style,
-        size_pt,
-        line_height,
-        style.font_family,
-        style.code_font_family,
-        style.code_font_style,
-    )
-    pdf.ln(line_height + style.header_margin_after)
+) -> tuple[str, str]:
+    """Font family and style for inline styles, computed once per combination."""
+    if CODE in styles:
+        return code_font_family, code_font_style
+    style = base_style
+    if BOLD in styles:
+        style += "B"
+    if ITALIC in styles:
+        style += "I"
+    return font_family, "".join(sorted(set(style)))
+
+
+# Font as set_font arguments: (family, style, size in points)
+Font = tuple[str, str, float]
+
+
+class _FontState:
+    """Sets fonts on pdf, skipping set_font when the font is already current.
+
+    Font files are registered on first use, as fpdf embeds every registered
+    font whether used or not.
+    """
+
+    def __init__(
+        self, pdf: FPDF, files: dict[tuple[str, str], Path] | None = None
+    ) -> None:
+        self.pdf = pdf
+        self.current: Font | None = None
+        # Files not yet registered, by (family, style)
+        self.files = dict(files) if files else {}
+
+    def set_font(self, font: Font) -> None:
+        if font != self.current:
+            family, style, size_pt = font
+            if self.files and (family, style) in self.files:
+                path = self.files.pop((family, style))
+                font_files.add_font(self.pdf, family, style, path)
+            self.pdf.set_font(family, style=style, size=size_pt)
+            self.current = font
+
+
+# Inline content as (text, styles) pairs, after coalescing
+Runs = Iterable[tuple[str, frozenset[InlineStyles]]]
+
+
+class _Fonts(dict[frozenset[InlineStyles], Font]):
+    """Font of each inline style set, for one kind of block.
+
+    Holds every canonical style set from the start. Other sets, with style
+    classes of their own, are resolved on first use.
+    """
+
+    def __init__(self, style: Style, base_style: str, size_pt: float) -> None:
+        super().__init__()
+        self.font_args = (
+            base_style,
+            style.font_family,
+            style.code_font_family,
+            style.code_font_style,
+        )
+        self.size_pt = size_pt
+        for mask in range(1 << len(STYLE_BITS)):
+            self.__missing__(mask_styles(mask))
+
+    def __missing__(self, styles: frozenset[InlineStyles]) -> Font:
+        family, font_style = _resolve_font(styles, *self.font_args)
+        font = self[styles] = (family, font_style, self.size_pt)
+        return font
+
 
+@dataclass(frozen=True, slots=True)
+class _BlockPlan:
+    """Everything rendering one kind of block needs, computed ahead."""
 
-def _render_paragraph(pdf: FPDF, content: list[InlineText], style: Style) -> None:
-    size_pt = mm_to_pt(style.base_font_size)
-    line_height = style.base_font_size * style.paragraph_line_height_factor
-    _render_inline_tokens(
-        pdf,
-        content,
+    line_height: float
+    # Distance moved down after the block: line height plus margin after
+    advance: float
+    fonts: _Fonts
+
+
+@dataclass(frozen=True, slots=True)
+class RenderPlan:
+    """Style compiled for rendering. Use block for the plan of any block."""
+
+    margins: tuple[float, float, float, float]  # left, top, right, bottom
+    paragraph: _BlockPlan
+    # Headers of level 1 to 6 and of every level with a size in the style
+    headers: dict[int, _BlockPlan]
+    # All other headers, at base size
+    other_header: _BlockPlan
+    # TrueType file of each (family, style) used that is not a core font
+    font_files: dict[tuple[str, str], Path]
+
+    def block(self, level: int | None) -> _BlockPlan:
+        """Plan for paragraphs if level is None, else for headers of level."""
+        if level is None:
+            return self.paragraph
+        return self.headers.get(level, self.other_header)
+
+
+def _block_plan(
+    style: Style,
+    size_mm: float,
+    line_height_factor: float,
+    margin_after: float,
+    base_style: str,
+) -> _BlockPlan:
+    line_height = size_mm * line_height_factor
+    fonts = _Fonts(style, base_style, mm_to_pt(size_mm))
+    return _BlockPlan(line_height, line_height + margin_after, fonts)
+
+
+def _plan_font_files(
+    style: Style, blocks: Iterable[_BlockPlan]
+) -> dict[tuple[str, str], Path]:
+    """Font file of every font the blocks use from style.font_files."""
+    by_family: dict[str, dict[str, Path]] = {}
+    for font_file in style.font_files:
+        files = by_family.setdefault(font_file.family.lower(), {})
+        files["".join(sorted(font_file.style.upper()))] = Path(font_file.path)
+
+    plan_files = {}
+    for block in blocks:
+        for family, font_style, _ in block.fonts.values():
+            files = by_family.get(family.lower())
+            if files:
+                # Exact style, else regular, else whichever file there is
+                path = (
+                    files.get(font_style) or files.get("") or next(iter(files.values()))
+                )
+                plan_files[(family, font_style)] = path
+    return plan_files
+
+
+def compile_style(style: Style) -> RenderPlan:
+    """Build render plan of style. Use render_plan for a cached one."""
+    paragraph = _block_plan(
+        style,
+        style.base_font_size,
+        style.paragraph_line_height_factor,
+        style.paragraph_margin_after,
         style.paragraph_base_font_style,
-        size_pt,
-        line_height,
-        style.font_family,
-        style.code_font_family,
-        style.code_font_style,
     )
-    pdf.ln(line_height + style.paragraph_margin_after)
 
+    def header(size_mm: float) -> _BlockPlan:
+        return _block_plan(
+            style,
+            size_mm,
+            style.header_line_height_factor,
+            style.header_margin_after,
+            style.header_base_font_style,
+        )
 
-def render_pdf(tokens: list[Token], style: Style = GENERIC) -> bytes:
-    pdf = FPDF()
-    pdf.set_margins(
-        style.page_margin_left, style.page_margin_top, style.page_margin_right
+    sizes = style.header_font_sizes
+    headers = {
+        level: header(sizes.get(level, style.base_font_size))
+        for level in (*range(1, 7), *sizes)
+    }
+    other_header = header(style.base_font_size)
+    margins = (
+        style.page_margin_left,
+        style.page_margin_top,
+        style.page_margin_right,
+        style.page_margin_bottom,
     )
-    pdf.set_auto_page_break(auto=True, margin=style.page_margin_bottom)
-    pdf.add_page()
+    font_files = _plan_font_files(style, (paragraph, *headers.values(), other_header))
+    return RenderPlan(margins, paragraph, headers, other_header, font_files)
+
+
+# Styles whose plans are kept, most recently used first out
+PLAN_CACHE_SIZE = 32
+
+
+class _StyleKey:
+    """Style as a cache key, equal for styles with equal fields."""
+
+    __slots__ = ("fields", "style")
+
+    def __init__(self, style: Style) -> None:
+        self.style = style
+        # header_font_sizes is the one field that is not hashable
+        self.fields = tuple(
+            tuple(sorted(value.items())) if isinstance(value, dict) else value
+            for value in (getattr(style, field.name) for field in fields(style))
+        )
+
+    def __hash__(self) -> int:
+        return hash(self.fields)
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, _StyleKey) and self.fields == other.fields
+
+
+@lru_cache(maxsize=PLAN_CACHE_SIZE)
+def _cached_plan(key: _StyleKey) -> RenderPlan:
+    return compile_style(key.style)
+
+
+def render_plan(style: Style) -> RenderPlan:
+    """Render plan of style, compiled on first use.
+
+    Plans of the last PLAN_CACHE_SIZE distinct styles are kept, shared by
+    styles with equal fields.
+    """
+    return _cached_plan(_StyleKey(style))
+
+
+class _CountingFPDF(FPDF):
+    """FPDF that counts set_font calls changing the current font."""
+
+    font_switches = 0
+
+    def set_font(self, family=None, style="", size=0) -> None:
+        before = (self.font_family, self.font_style, self.font_size_pt)
+        super().set_font(family, style, size)
+        if (self.font_family, self.font_style, self.font_size_pt) != before:
+            self.font_switches += 1
+
+
+def _coalesced_runs(content: list[InlineText]) -> Runs:
+    # Empty plain runs would cost a write call each, for nothing
+    return [(inline.content, inline.styles) for inline in coalesce_inline(content)]
+
+
+# Block as (header level or None for paragraph, runs)
+Block = tuple[int | None, Runs]
+
+
+def _blocks(tokens: Iterable[Token]) -> Iterator[Block]:
+    """Yield (header level or None for paragraph, runs) of each block."""
+    if isinstance(tokens, TokenBuffer):
+        # Read arrays directly, without building token objects. Level 0
+        # stands for paragraphs there
+        for block, level in enumerate(tokens.levels):
+            yield level or None, tokens.coalesced_runs(block)
+        return
 
     for token in tokens:
         match token:
             case Header(level=level, content=content):
-                _render_header(pdf, level, content, style)
+                yield level, _coalesced_runs(content)
             case Paragraph(content=content):
-                _render_paragraph(pdf, content, style)
+                yield None, _coalesced_runs(content)
+
+
+def _new_pdf(plan: RenderPlan, pdf_class: type[FPDF] = FPDF) -> FPDF:
+    """Empty document with margins of plan, before its first page."""
+    left, top, right, bottom = plan.margins
+    pdf = pdf_class()
+    pdf.set_margins(left, top, right)
+    pdf.set_auto_page_break(auto=True, margin=bottom)
+    return pdf
+
+
+def _render_blocks(
+    pdf: FPDF, fonts: _FontState, plan: RenderPlan, blocks: Iterable[Block]
+) -> None:
+    for level, runs in blocks:
+        block = plan.block(level)
+        block_fonts = block.fonts
+        line_height = block.line_height
+        for content, styles in runs:
+            fonts.set_font(block_fonts[styles])
+            pdf.write(line_height, content)
+        pdf.ln(block.advance)
+
+
+def _build_pdf_from_blocks(
+    blocks: Iterable[Block], style: Style, pdf_class: type[FPDF] = FPDF
+) -> FPDF:
+    plan = render_plan(style)
+    pdf = _new_pdf(plan, pdf_class)
+    pdf.add_page()
+    _render_blocks(pdf, _FontState(pdf, plan.font_files), plan, blocks)
+    return pdf
+
+
+def _build_pdf(
+    tokens: Iterable[Token], style: Style, pdf_class: type[FPDF] = FPDF
+) -> FPDF:
+    return _build_pdf_from_blocks(_blocks(tokens), style, pdf_class)
+
+
+def _build(
+    tokens: Iterable[Token], style: Style, jobs: int, pdf_class: type[FPDF] = FPDF
+) -> FPDF:
+    if jobs == 1:
+        return _build_pdf(tokens, style, pdf_class)
+    # Imported here, as parallel_render builds on this module
+    from akidocs_core.parallel_render import build_pdf_parallel
+
+    return build_pdf_parallel(tokens, style, jobs, pdf_class)
+
+
+def _output_instrumented(
+    name: str,
+    tokens: Iterable[Token],
+    style: Style,
+    destination: str | os.PathLike[str] | BinaryIO | None,
+    jobs: int = 1,
+) -> bytearray | None:
+    counts = {"tokens": 0, "inline_tokens": 0}
+
+    def counted(tokens: Iterable[Token]) -> Iterator[Token]:
+        for token in tokens:
+            counts["tokens"] += 1
+            counts["inline_tokens"] += len(token.content)
+            yield token
+
+    if isinstance(tokens, TokenBuffer):
+        # Keep buffer as is, so it is still read directly
+        counts = {"tokens": len(tokens), "inline_tokens": tokens.run_count}
+    else:
+        tokens = counted(tokens)
+
+    began = time.perf_counter()
+    pdf = _build(tokens, style, jobs, _CountingFPDF)
+    result = pdf.output(destination)
+    seconds = time.perf_counter() - began
+    counts["pages"] = pdf.pages_count
+    if isinstance(pdf, _CountingFPDF):
+        # Not when pages were joined from worker processes, which set the
+        # fonts on documents of their own
+        counts["font_switches"] = pdf.font_switches
+    instrumentation.emit(name, seconds, **counts)
+    return result
+
+
+def render_pdf(tokens: Iterable[Token], style: Style = GENERIC, jobs: int = 1) -> bytes:
+    """Render tokens to PDF bytes. A TokenBuffer is read without building tokens.
+
+    With jobs other than 1, long documents are rendered by that many worker
+    processes, 0 for one per CPU core, see parallel_render. The PDF is the
+    same either way.
+    """
+    if instrumentation.sink is None:
+        return bytes(_build(tokens, style, jobs).output())
+    return bytes(_output_instrumented("render_pdf", tokens, style, None, jobs))
+
+
+def write_pdf(
+    tokens: Iterable[Token],
+    destination: str | os.PathLike[str] | BinaryIO,
+    style: Style = GENERIC,
+    jobs: int = 1,
+) -> None:
+    """Render tokens, consumed one at a time, and write PDF to path or stream.
 
-    return bytes(pdf.output())
+    Tokens can come straight from tokenizer.iter_tokens. Unlike render_pdf, no
+    copy of the finished PDF is returned. jobs is as in render_pdf, though
+    rendering in parallel first collects every token.
+    """
+    if instrumentation.sink is None:
+        _build(tokens, style, jobs).output(destination)
+        return
+    _output_instrumented("write_pdf", tokens, style, destination, jobs)
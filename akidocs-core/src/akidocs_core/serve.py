@@ -0,0 +1,300 @@
+"""Long-running conversion server on a Unix domain socket, and its client.
+
+Every message is a frame: payload length as 4-byte big-endian unsigned
+integer, then payload. A request is two frames, style name and Markdown
+text, both UTF-8. The response is two frames, status (b"ok" or b"error")
+and PDF bytes or UTF-8 error message. A connection can carry any number of
+requests, one after another. The server closes connections idle for
+CONNECTION_TIMEOUT seconds, and answers connections beyond its limit with an
+error response right away.
+"""
+
+import multiprocessing
+import os
+import socket
+import socketserver
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import BinaryIO, Self
+
+from akidocs_core.renderer import render_pdf
+from akidocs_core.styles import STYLES
+from akidocs_core.tokenizer import tokenize
+
+MAX_FRAME_BYTES = 64 * 1024 * 1024
+_LENGTH_BYTES = 4
+# Seconds a connection may wait for the next request, or the rest of a frame
+CONNECTION_TIMEOUT = 60.0
+# Open connections allowed per worker process by default
+CONNECTIONS_PER_WORKER = 8
+# Raised writing to a server that has refused the connection
+_REFUSED_ERRORS = (BrokenPipeError, ConnectionResetError)
+
+
+class ServeError(Exception):
+    """Server refused a request, or a peer broke the protocol."""
+
+
+def default_socket_path() -> Path:
+    """Socket in XDG_RUNTIME_DIR, or a per-user name in the temp directory."""
+    if runtime_dir := os.environ.get("XDG_RUNTIME_DIR"):
+        return Path(runtime_dir) / "akidocs.sock"
+    return Path(tempfile.gettempdir()) / f"akidocs-{os.getuid()}.sock"
+
+
+def _check_length(length: int, max_bytes: int) -> None:
+    if length > max_bytes:
+        raise ServeError(f"frame of {length} bytes exceeds limit of {max_bytes}")
+
+
+def write_frame(
+    stream: BinaryIO, payload: bytes, max_bytes: int = MAX_FRAME_BYTES
+) -> None:
+    """Write one frame, raising ServeError before writing if payload is too long."""
+    _check_length(len(payload), max_bytes)
+    stream.write(len(payload).to_bytes(_LENGTH_BYTES, "big"))
+    stream.write(payload)
+
+
+def read_frame(stream: BinaryIO, max_bytes: int = MAX_FRAME_BYTES) -> bytes:
+    """Read one frame, raising EOFError if stream ends before it starts."""
+    header = stream.read(_LENGTH_BYTES)
+    if not header:
+        raise EOFError
+    if len(header) < _LENGTH_BYTES:
+        raise ServeError("connection closed inside frame header")
+    length = int.from_bytes(header, "big")
+    _check_length(length, max_bytes)
+    payload = stream.read(length)
+    if len(payload) < length:
+        raise ServeError("connection closed inside frame")
+    return payload
+
+
+def render_markdown(markdown: str, style_name: str) -> bytes:
+    """Convert Markdown text to PDF bytes, run in worker processes."""
+    return render_pdf(tokenize(markdown), STYLES[style_name])
+
+
+def _warm_up() -> None:
+    # Load font metrics of every style before the first request arrives
+    for style in STYLES.values():
+        render_pdf(tokenize("# *a* **b** `c`\n\n*a* **b** `c`"), style)
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def setup(self) -> None:
+        # Applied to the socket by StreamRequestHandler.setup
+        self.timeout = self.server.connection_timeout
+        super().setup()
+
+    def handle(self) -> None:
+        while True:
+            try:
+                style_name = read_frame(self.rfile).decode("utf-8")
+                markdown = read_frame(self.rfile).decode("utf-8")
+            except EOFError:
+                # Client is done
+                return
+            except TimeoutError:
+                # Client idle or stalled for too long
+                return
+            except (ServeError, UnicodeDecodeError) as e:
+                # Stream position is unknown, connection cannot continue
+                self._respond(b"error", str(e).encode("utf-8"))
+                return
+
+            if style_name not in STYLES:
+                self._respond(b"error", f"unknown style: {style_name}".encode())
+                continue
+            try:
+                pdf = self.server.render(markdown, style_name)
+            except Exception as e:
+                self._respond(b"error", (str(e) or repr(e)).encode("utf-8"))
+                continue
+            # Clients would refuse the frame and lose their place in the stream
+            if len(pdf) > MAX_FRAME_BYTES:
+                message = f"PDF of {len(pdf)} bytes exceeds limit of {MAX_FRAME_BYTES}"
+                self._respond(b"error", message.encode("utf-8"))
+                continue
+            self._respond(b"ok", pdf)
+
+    def _respond(self, status: bytes, body: bytes) -> None:
+        write_frame(self.wfile, status)
+        write_frame(self.wfile, body)
+        self.wfile.flush()
+
+
+class ConversionServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Socket server handing conversions to a bounded pool of worker processes.
+
+    Each connection gets a thread that only waits on the pool, so at most
+    max_workers documents convert at a time and the rest queue. Workers keep
+    fpdf imported and fonts loaded between requests. A pool broken by a
+    worker that died is replaced.
+
+    At most max_connections connections are open at a time, by default
+    CONNECTIONS_PER_WORKER per worker, and each is closed once idle or
+    stalled for connection_timeout seconds.
+    """
+
+    daemon_threads = True
+
+    def __init__(
+        self,
+        socket_path: Path,
+        max_workers: int = 1,
+        max_connections: int | None = None,
+        connection_timeout: float | None = CONNECTION_TIMEOUT,
+    ) -> None:
+        self.socket_path = Path(socket_path)
+        _remove_stale_socket(self.socket_path)
+        self.max_workers = max_workers
+        self.max_connections = max_connections or CONNECTIONS_PER_WORKER * max_workers
+        self.connection_timeout = connection_timeout
+        self._connections = threading.BoundedSemaphore(self.max_connections)
+        # Guards replacing executor after a worker died
+        self._executor_lock = threading.Lock()
+        self.executor = self._new_executor()
+        try:
+            super().__init__(str(self.socket_path), _Handler)
+        except BaseException:
+            self.executor.shutdown()
+            raise
+
+    def _new_executor(self) -> ProcessPoolExecutor:
+        # Workers start on demand while handler threads run, so never fork
+        return ProcessPoolExecutor(
+            self.max_workers,
+            mp_context=multiprocessing.get_context("forkserver"),
+            initializer=_warm_up,
+        )
+
+    def render(self, markdown: str, style_name: str) -> bytes:
+        """Convert in a worker process, on a new pool if a worker died.
+
+        Requests that were on a broken pool are tried once more on the new
+        one, so only a document that breaks that one too fails.
+        """
+        executor = self.executor
+        try:
+            return executor.submit(render_markdown, markdown, style_name).result()
+        except BrokenProcessPool:
+            self._replace_executor(executor)
+        return self.executor.submit(render_markdown, markdown, style_name).result()
+
+    def _replace_executor(self, broken: ProcessPoolExecutor) -> None:
+        with self._executor_lock:
+            # Other requests on the same pool may have replaced it already
+            if self.executor is broken:
+                self.executor = self._new_executor()
+        broken.shutdown(wait=False)
+
+    def process_request(self, request, client_address) -> None:
+        if not self._connections.acquire(blocking=False):
+            _refuse(request, f"server busy, {self.max_connections} connections open")
+            self.shutdown_request(request)
+            return
+        try:
+            super().process_request(request, client_address)
+        except BaseException:
+            self._connections.release()
+            raise
+
+    def process_request_thread(self, request, client_address) -> None:
+        try:
+            super().process_request_thread(request, client_address)
+        finally:
+            self._connections.release()
+
+    def server_close(self) -> None:
+        super().server_close()
+        with self._executor_lock:
+            self.executor.shutdown(cancel_futures=True)
+        self.socket_path.unlink(missing_ok=True)
+
+
+def _refuse(request: socket.socket, message: str) -> None:
+    """Send an error response without reading the request."""
+    frames = bytearray()
+    for payload in (b"error", message.encode("utf-8")):
+        frames += len(payload).to_bytes(_LENGTH_BYTES, "big") + payload
+    try:
+        request.sendall(frames)
+    except OSError:
+        # Client already gone
+        pass
+
+
+def _remove_stale_socket(socket_path: Path) -> None:
+    """Remove socket file left by a server that is gone, refuse a live one."""
+    if not socket_path.exists():
+        return
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(str(socket_path))
+    except ConnectionRefusedError:
+        socket_path.unlink()
+        return
+    finally:
+        probe.close()
+    raise ServeError(f"a server is already listening on {socket_path}")
+
+
+class ServeClient:
+    """Connection to a ConversionServer, reusable for many conversions."""
+
+    def __init__(
+        self, socket_path: Path | None = None, timeout: float | None = None
+    ) -> None:
+        self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._socket.settimeout(timeout)
+        try:
+            self._socket.connect(str(socket_path or default_socket_path()))
+        except BaseException:
+            self._socket.close()
+            raise
+        self._stream = self._socket.makefile("rwb")
+
+    def convert(self, markdown: str, style_name: str = "generic") -> bytes:
+        """Convert Markdown text to PDF bytes, raising ServeError on failure."""
+        payloads = [style_name.encode("utf-8"), markdown.encode("utf-8")]
+        # Check both first, so a refused request leaves the connection usable
+        for payload in payloads:
+            _check_length(len(payload), MAX_FRAME_BYTES)
+        try:
+            for payload in payloads:
+                write_frame(self._stream, payload)
+            self._stream.flush()
+        except _REFUSED_ERRORS:
+            # Server refused the connection, its response may still be there
+            pass
+        try:
+            status = read_frame(self._stream)
+            body = read_frame(self._stream)
+        except EOFError:
+            raise ServeError("server closed connection") from None
+        if status != b"ok":
+            raise ServeError(body.decode("utf-8", errors="replace"))
+        return body
+
+    def close(self) -> None:
+        self._stream.close()
+        self._socket.close()
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+def request_pdf(
+    markdown: str, style_name: str = "generic", socket_path: Path | None = None
+) -> bytes:
+    """Convert one document on a running server, over a new connection."""
+    with ServeClient(socket_path) as client:
+        return client.convert(markdown, style_name)
@@ -1,4 +1,5 @@
 from dataclasses import dataclass
+from pathlib import Path
 
 MM_PER_POINT = 0.352778
 
@@ -13,6 +14,15 @@ def mm_to_pt(mm: float) -> float:
     return mm / MM_PER_POINT
 
 
+@dataclass(frozen=True)
+class FontFile:
+    """TrueType font file providing one style of a font family."""
+
+    family: str
+    path: Path
+    style: str = ""  # "", "B", "I", or "BI"
+
+
 @dataclass(frozen=True)
 class Style:
     """Document style configuration. All dimensions in millimeters."""
@@ -33,3 +43,7 @@ class Style:
     page_margin_right: float
     page_margin_bottom: float
     page_margin_left: float
+    # Font families other than the PDF core fonts (Helvetica, Times, Courier)
+    # need their files here. A style missing from a family's files falls back
+    # to its regular file
+    font_files: tuple[FontFile, ...] = ()
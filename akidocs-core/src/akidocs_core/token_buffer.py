@@ -0,0 +1,139 @@
+from array import array
+from collections.abc import Iterable, Iterator, Sequence
+from functools import cache
+
+from akidocs_core.tokens import (
+    BOLD,
+    CODE,
+    ITALIC,
+    Header,
+    InlineStyles,
+    InlineText,
+    Paragraph,
+    Token,
+    canonical_styles,
+)
+
+# Bit of each inline style in a style mask
+STYLE_BITS: dict[InlineStyles, int] = {BOLD: 1, ITALIC: 2, CODE: 4}
+
+# Canonical style set for every mask
+_MASK_STYLES = [
+    canonical_styles(
+        frozenset(style for style, bit in STYLE_BITS.items() if mask & bit)
+    )
+    for mask in range(1 << len(STYLE_BITS))
+]
+
+# Highest header level a TokenBuffer can hold
+_MAX_LEVEL = 255
+
+
+@cache
+def style_mask(styles: frozenset[InlineStyles]) -> int:
+    """Bitmask of styles, from STYLE_BITS."""
+    return sum(STYLE_BITS[style] for style in styles)
+
+
+def mask_styles(mask: int) -> frozenset[InlineStyles]:
+    """Canonical style set of bitmask."""
+    return _MASK_STYLES[mask]
+
+
+class TokenBuffer(Sequence[Token]):
+    """Array-backed store of tokens, for documents with millions of runs.
+
+    Blocks and inline runs live in parallel arrays instead of objects:
+    levels[b] is the header level of block b (0 for a paragraph) and its
+    runs are run_starts[b] up to run_starts[b + 1]. Run r is text[offsets[r]:
+    offsets[r + 1]] with style bitmask masks[r]. Indexing and iterating
+    build Header and Paragraph tokens on the fly, equal to those appended.
+    """
+
+    def __init__(self, tokens: Iterable[Token] = ()) -> None:
+        self.levels = array("B")
+        self.run_starts = array("Q", [0])
+        self.offsets = array("Q", [0])
+        self.masks = array("B")
+        # Text of each appended block, joined on first read of text
+        self._pieces: list[str] = []
+        self.extend(tokens)
+
+    def append(self, token: Token) -> None:
+        match token:
+            case Header(level=level, content=content):
+                if not 1 <= level <= _MAX_LEVEL:
+                    # 0 stands for paragraphs, and levels are stored in bytes
+                    raise ValueError(
+                        f"header level must be 1 to {_MAX_LEVEL} in a TokenBuffer, got {level}"
+                    )
+                self.levels.append(level)
+            case Paragraph(content=content):
+                self.levels.append(0)
+            case _:
+                raise TypeError(f"expected Header or Paragraph, got {token!r}")
+        offset = self.offsets[-1]
+        for inline in content:
+            offset += len(inline.content)
+            self.offsets.append(offset)
+            self.masks.append(style_mask(inline.styles))
+        self.run_starts.append(len(self.masks))
+        self._pieces.append("".join(inline.content for inline in content))
+
+    def extend(self, tokens: Iterable[Token]) -> None:
+        for token in tokens:
+            self.append(token)
+
+    @property
+    def text(self) -> str:
+        """All run text, as one shared string."""
+        if len(self._pieces) != 1:
+            self._pieces = ["".join(self._pieces)]
+        return self._pieces[0]
+
+    @property
+    def run_count(self) -> int:
+        return len(self.masks)
+
+    def runs(self, block: int) -> Iterator[tuple[str, int]]:
+        """Yield (content, style mask) of each inline run of block."""
+        text = self.text
+        offsets = self.offsets
+        masks = self.masks
+        for run in range(self.run_starts[block], self.run_starts[block + 1]):
+            yield text[offsets[run] : offsets[run + 1]], masks[run]
+
+    def coalesced_runs(
+        self, block: int
+    ) -> Iterator[tuple[str, frozenset[InlineStyles]]]:
+        """Yield (content, styles) of block's runs as coalesce_inline keeps them."""
+        text = self.text
+        offsets = self.offsets
+        masks = self.masks
+        for run in range(self.run_starts[block], self.run_starts[block + 1]):
+            run_start = offsets[run]
+            run_end = offsets[run + 1]
+            mask = masks[run]
+            if run_start != run_end or mask:
+                yield text[run_start:run_end], _MASK_STYLES[mask]
+
+    def _token(self, block: int) -> Token:
+        content = [
+            InlineText(content, mask_styles(mask)) for content, mask in self.runs(block)
+        ]
+        level = self.levels[block]
+        if level:
+            return Header(level=level, content=content)
+        return Paragraph(content=content)
+
+    def __len__(self) -> int:
+        return len(self.levels)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._token(block) for block in range(len(self))[index]]
+        return self._token(range(len(self))[index])
+
+    def __iter__(self) -> Iterator[Token]:
+        for block in range(len(self)):
+            yield self._token(block)
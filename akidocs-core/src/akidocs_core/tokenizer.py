@@ -1,8 +1,28 @@
+import os
+import time
+from collections.abc import Iterable, Iterator
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+
+from akidocs_core import inline_cache, instrumentation
+from akidocs_core.inline_cache import CacheUpdates, InlineCache
 from akidocs_core.inline_tokenizer import tokenize_inline
+from akidocs_core.instrumentation import Event
+from akidocs_core.token_buffer import TokenBuffer
 from akidocs_core.tokens import Header, Paragraph, Token
 
+# Block before inline tokenization: (header level, inline source), where level
+# 0 is a paragraph
+Block = tuple[int, str]
 
-def try_parse_header(block: str) -> Header | None:
+# Below this many characters, starting worker processes costs more than
+# parallel inline tokenization saves
+PARALLEL_MIN_CHARS = 1_000_000
+# Characters of block source in each chunk sent to a worker
+PARALLEL_CHUNK_CHARS = 256 * 1024
+
+
+def _parse_header_block(block: str) -> Block | None:
     if not block.startswith("#"):
         return None
 
@@ -20,54 +40,252 @@ def try_parse_header(block: str) -> Header | None:
         if new_stripped and new_stripped[-1] in (" ", "\t"):
             stripped = new_stripped
 
-    return Header(level=level, content=tokenize_inline(stripped.strip()))
+    return level, stripped.strip()
 
 
-def tokenize(text: str) -> list[Token]:
-    text = text.replace("\r\n", "\n")
+def try_parse_header(block: str) -> Header | None:
+    header = _parse_header_block(block)
+    if header is None:
+        return None
+    level, source = header
+    return Header(level=level, content=tokenize_inline(source))
 
-    if text == "":
-        return []
 
-    lines = text.split("\n")
-    tokens: list[Token] = []
-    paragraph_lines: list[str] = []
+def _join_paragraph(paragraph_lines: list[str]) -> str:
+    parts: list[str] = []
+    for i, line in enumerate(paragraph_lines):
+        stripped_line = line.rstrip(" ")
+        trailing_spaces = len(line) - len(stripped_line)
+        if i < len(paragraph_lines) - 1 and trailing_spaces >= 2:
+            parts.append(stripped_line + "\n")
+        elif i < len(paragraph_lines) - 1:
+            parts.append(stripped_line + " ")
+        else:
+            parts.append(stripped_line)
 
-    def flush_paragraph() -> None:
-        if not paragraph_lines:
-            return
-
-        parts: list[str] = []
-        for i, line in enumerate(paragraph_lines):
-            stripped_line = line.rstrip(" ")
-            trailing_spaces = len(line) - len(stripped_line)
-            if i < len(paragraph_lines) - 1 and trailing_spaces >= 2:
-                parts.append(stripped_line + "\n")
-            elif i < len(paragraph_lines) - 1:
-                parts.append(stripped_line + " ")
-            else:
-                parts.append(stripped_line)
-
-        joined = "".join(parts).strip()
-        if joined:
-            tokens.append(Paragraph(content=tokenize_inline(joined)))
-        paragraph_lines.clear()
+    return "".join(parts).strip()
+
+
+def iter_blocks(lines: Iterable[str]) -> Iterator[Block]:
+    """Split lines (without line endings) into blocks, yielding each once closed."""
+    paragraph_lines: list[str] = []
 
     for line in lines:
         stripped = line.strip()
 
         if stripped == "":
-            flush_paragraph()
+            if paragraph_lines:
+                joined = _join_paragraph(paragraph_lines)
+                if joined:
+                    yield 0, joined
+                paragraph_lines.clear()
             continue
 
-        header = try_parse_header(stripped)
+        header = _parse_header_block(stripped)
         if header:
-            flush_paragraph()
-            tokens.append(header)
+            if paragraph_lines:
+                joined = _join_paragraph(paragraph_lines)
+                if joined:
+                    yield 0, joined
+                paragraph_lines.clear()
+            yield header
             continue
 
         paragraph_lines.append(line)
 
-    flush_paragraph()
+    if paragraph_lines:
+        joined = _join_paragraph(paragraph_lines)
+        if joined:
+            yield 0, joined
+
+
+def block_to_token(block: Block) -> Token:
+    """Inline tokenize block into its Header or Paragraph token.
+
+    Uses the active inline cache, if one is set.
+    """
+    level, source = block
+    cache = inline_cache.active
+    if cache is None:
+        content = tokenize_inline(source)
+    else:
+        # Tokens are shared with other blocks of the same text
+        content = list(cache.tokenize(source))
+    if level:
+        return Header(level=level, content=content)
+    return Paragraph(content=content)
+
+
+def _split_lines(fileobj: Iterable[str]) -> Iterator[str]:
+    """Yield lines of fileobj split only at LF, as tokenize splits its text."""
+    # Universal newlines mode also splits at lone CR, join those parts back
+    pending = ""
+    for line in fileobj:
+        if not line.endswith("\n"):
+            pending += line
+            continue
+        yield (pending + line[:-1]).removesuffix("\r")
+        pending = ""
+    yield pending
+
+
+def iter_tokens(fileobj: Iterable[str]) -> Iterator[Token]:
+    """Tokenize text file object line by line, yielding tokens as blocks close.
+
+    Only the lines of the current paragraph are kept in memory. CRLF line
+    endings are handled as in tokenize.
+    """
+    blocks = iter_blocks(_split_lines(fileobj))
+    if instrumentation.sink is None:
+        for block in blocks:
+            yield block_to_token(block)
+        return
+
+    # Time only own work, not the consumer's between yields
+    seconds = 0.0
+    tokens = 0
+    inline_tokens = 0
+    while True:
+        began = time.perf_counter()
+        block = next(blocks, None)
+        if block is None:
+            seconds += time.perf_counter() - began
+            break
+        token = block_to_token(block)
+        seconds += time.perf_counter() - began
+        tokens += 1
+        inline_tokens += len(token.content)
+        yield token
+    instrumentation.emit(
+        "iter_tokens", seconds, tokens=tokens, inline_tokens=inline_tokens
+    )
+
+
+def _chunk_blocks(blocks: Iterable[Block], chunk_chars: int) -> Iterator[list[Block]]:
+    """Group consecutive blocks into chunks of about chunk_chars source."""
+    chunk: list[Block] = []
+    chars = 0
+    for block in blocks:
+        chunk.append(block)
+        chars += len(block[1])
+        if chars >= chunk_chars:
+            yield chunk
+            chunk = []
+            chars = 0
+    if chunk:
+        yield chunk
 
+
+@dataclass
+class _ChunkResult:
+    # Sent back as a few arrays, far cheaper to pickle than token objects
+    buffer: TokenBuffer
+    # Events of the worker, for the parent's sink
+    events: list[Event]
+    # Inline cache entries and stats, merged into the parent's cache
+    inline_updates: CacheUpdates | None
+
+
+# Events of this worker process since its last chunk, if the parent has a sink
+_worker_events: list[Event] | None = None
+
+
+def _start_worker(cache: InlineCache | None, record: bool) -> None:
+    global _worker_events
+    if cache is not None:
+        # A forked worker's copy still counts the parent's lookups
+        cache.take_updates()
+    inline_cache.set_active(cache)
+    if record:
+        _worker_events = []
+        instrumentation.set_sink(_worker_events.append)
+
+
+def _tokenize_chunk(chunk: list[Block]) -> _ChunkResult:
+    buffer = TokenBuffer(block_to_token(block) for block in chunk)
+    events = []
+    if _worker_events is not None:
+        events = _worker_events[:]
+        _worker_events.clear()
+    cache = inline_cache.active
+    updates = None if cache is None else cache.take_updates()
+    return _ChunkResult(buffer, events, updates)
+
+
+def _tokenize_parallel(blocks: Iterable[Block], jobs: int) -> list[Token]:
+    """Inline tokenize blocks in worker processes.
+
+    Workers start with a copy of the active inline cache and send new entries
+    back to be merged into it, with their events for the sink, so both see
+    the same as serial tokenizing would.
+    """
+    cache = inline_cache.active
+    tokens: list[Token] = []
+    with ProcessPoolExecutor(
+        max_workers=jobs,
+        initializer=_start_worker,
+        initargs=(cache, instrumentation.sink is not None),
+    ) as executor:
+        # map yields results in submission order, so output is deterministic
+        chunks = _chunk_blocks(blocks, PARALLEL_CHUNK_CHARS)
+        for result in executor.map(_tokenize_chunk, chunks):
+            tokens.extend(result.buffer)
+            for event in result.events:
+                instrumentation.emit(event.name, event.seconds, **event.counts)
+            if cache is not None and result.inline_updates is not None:
+                cache.merge(result.inline_updates)
     return tokens
+
+
+def _tokenize(text: str, jobs: int = 1) -> list[Token]:
+    text = text.replace("\r\n", "\n")
+
+    if text == "":
+        return []
+
+    blocks = iter_blocks(text.split("\n"))
+    if jobs == 0:
+        jobs = os.process_cpu_count() or 1
+    if jobs > 1 and len(text) >= PARALLEL_MIN_CHARS:
+        return _tokenize_parallel(blocks, jobs)
+    return [block_to_token(block) for block in blocks]
+
+
+def tokenize(text: str, jobs: int = 1) -> list[Token]:
+    """Tokenize Markdown text into Header and Paragraph tokens.
+
+    With jobs other than 1, texts of at least PARALLEL_MIN_CHARS characters
+    are split into blocks first, and the blocks are inline tokenized in
+    chunks by that many worker processes, 0 for one per CPU core. Tokens
+    are the same either way.
+    """
+    if instrumentation.sink is None:
+        return _tokenize(text, jobs)
+
+    began = time.perf_counter()
+    tokens = _tokenize(text, jobs)
+    seconds = time.perf_counter() - began
+    instrumentation.emit(
+        "tokenize",
+        seconds,
+        chars_in=len(text),
+        bytes_in=len(text.encode("utf-8")),
+        tokens=len(tokens),
+        inline_tokens=sum(len(token.content) for token in tokens),
+    )
+    return tokens
+
+
+def tokenize_to_buffer(text: str) -> TokenBuffer:
+    """Tokenize text into a TokenBuffer, one block at a time.
+
+    Only the current block's tokens exist as objects, so memory stays low for
+    documents with millions of inline runs. For a text file object, use
+    TokenBuffer(iter_tokens(fileobj)).
+    """
+    buffer = TokenBuffer()
+    text = text.replace("\r\n", "\n")
+    if text:
+        for block in iter_blocks(text.split("\n")):
+            buffer.append(block_to_token(block))
+    return buffer
@@ -1,40 +1,79 @@
 from dataclasses import dataclass
+from functools import cache
 
 
 class InlineStyles:
-    """Marker base class for inline styles."""
+    """Marker base class for inline styles.
+
+    Each style class has a single instance, so Bold() is always the same
+    object and style checks cost no allocation.
+    """
+
+    __slots__ = ()
+
+    def __new__(cls):
+        instance = _style_instances.get(cls)
+        if instance is None:
+            instance = super().__new__(cls)
+            _style_instances[cls] = instance
+        return instance
 
-    pass
 
+_style_instances: dict[type, InlineStyles] = {}
 
-@dataclass(frozen=True)
+
+@dataclass(frozen=True, slots=True)
 class Bold(InlineStyles):
     pass
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class Italic(InlineStyles):
     pass
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class Code(InlineStyles):
     pass
 
 
-@dataclass
+BOLD = Bold()
+ITALIC = Italic()
+CODE = Code()
+
+_canonical: dict[frozenset[InlineStyles], frozenset[InlineStyles]] = {}
+
+
+def canonical_styles(styles: frozenset[InlineStyles]) -> frozenset[InlineStyles]:
+    """Shared frozenset equal to styles, so equal style sets are one object."""
+    return _canonical.setdefault(styles, styles)
+
+
+@cache
+def combine_styles(
+    styles: frozenset[InlineStyles], added: frozenset[InlineStyles]
+) -> frozenset[InlineStyles]:
+    """Canonical union of two style sets, computed once per pair."""
+    return canonical_styles(styles | added)
+
+
+PLAIN = canonical_styles(frozenset())
+CODE_STYLES = canonical_styles(frozenset({CODE}))
+
+
+@dataclass(frozen=True, slots=True)
 class InlineText:
     content: str
-    styles: frozenset[InlineStyles] = frozenset()
+    styles: frozenset[InlineStyles] = PLAIN
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class Header:
     level: int
     content: list[InlineText]
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class Paragraph:
     content: list[InlineText]
 
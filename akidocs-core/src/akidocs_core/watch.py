@@ -0,0 +1,150 @@
+import sys
+import time
+from collections.abc import Callable
+from pathlib import Path
+
+from akidocs_core.renderer import write_pdf
+from akidocs_core.style_base import Style
+from akidocs_core.tokenizer import block_to_token, iter_blocks
+from akidocs_core.tokens import Token
+
+
+class IncrementalTokenizer:
+    """Tokenizer that reuses tokens of unchanged blank-line-separated chunks.
+
+    Blank lines always close a block, so each chunk between them tokenizes
+    the same on its own as within the whole document. Tokens of the previous
+    call are kept, keyed by chunk text, and only new or edited chunks go
+    through inline tokenization again.
+
+    After each call, tokenized and reused count the blocks, that is headers
+    and paragraphs, of new or edited chunks and of unchanged chunks.
+    """
+
+    def __init__(self) -> None:
+        self._chunks: dict[str, list[Token]] = {}
+        self.reused = 0
+        self.tokenized = 0
+
+    def tokenize(self, text: str) -> list[Token]:
+        lines = text.replace("\r\n", "\n").split("\n")
+        previous = self._chunks
+        self._chunks = {}
+        self.reused = 0
+        self.tokenized = 0
+
+        tokens: list[Token] = []
+        chunk_lines: list[str] = []
+        # Trailing blank line flushes final chunk
+        for line in [*lines, ""]:
+            if line.strip():
+                chunk_lines.append(line)
+                continue
+            if not chunk_lines:
+                continue
+
+            chunk = "\n".join(chunk_lines)
+            chunk_tokens = self._chunks.get(chunk)
+            if chunk_tokens is None:
+                chunk_tokens = previous.get(chunk)
+                if chunk_tokens is None:
+                    chunk_tokens = [
+                        block_to_token(block) for block in iter_blocks(chunk_lines)
+                    ]
+                    self.tokenized += len(chunk_tokens)
+                else:
+                    self.reused += len(chunk_tokens)
+                self._chunks[chunk] = chunk_tokens
+            else:
+                self.reused += len(chunk_tokens)
+            tokens.extend(chunk_tokens)
+            chunk_lines = []
+
+        return tokens
+
+
+def _file_state(path: Path) -> tuple[int, int] | None:
+    try:
+        stat = path.stat()
+    except FileNotFoundError:
+        # Editors may replace file by deleting and renaming, wait for it
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def wait_for_change(
+    path: Path,
+    last_state: tuple[int, int] | None,
+    interval: float,
+    debounce: float,
+    sleep: Callable[[float], None] = time.sleep,
+) -> tuple[int, int] | None:
+    """Poll path until it changes and then stays unchanged for debounce seconds.
+
+    Returns the new state, to pass back in as last_state on the next call.
+    """
+    state = last_state
+    while state == last_state:
+        sleep(interval)
+        state = _file_state(path)
+
+    # Burst of saves, wait until file has settled
+    quiet = 0.0
+    while quiet < debounce:
+        sleep(interval)
+        new_state = _file_state(path)
+        if new_state != state:
+            state = new_state
+            quiet = 0.0
+        else:
+            quiet += interval
+    return state
+
+
+def watch(
+    input_path: Path,
+    output_path: Path,
+    style: Style,
+    interval: float = 0.2,
+    debounce: float = 0.3,
+    build_first: bool = True,
+    max_builds: int | None = None,
+) -> None:
+    """Rebuild output_path whenever input_path changes, until interrupted.
+
+    With build_first, builds once right away, otherwise only tokenizes the
+    current input to reuse on the first change. max_builds stops the loop
+    after that many builds, mainly for tests.
+    """
+    tokenizer = IncrementalTokenizer()
+    state = _file_state(input_path)
+    builds = 0
+
+    if not build_first:
+        tokenizer.tokenize(input_path.read_text(encoding="utf-8"))
+    # Only changes after this point are noticed, so announce it here
+    print(f"Watching {input_path}, press Ctrl+C to stop", flush=True)
+    if not build_first:
+        state = wait_for_change(input_path, state, interval, debounce)
+
+    while True:
+        start = time.perf_counter()
+        try:
+            text = input_path.read_text(encoding="utf-8")
+            write_pdf(tokenizer.tokenize(text), output_path, style)
+        except Exception as e:
+            # Keep watching, next save may fix it
+            print(f"Error: {input_path}: {e}", file=sys.stderr, flush=True)
+        else:
+            elapsed = time.perf_counter() - start
+            total = tokenizer.reused + tokenizer.tokenized
+            print(
+                f"Built {output_path.name} in {elapsed:.3f} s "
+                f"({tokenizer.tokenized} of {total} blocks re-tokenized)",
+                flush=True,
+            )
+
+        builds += 1
+        if max_builds is not None and builds >= max_builds:
+            return
+        state = wait_for_change(input_path, state, interval, debounce)
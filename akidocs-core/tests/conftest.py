@@ -0,0 +1,9 @@
+import pytest
+
+from tests.helpers import make_font
+
+
+@pytest.fixture
+def font_path(tmp_path):
+    """Regular style of a small generated TrueType font."""
+    return make_font(tmp_path / "test-regular.ttf")
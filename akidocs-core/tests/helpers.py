@@ -0,0 +1,43 @@
+"""Helpers shared by tests."""
+
+import re
+
+from fontTools.fontBuilder import FontBuilder
+from fontTools.pens.ttGlyphPen import TTGlyphPen
+
+FONT_CHARS = " abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789.,!?*`#"
+
+
+def make_font(path, family="Test", style="Regular", chars=FONT_CHARS):
+    """Write TrueType font with a box glyph of its own width for each char."""
+    names = [".notdef", *(f"uni{ord(char):04X}" for char in chars)]
+    builder = FontBuilder(1000, isTTF=True)
+    builder.setupGlyphOrder(names)
+    builder.setupCharacterMap({ord(char): f"uni{ord(char):04X}" for char in chars})
+    glyphs = {}
+    for index, name in enumerate(names):
+        pen = TTGlyphPen(None)
+        width = 200 + index * 7
+        if name != "uni0020":
+            pen.moveTo((50, 0))
+            pen.lineTo((50, 700))
+            pen.lineTo((width, 700))
+            pen.lineTo((width, 0))
+            pen.closePath()
+        glyphs[name] = pen.glyph()
+    builder.setupGlyf(glyphs)
+    builder.setupHorizontalMetrics(
+        {name: (300 + index * 7, 50) for index, name in enumerate(names)}
+    )
+    builder.setupHorizontalHeader(ascent=800, descent=-200)
+    builder.setupNameTable({"familyName": family, "styleName": style})
+    builder.setupOS2(sTypoAscender=800, usWinAscent=800, usWinDescent=200)
+    builder.setupPost()
+    builder.save(str(path))
+    return path
+
+
+def without_dates(pdf: bytes) -> bytes:
+    """PDF without creation date and the ID derived from it, which vary by run."""
+    pdf = re.sub(rb"/CreationDate \(D:[^)]*\)", b"", pdf)
+    return re.sub(rb"/ID \[<[^]]*\]", b"", pdf)
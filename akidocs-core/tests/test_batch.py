@@ -0,0 +1,118 @@
+from pathlib import Path
+
+import pytest
+
+from akidocs_core.batch import (
+    BatchError,
+    BatchJob,
+    collect_jobs,
+    convert_job,
+    read_manifest,
+    run_jobs,
+)
+from akidocs_core.inline_cache import InlineCache
+from akidocs_core.styles import GENERIC
+
+
+@pytest.fixture
+def docs_tree(tmp_path):
+    docs = tmp_path / "docs"
+    (docs / "guide").mkdir(parents=True)
+    (docs / "index.md").write_text("# Index")
+    (docs / "guide" / "intro.md").write_text("Intro *text*")
+    (docs / "guide" / "notes.txt").write_text("not markdown")
+    return docs
+
+
+def test_collect_jobs_file(tmp_path):
+    jobs = collect_jobs([tmp_path / "a.md"], tmp_path / "out")
+    assert jobs == [BatchJob(tmp_path / "a.md", tmp_path / "out" / "a.pdf")]
+
+
+def test_collect_jobs_directory_mirrors_structure(docs_tree, tmp_path):
+    out = tmp_path / "out"
+    jobs = collect_jobs([docs_tree], out)
+    assert jobs == [
+        BatchJob(docs_tree / "guide" / "intro.md", out / "guide" / "intro.pdf"),
+        BatchJob(docs_tree / "index.md", out / "index.pdf"),
+    ]
+
+
+def test_collect_jobs_duplicate_outputs(tmp_path):
+    with pytest.raises(BatchError):
+        collect_jobs([tmp_path / "a" / "x.md", tmp_path / "b" / "x.md"], tmp_path)
+
+
+def test_read_manifest(tmp_path):
+    manifest = tmp_path / "manifest.txt"
+    manifest.write_text("# comment\n\na.md\nsub/b.md\tpdf/b-out.pdf\n")
+
+    jobs = read_manifest(manifest, None)
+
+    assert jobs == [
+        BatchJob(tmp_path / "a.md", tmp_path / "a.pdf"),
+        BatchJob(tmp_path / "sub" / "b.md", tmp_path / "pdf" / "b-out.pdf"),
+    ]
+
+
+def test_read_manifest_with_output_dir(tmp_path):
+    manifest = tmp_path / "manifest.txt"
+    manifest.write_text("sub/a.md\n")
+
+    jobs = read_manifest(manifest, tmp_path / "out")
+
+    assert jobs == [BatchJob(tmp_path / "sub" / "a.md", tmp_path / "out" / "a.pdf")]
+
+
+def test_read_manifest_invalid_line(tmp_path):
+    manifest = tmp_path / "manifest.txt"
+    manifest.write_text("a.md\tb.pdf\tc.pdf\n")
+    with pytest.raises(BatchError, match=r"manifest\.txt:1"):
+        read_manifest(manifest, None)
+
+
+def test_convert_job(docs_tree, tmp_path):
+    job = BatchJob(docs_tree / "index.md", tmp_path / "out" / "nested" / "index.pdf")
+    result = convert_job(job, GENERIC)
+    assert result.error is None
+    assert result.seconds >= 0
+    assert job.output_path.read_bytes().startswith(b"%PDF")
+
+
+def test_convert_job_reports_error(tmp_path):
+    job = BatchJob(Path(tmp_path / "missing.md"), tmp_path / "missing.pdf")
+    result = convert_job(job, GENERIC)
+    assert result.error is not None
+    assert not job.output_path.exists()
+
+
+@pytest.mark.parametrize("max_workers", [1, 2])
+def test_run_jobs_keeps_input_order(tmp_path, max_workers):
+    jobs = []
+    for name in ["c", "a", "missing", "b"]:
+        if name != "missing":
+            (tmp_path / f"{name}.md").write_text(f"# {name}")
+        jobs.append(BatchJob(tmp_path / f"{name}.md", tmp_path / "out" / f"{name}.pdf"))
+
+    results = list(run_jobs(jobs, "g", max_workers))
+
+    assert [result.job for result in results] == jobs
+    assert [result.error is None for result in results] == [True, True, False, True]
+    assert (tmp_path / "out" / "b.pdf").exists()
+
+
+@pytest.mark.parametrize("max_workers", [1, 2])
+def test_run_jobs_shares_inline_cache(tmp_path, max_workers):
+    jobs = []
+    for name in ["a", "b", "c"]:
+        (tmp_path / f"{name}.md").write_text(f"# Notice\n\nSame **text**\n\n{name}")
+        jobs.append(BatchJob(tmp_path / f"{name}.md", tmp_path / f"{name}.pdf"))
+    cache = InlineCache()
+
+    results = list(run_jobs(jobs, "g", max_workers, inline_cache=cache))
+
+    assert all(result.error is None for result in results)
+    assert {"Notice", "Same **text**", "a", "b", "c"} <= set(cache._entries)
+    assert cache.stats.hits + cache.stats.misses == 9
+    if max_workers == 1:
+        assert cache.stats.hits == 4
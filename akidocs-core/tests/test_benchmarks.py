@@ -0,0 +1,77 @@
+import json
+
+import pytest
+
+from akidocs_core.tokenizer import tokenize
+from akidocs_core.tokens import Header, Paragraph
+from benchmarks.corpora import CORPORA
+from benchmarks.startup import import_time, run_startup
+from benchmarks.suite import compare, main, run_suite
+
+
+@pytest.mark.parametrize("name", CORPORA)
+def test_corpus_has_requested_size(name):
+    assert len(CORPORA[name](5000)) <= 5000
+    assert len(CORPORA[name](5000)) > 4500
+
+
+def test_headers_corpus_is_only_headers():
+    tokens = tokenize(CORPORA["headers"](2000))
+    assert len(tokens) > 50
+    assert all(isinstance(token, Header) for token in tokens)
+
+
+def test_long_paragraph_corpus_is_one_paragraph():
+    tokens = tokenize(CORPORA["long_paragraph"](5000))
+    assert len(tokens) == 1
+    assert isinstance(tokens[0], Paragraph)
+
+
+def test_run_suite_times_every_stage_and_unique_style():
+    result = run_suite(
+        size=300, repeats=1, corpora={"prose": CORPORA["prose"]}, startup=False
+    )
+    assert sorted(result["results"]) == [
+        "prose/render_pdf/generic",
+        "prose/render_pdf/regard",
+        "prose/render_pdf/times",
+        "prose/tokenize",
+        "prose/tokenize_inline",
+    ]
+    assert all(seconds > 0 for seconds in result["results"].values())
+    assert result["meta"]["size"] == 300
+
+
+def test_compare_flags_slowdown_over_threshold():
+    baseline = {"results": {"a": 1.0, "b": 1.0, "gone": 1.0}}
+    current = {"results": {"a": 1.05, "b": 1.5, "new": 1.0}}
+    lines, regressions = compare(baseline, current, threshold=0.1)
+    assert regressions == ["b"]
+    assert len(lines) == 2
+
+
+def test_main_writes_json_and_compares(tmp_path, capsys):
+    output = tmp_path / "results.json"
+    assert main(["--size", "200", "--repeats", "1", "--output", str(output)]) == 0
+    saved = json.loads(output.read_text())
+    assert "prose/tokenize" in saved["results"]
+    assert "startup/help" in saved["results"]
+
+    # Baseline far faster than possible, so everything regresses
+    for key in saved["results"]:
+        saved["results"][key] = 1e-9
+    output.write_text(json.dumps(saved))
+    assert main(["--size", "200", "--repeats", "1", "--compare", str(output)]) == 1
+    assert "REGRESSION" in capsys.readouterr().out
+
+
+def test_import_time_of_module():
+    assert 0 < import_time("akidocs_core.tokens") < 10
+
+
+def test_run_startup_keys():
+    assert sorted(run_startup(repeats=1)) == [
+        "startup/help",
+        "startup/import_cli",
+        "startup/version",
+    ]
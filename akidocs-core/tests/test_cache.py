@@ -0,0 +1,132 @@
+import dataclasses
+import os
+from pathlib import Path
+
+import pytest
+
+from akidocs_core.cache import BuildCache
+from akidocs_core.convert import convert_file
+from akidocs_core.style_base import FontFile
+from akidocs_core.styles import GENERIC, TIMES
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return BuildCache(tmp_path / "cache", "1.0")
+
+
+def test_key_depends_on_source_style_and_version(cache):
+    key = cache.key(b"# Hello", GENERIC)
+    assert key == cache.key(b"# Hello", GENERIC)
+    assert key != cache.key(b"# Hello!", GENERIC)
+    assert key != cache.key(b"# Hello", TIMES)
+    assert key != cache.key(b"# Hello", dataclasses.replace(GENERIC, base_font_size=5))
+    assert key != dataclasses.replace(cache, version="1.1").key(b"# Hello", GENERIC)
+
+
+def test_key_depends_on_font_file_content(cache, tmp_path):
+    font_path = tmp_path / "body.ttf"
+    font_path.write_bytes(b"font one")
+    style = dataclasses.replace(GENERIC, font_files=(FontFile("Body", font_path),))
+    key = cache.key(b"# Hello", style)
+    assert key == cache.key(b"# Hello", style)
+
+    font_path.write_bytes(b"font two")
+    stat = font_path.stat()
+    os.utime(font_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+    assert cache.key(b"# Hello", style) != key
+
+
+def test_fetch_miss(cache, tmp_path):
+    assert not cache.fetch("missing", tmp_path / "out.pdf")
+    assert not (tmp_path / "out.pdf").exists()
+
+
+def test_store_then_fetch(cache, tmp_path):
+    pdf_path = tmp_path / "in.pdf"
+    pdf_path.write_bytes(b"%PDF-cached")
+    cache.store("key", pdf_path)
+
+    assert cache.fetch("key", tmp_path / "out.pdf")
+    assert (tmp_path / "out.pdf").read_bytes() == b"%PDF-cached"
+
+
+def test_evicts_least_recently_used(tmp_path):
+    cache = BuildCache(tmp_path / "cache", "1.0", max_bytes=20)
+    pdf_path = tmp_path / "in.pdf"
+    pdf_path.write_bytes(b"0123456789")
+    cache.store("old", pdf_path)
+    cache.store("used", pdf_path)
+    # Make entry ages explicit, filesystem timestamps can be coarse
+    os.utime(cache.directory / "old.pdf", (1, 1))
+    os.utime(cache.directory / "used.pdf", (2, 2))
+    assert cache.fetch("used", tmp_path / "out.pdf")
+
+    cache.store("new", pdf_path)
+
+    assert not (cache.directory / "old.pdf").exists()
+    assert (cache.directory / "used.pdf").exists()
+    assert (cache.directory / "new.pdf").exists()
+
+
+def test_store_scans_directory_once(tmp_path, monkeypatch):
+    cache = BuildCache(tmp_path / "cache", "1.0", max_bytes=50)
+    pdf_path = tmp_path / "in.pdf"
+    pdf_path.write_bytes(b"0123456789")
+    cache.store("first", pdf_path)
+
+    def no_glob(self, pattern):
+        raise AssertionError("cache directory scanned again")
+
+    monkeypatch.setattr(Path, "glob", no_glob)
+    for number in range(20):
+        cache.store(f"entry{number}", pdf_path)
+
+    remaining = sorted(path.stem for path in cache.directory.iterdir())
+    assert remaining == [f"entry{number}" for number in range(15, 20)]
+
+
+def test_index_of_existing_entries_ordered_by_use(tmp_path):
+    directory = tmp_path / "cache"
+    directory.mkdir()
+    for key, mtime in (("new", 3), ("old", 1), ("middle", 2)):
+        (directory / f"{key}.pdf").write_bytes(b"0123456789")
+        os.utime(directory / f"{key}.pdf", (mtime, mtime))
+    pdf_path = tmp_path / "in.pdf"
+    pdf_path.write_bytes(b"0123456789")
+
+    BuildCache(directory, "1.0", max_bytes=30).store("added", pdf_path)
+
+    assert sorted(path.stem for path in directory.iterdir()) == [
+        "added",
+        "middle",
+        "new",
+    ]
+
+
+def test_convert_file_uses_cache(cache, tmp_path):
+    input_path = tmp_path / "in.md"
+    input_path.write_text("# Hello\n\nWorld")
+
+    assert not convert_file(input_path, tmp_path / "first.pdf", GENERIC, cache)
+    assert convert_file(input_path, tmp_path / "second.pdf", GENERIC, cache)
+    assert (tmp_path / "first.pdf").read_bytes() == (
+        tmp_path / "second.pdf"
+    ).read_bytes()
+
+
+def test_convert_file_hashes_input_without_reading_it_whole(
+    cache, tmp_path, monkeypatch
+):
+    input_path = tmp_path / "in.md"
+    input_path.write_text("# Hello\n\nWorld")
+
+    def no_read_bytes(self):
+        raise AssertionError("input read whole")
+
+    monkeypatch.setattr(Path, "read_bytes", no_read_bytes)
+    assert not convert_file(input_path, tmp_path / "first.pdf", GENERIC, cache)
+    assert convert_file(input_path, tmp_path / "second.pdf", GENERIC, cache)
+
+    input_path.write_text("# Hello\n\nChanged")
+    assert not convert_file(input_path, tmp_path / "third.pdf", GENERIC, cache)
@@ -1,9 +1,12 @@
 import os
+import pstats
 import subprocess
 from importlib.metadata import version
 
 import pytest
 
+import akidocs_core
+
 
 def run_cli(*args, env=None, input=None):
     return subprocess.run(
@@ -29,6 +32,14 @@ def run_cli_with_files(tmp_path, *extra_args, env=None):
     return result
 
 
+@pytest.fixture(autouse=True)
+def isolated_cache(tmp_path, monkeypatch):
+    """Keep build cache of CLI runs out of the user cache directory."""
+    cache_dir = tmp_path / "cache"
+    monkeypatch.setenv("AKIDOCS_CACHE_DIR", str(cache_dir))
+    return cache_dir
+
+
 @pytest.fixture
 def overwrite_files(tmp_path):
     input_file = tmp_path / "test.md"
@@ -42,6 +53,10 @@ def test_cli_produces_pdf(tmp_path):
     run_cli_with_files(tmp_path)
 
 
+def test_package_version_matches_metadata():
+    assert akidocs_core.__version__ == version("akidocs-core")
+
+
 def test_cli_version_long_flag():
     result = run_cli("--version")
     assert result.returncode == 0
@@ -200,3 +215,222 @@ def test_cli_output_shows_long_style_name(tmp_path):
     result = run_cli(str(input_file), str(output_file), "-s", "g")
 
     assert "(Helvetica, generic)" in result.stdout
+
+
+def test_batch_output_dir(tmp_path):
+    docs = tmp_path / "docs"
+    (docs / "sub").mkdir(parents=True)
+    (docs / "a.md").write_text("# A")
+    (docs / "sub" / "b.md").write_text("B")
+    single = tmp_path / "c.md"
+    single.write_text("C")
+    out = tmp_path / "out"
+
+    result = run_cli("-d", str(out), str(docs), str(single))
+
+    assert result.returncode == 0
+    assert (out / "a.pdf").exists()
+    assert (out / "sub" / "b.pdf").exists()
+    assert (out / "c.pdf").exists()
+    assert "From b.md (Helvetica, generic) to b.pdf in" in result.stdout
+    assert "Converted 3 of 3 files" in result.stdout
+
+
+def test_batch_manifest(tmp_path):
+    (tmp_path / "a.md").write_text("# A")
+    manifest = tmp_path / "manifest.txt"
+    manifest.write_text("a.md\ta-out.pdf\n")
+
+    result = run_cli("--manifest", str(manifest))
+
+    assert result.returncode == 0
+    assert (tmp_path / "a-out.pdf").exists()
+
+
+def test_batch_failure_exit_code(tmp_path):
+    (tmp_path / "a.md").write_text("# A")
+    out = tmp_path / "out"
+
+    result = run_cli("-d", str(out), str(tmp_path / "a.md"), str(tmp_path / "no.md"))
+
+    assert result.returncode != 0
+    assert (out / "a.pdf").exists()
+    assert "not found" in result.stderr.lower()
+    assert "1 failed" in result.stdout
+
+
+def test_single_mode_requires_input_and_output(tmp_path):
+    result = run_cli(str(tmp_path / "a.md"))
+    assert result.returncode != 0
+    assert "input and output" in result.stderr
+
+
+def test_batch_jobs(tmp_path):
+    names = ["d", "a", "c", "b"]
+    for name in names:
+        (tmp_path / f"{name}.md").write_text(f"# {name}\n\nText *{name}*")
+    out = tmp_path / "out"
+    inputs = [str(tmp_path / f"{name}.md") for name in names]
+
+    result = run_cli("-d", str(out), "--jobs", "2", *inputs, str(tmp_path / "x.md"))
+
+    assert result.returncode != 0
+    assert all((out / f"{name}.pdf").exists() for name in names)
+    reported = [line.split()[1] for line in result.stdout.splitlines()[:-1]]
+    assert reported == [f"{name}.md" for name in names]
+    assert "Converted 4 of 5 files" in result.stdout
+
+
+def test_jobs_requires_batch_mode(tmp_path):
+    result = run_cli("--jobs", "2", str(tmp_path / "a.md"), str(tmp_path / "a.pdf"))
+    assert result.returncode != 0
+    assert "batch mode" in result.stderr
+
+
+def test_cli_second_run_uses_cache(tmp_path, isolated_cache):
+    run_cli_with_files(tmp_path)
+    (tmp_path / "test.pdf").unlink()
+
+    result = run_cli_with_files(tmp_path)
+
+    assert "(cached)" in result.stdout
+    assert list(isolated_cache.glob("*.pdf"))
+
+
+def test_cli_no_cache(tmp_path, isolated_cache):
+    run_cli_with_files(tmp_path, "--no-cache")
+    (tmp_path / "test.pdf").unlink()
+
+    result = run_cli_with_files(tmp_path, "--no-cache")
+
+    assert "(cached)" not in result.stdout
+    assert not isolated_cache.exists()
+
+
+def test_cli_watch_rebuilds(tmp_path):
+    input_file = tmp_path / "test.md"
+    output_file = tmp_path / "test.pdf"
+    input_file.write_text("# Hello")
+
+    process = subprocess.Popen(
+        [
+            "uv",
+            "run",
+            "python",
+            "-m",
+            "akidocs_core",
+            "--watch",
+            str(input_file),
+            str(output_file),
+        ],
+        stdout=subprocess.PIPE,
+        text=True,
+    )
+    try:
+        assert "From test.md" in process.stdout.readline()
+        assert "Watching" in process.stdout.readline()
+        input_file.write_text("# Hello\n\nWorld")
+        assert "1 of 2 blocks re-tokenized" in process.stdout.readline()
+    finally:
+        process.kill()
+        process.wait()
+
+
+def test_cli_timings(tmp_path):
+    result = run_cli_with_files(tmp_path, "--timings")
+    for stage in ("read", "block", "inline", "render", "write", "total"):
+        assert f"\n{stage} " in result.stdout
+
+
+def test_cli_timings_bypasses_cache(tmp_path, isolated_cache):
+    run_cli_with_files(tmp_path, "--timings", "--force")
+    assert not isolated_cache.exists()
+
+
+def test_cli_profile(tmp_path):
+    profile_file = tmp_path / "out.prof"
+    result = run_cli_with_files(tmp_path, "--profile", str(profile_file))
+    assert f"Profile written to {profile_file}" in result.stdout
+
+    stats = pstats.Stats(str(profile_file))
+    assert any(name == "convert_file" for _, _, name in stats.stats)
+
+
+def test_timings_not_in_batch_mode(tmp_path):
+    result = run_cli("-d", str(tmp_path / "out"), "--timings", str(tmp_path))
+    assert result.returncode != 0
+    assert "batch mode" in result.stderr
+
+
+def test_cli_help_does_not_import_fpdf():
+    result = subprocess.run(
+        ["uv", "run", "python", "-X", "importtime", "-m", "akidocs_core", "--help"],
+        capture_output=True,
+        text=True,
+    )
+    assert result.returncode == 0
+    assert "akidocs_core.cli" in result.stderr
+    assert "fpdf" not in result.stderr
+
+
+def test_cli_serve(tmp_path):
+    from akidocs_core.serve import request_pdf
+
+    socket_path = tmp_path / "aki.sock"
+    process = subprocess.Popen(
+        [
+            "uv",
+            "run",
+            "python",
+            "-m",
+            "akidocs_core",
+            "serve",
+            "--socket",
+            str(socket_path),
+        ],
+        stdout=subprocess.PIPE,
+        text=True,
+    )
+    try:
+        assert f"Serving on {socket_path}" in process.stdout.readline()
+        assert request_pdf("# Hello", socket_path=socket_path).startswith(b"%PDF")
+    finally:
+        process.kill()
+        process.wait()
+
+
+def test_cli_convert_command(tmp_path):
+    # Input file named like the serve command, given explicitly or as a path
+    input_file = tmp_path / "serve"
+    input_file.write_text("# Hello")
+    result = run_cli("convert", str(input_file), str(tmp_path / "a.pdf"))
+    assert result.returncode == 0
+    assert (tmp_path / "a.pdf").exists()
+
+    result = subprocess.run(
+        ["uv", "run", "python", "-m", "akidocs_core", "./serve", "b.pdf"],
+        capture_output=True,
+        text=True,
+        cwd=tmp_path,
+    )
+    assert result.returncode == 0
+    assert (tmp_path / "b.pdf").exists()
+
+
+def test_cli_serve_rejects_paths(tmp_path):
+    result = run_cli("serve", str(tmp_path / "out.pdf"))
+    assert result.returncode == 2
+    assert "unrecognized arguments" in result.stderr
+
+
+def test_batch_persists_inline_cache(tmp_path, isolated_cache):
+    for name in ["a", "b"]:
+        (tmp_path / f"{name}.md").write_text(f"# Notice\n\nSame text\n\n{name}")
+    out = tmp_path / "out"
+
+    first = run_cli("-d", str(out), str(tmp_path / "a.md"))
+    assert "inline cache 0 hits, 3 misses" in first.stdout
+    assert (isolated_cache / "inline-cache.json").exists()
+
+    second = run_cli("-d", str(out), str(tmp_path / "b.md"))
+    assert "inline cache 2 hits, 1 misses (67% hit rate)" in second.stdout
@@ -0,0 +1,22 @@
+from akidocs_core.convert import convert_file_timed
+from akidocs_core.styles import GENERIC
+
+
+def test_convert_file_timed_measures_each_stage(tmp_path):
+    input_file = tmp_path / "test.md"
+    output_file = tmp_path / "test.pdf"
+    input_file.write_text("# Hello\n\n" + "Some *styled* text. " * 500)
+
+    timings = convert_file_timed(input_file, output_file, GENERIC)
+
+    assert [timing.name for timing in timings] == [
+        "read",
+        "block",
+        "inline",
+        "render",
+        "write",
+    ]
+    assert all(timing.seconds >= 0 for timing in timings)
+    # Inline tokens of 500 repeats take noticeable memory
+    assert timings[2].peak_bytes > 10_000
+    assert output_file.read_bytes().startswith(b"%PDF")
@@ -0,0 +1,127 @@
+import dataclasses
+import os
+
+import pytest
+from fpdf import FPDF
+
+from akidocs_core import font_files
+from akidocs_core.renderer import render_pdf
+from akidocs_core.style_base import FontFile
+from akidocs_core.styles import GENERIC
+from akidocs_core.tokenizer import tokenize
+from tests.helpers import make_font, without_dates
+
+TEXT = "# Title\n\nPlain *italic* **bold** and `code`.\n\nMore text."
+
+
+def _style(*files):
+    return dataclasses.replace(GENERIC, font_family="Test", font_files=files)
+
+
+@pytest.fixture(autouse=True)
+def no_parsed_fonts():
+    font_files.clear()
+    yield
+    font_files.clear()
+
+
+@pytest.fixture
+def parse_count(monkeypatch):
+    """Number of times a font file was parsed."""
+    parses = []
+    ttf_font = font_files.TTFFont
+
+    def counted(*args, **kwargs):
+        parses.append(args[1])
+        return ttf_font(*args, **kwargs)
+
+    monkeypatch.setattr(font_files, "TTFFont", counted)
+    return parses
+
+
+def test_render_with_font_file(font_path):
+    pdf = render_pdf(tokenize(TEXT), _style(FontFile("Test", font_path)))
+    assert b"/FontFile2" in pdf
+    assert b"/BaseFont /MPDFAA+Test" in pdf
+
+
+def test_output_equals_fpdf_add_font(font_path, tmp_path, monkeypatch):
+    bold_path = make_font(tmp_path / "test-bold.ttf", style="Bold")
+    style = _style(FontFile("Test", font_path), FontFile("Test", bold_path, "B"))
+    # Every document after the first uses the parsed fonts
+    ours = [render_pdf(tokenize(TEXT * n), style) for n in (1, 2, 3)]
+
+    monkeypatch.setattr(
+        font_files,
+        "add_font",
+        lambda pdf, family, style, path: pdf.add_font(family, style, str(path)),
+    )
+    theirs = [render_pdf(tokenize(TEXT * n), style) for n in (1, 2, 3)]
+    assert list(map(without_dates, ours)) == list(map(without_dates, theirs))
+
+
+def test_font_file_parsed_once_per_process(font_path, parse_count):
+    style = _style(FontFile("Test", font_path))
+    for _ in range(3):
+        render_pdf(tokenize(TEXT), style)
+    # Same file for regular, bold and italic
+    assert parse_count == [font_path]
+
+
+def test_changed_font_file_parsed_again(font_path, parse_count):
+    style = _style(FontFile("Test", font_path))
+    render_pdf(tokenize(TEXT), style)
+    make_font(font_path, chars="abc ")
+    stat = font_path.stat()
+    os.utime(font_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+
+    render_pdf(tokenize(TEXT), style)
+    assert len(parse_count) == 2
+
+
+def test_only_used_fonts_embedded(font_path, tmp_path):
+    bold_path = make_font(tmp_path / "test-bold.ttf", style="Bold")
+    style = _style(FontFile("Test", font_path), FontFile("Test", bold_path, "B"))
+    pdf = render_pdf(tokenize("Plain paragraph only"), style)
+    assert pdf.count(b"/FontFile2") == 1
+
+
+def test_missing_font_file():
+    style = _style(FontFile("Test", "missing.ttf"))
+    with pytest.raises(FileNotFoundError):
+        render_pdf(tokenize(TEXT), style)
+
+
+def test_changed_font_file_replaces_entry(font_path, tmp_path):
+    other_path = make_font(tmp_path / "other.ttf")
+    style = _style(FontFile("Test", font_path))
+    render_pdf(tokenize(TEXT), style)
+    render_pdf(tokenize(TEXT), _style(FontFile("Test", other_path)))
+    for size in range(3):
+        make_font(font_path, chars="abc "[: size + 2])
+        stat = font_path.stat()
+        os.utime(font_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+        render_pdf(tokenize(TEXT), style)
+    # One entry per file, however often it changed
+    assert len(font_files._parsed) == 2
+
+
+def test_unknown_fpdf_fonts_fall_back_to_add_font(font_path, monkeypatch):
+    style = _style(FontFile("Test", font_path))
+    expected = render_pdf(tokenize(TEXT), style)
+    font_files.clear()
+    monkeypatch.setattr(
+        font_files, "_FONT_ATTRIBUTES", (*font_files._FONT_ATTRIBUTES, "renamed")
+    )
+    added = []
+    original = FPDF.add_font
+
+    def add_font(self, family, style="", fname=None, *args, **kwargs):
+        added.append((family, style))
+        return original(self, family, style, fname, *args, **kwargs)
+
+    monkeypatch.setattr(FPDF, "add_font", add_font)
+    for _ in range(2):
+        pdf = render_pdf(tokenize(TEXT), style)
+        assert without_dates(pdf) == without_dates(expected)
+    assert ("Test", "") in added
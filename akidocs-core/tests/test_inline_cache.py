@@ -0,0 +1,148 @@
+import json
+import pickle
+
+import pytest
+
+from akidocs_core import inline_cache
+from akidocs_core.inline_cache import InlineCache, set_active, using
+from akidocs_core.inline_tokenizer import tokenize_inline
+from akidocs_core.tokenizer import tokenize
+from akidocs_core.tokens import BOLD, ITALIC, InlineText, canonical_styles
+
+ITALIC_STYLES = canonical_styles(frozenset({ITALIC}))
+
+
+@pytest.fixture(autouse=True)
+def no_active_cache():
+    previous = set_active(None)
+    yield
+    set_active(previous)
+
+
+def test_hit_returns_equal_tokens():
+    cache = InlineCache()
+    first = cache.tokenize("Some **bold** text")
+    second = cache.tokenize("Some **bold** text")
+    assert list(first) == list(second) == tokenize_inline("Some **bold** text")
+    assert (cache.stats.hits, cache.stats.misses) == (1, 1)
+    assert cache.stats.hit_rate == 0.5
+
+
+def test_hits_share_one_tuple_of_tokens():
+    cache = InlineCache()
+    first = cache.tokenize("Some **bold** text")
+    assert isinstance(first, tuple)
+    assert cache.tokenize("Some **bold** text") is first
+    assert first == tuple(tokenize_inline("Some **bold** text"))
+
+
+def test_least_recently_used_evicted():
+    cache = InlineCache(max_entries=2)
+    cache.tokenize("a")
+    cache.tokenize("b")
+    cache.tokenize("a")
+    cache.tokenize("c")
+    assert "a" in cache
+    assert "b" not in cache
+    assert len(cache) == 2
+    assert cache.stats.evictions == 1
+
+
+def test_evicted_beyond_max_bytes(tmp_path):
+    cache = InlineCache(max_bytes=1000)
+    for n in range(20):
+        cache.tokenize(f"Paragraph {n} " + "x" * 80)
+    assert 0 < len(cache) < 20
+    assert cache.stats.evictions == 20 - len(cache)
+    assert f"Paragraph 19 {'x' * 80}" in cache
+
+    path = tmp_path / "inline.json"
+    cache.save(path, "1.0")
+    assert path.stat().st_size <= 1000
+    # A smaller limit when loading evicts least recently used entries
+    loaded = InlineCache.load(path, "1.0", max_bytes=300)
+    assert 0 < len(loaded) < len(cache)
+
+
+def test_long_source_not_cached():
+    cache = InlineCache(max_source_chars=5)
+    assert cache.tokenize("*long text*") == (InlineText("long text", ITALIC_STYLES),)
+    assert "*long text*" not in cache
+    assert cache.stats.misses == 1
+
+
+def test_save_and_load_round_trip(tmp_path):
+    path = tmp_path / "cache" / "inline.json"
+    cache = InlineCache()
+    for source in ["a", "**b**", "*c*"]:
+        cache.tokenize(source)
+    cache.tokenize("a")
+    cache.save(path, "1.0")
+
+    loaded = InlineCache.load(path, "1.0", max_entries=2)
+    # Least recently used entry is dropped to fit
+    assert "**b**" not in loaded
+    assert loaded.tokenize("*c*") == (InlineText("c", ITALIC_STYLES),)
+    assert loaded.tokenize("a") == (InlineText("a"),)
+    # Styles are the shared canonical sets again
+    bold = InlineCache.load(path, "1.0").tokenize("**b**")[0]
+    assert bold.styles is canonical_styles(frozenset({BOLD}))
+    assert loaded.stats.misses == 0
+
+
+def test_load_ignores_missing_corrupt_and_other_version(tmp_path):
+    path = tmp_path / "inline.json"
+    assert len(InlineCache.load(path, "1.0")) == 0
+    path.write_text("{not json")
+    assert len(InlineCache.load(path, "1.0")) == 0
+    cache = InlineCache()
+    cache.tokenize("a")
+    cache.save(path, "1.0")
+    assert len(InlineCache.load(path, "2.0")) == 0
+
+
+@pytest.mark.parametrize(
+    "saved",
+    [
+        {"version": "1.0"},
+        {"version": "1.0", "entries": 5},
+        {"version": "1.0", "entries": [["a"]]},
+        {"version": "1.0", "entries": [["a", [["a", "bold"]]]]},
+        {"version": "1.0", "entries": [["a", [["a", 99]]]]},
+        {"version": "1.0", "entries": [["a", [["a", 8]]]]},
+        {"version": "1.0", "entries": [["a", [["a", -1]]]]},
+        {"version": "1.0", "entries": [["a", [[5, 0]]]]},
+        {"version": "1.0", "entries": [["b", [["b", 0]]], [None, [["a", 0]]]]},
+    ],
+)
+def test_load_ignores_malformed_entries(tmp_path, saved):
+    path = tmp_path / "inline.json"
+    path.write_text(json.dumps(saved))
+    assert len(InlineCache.load(path, "1.0")) == 0
+
+
+def test_take_updates_and_merge():
+    worker = pickle.loads(pickle.dumps(InlineCache()))
+    worker.tokenize("a")
+    worker.tokenize("a")
+    worker.tokenize("*b*")
+    updates = worker.take_updates()
+    assert [source for source, _ in updates.entries] == ["a", "*b*"]
+    assert (updates.stats.hits, updates.stats.misses) == (1, 2)
+    assert worker.take_updates().entries == []
+
+    parent = InlineCache()
+    parent.merge(updates)
+    assert parent.tokenize("*b*") == (InlineText("b", ITALIC_STYLES),)
+    assert (parent.stats.hits, parent.stats.misses) == (2, 2)
+
+
+def test_block_to_token_uses_active_cache():
+    cache = InlineCache()
+    with using(cache):
+        assert inline_cache.active is cache
+        tokens = tokenize("# Title\n\nText\n\n# Title")
+    assert inline_cache.active is None
+    assert tokens == tokenize("# Title\n\nText\n\n# Title")
+    assert tokens[0].content[0] is tokens[2].content[0]
+    assert (cache.stats.hits, cache.stats.misses) == (1, 2)
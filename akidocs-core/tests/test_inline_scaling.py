@@ -0,0 +1,146 @@
+"""Guard against super-linear inline tokenization on pathological inputs.
+
+Each input is tokenized at doubling sizes, and the growth exponent k of
+work ~ size**k is fitted over them. Work is the number of lines of
+inline_tokenizer executed, which unlike time is the same on every run. Linear
+work gives k near 1, the nested closer tables of the stack engine k somewhat
+above 1, and quadratic k near 2, so any change that brings back quadratic or
+exponential closer search fails here.
+
+Nested units here nest a fixed depth. Sections nested as deep as the input
+is long get a stricter, linear bound, for the stack engine only: the
+recursive engine keeps closers per section end, and recurses once per level.
+"""
+
+import math
+import sys
+from collections.abc import Callable
+from functools import partial
+
+import pytest
+
+from akidocs_core import inline_tokenizer
+from akidocs_core.inline_tokenizer import INLINE_ENGINES, tokenize_inline
+
+# Near-linear, with headroom for n log n
+MAX_GROWTH_EXPONENT = 1.5
+# Linear, for sections nested as deep as the input is long
+MAX_NESTED_GROWTH_EXPONENT = 1.1
+# Input sizes in characters. The recursive engine recurses once per nested
+# closer search, so it gets smaller inputs to stay within the recursion limit
+ENGINE_SIZES = {
+    "stack": [500, 1000, 2000, 4000],
+    "recursive": [125, 250, 500, 1000],
+}
+
+# Repeated units, each without matching closers for some of its delimiters
+PATHOLOGICAL_UNITS = {
+    "unclosed_italic": "*a",
+    "unclosed_bold": "**a",
+    "unclosed_bold_italic": "***a",
+    "alternating_unmatched": "**a * ",
+    "closers_only": "a** b*",
+    "italic_then_bold": "*a**b",
+    "unclosed_backtick": "`a",
+    "nested_bold_italic": "**a *b* c** ",
+    "nested_with_code": "*a **b `c` d** e* ",
+    "nested_three_deep": "*a **b *c* d** e* ",
+    "nested_unmatched": "***a **b *c d** e ",
+}
+
+# Openers and closers of sections nested n deep, as (opening unit, closing unit)
+DEEP_NESTING = {
+    "bold_italic": ("**x *y ", " y* x**"),
+    "italic_bold": ("*a **b ", " b** a*"),
+    "bold_italic_in_both": ("***a **b ", " c** d***"),
+    "with_code": ("**a *b `c` ", " d* e**"),
+}
+
+
+def executed_lines(run: Callable[[], object], filename: str) -> int:
+    """Lines of file filename executed while calling run."""
+    count = 0
+
+    def trace_lines(frame, event, arg):
+        nonlocal count
+        if event == "line":
+            count += 1
+        return trace_lines
+
+    def trace_calls(frame, event, arg):
+        if frame.f_code.co_filename == filename:
+            return trace_lines
+        return None
+
+    previous = sys.gettrace()
+    sys.settrace(trace_calls)
+    try:
+        run()
+    finally:
+        sys.settrace(previous)
+    return count
+
+
+def fitted_exponent(sizes: list[int], works: list[int]) -> float:
+    """Least-squares slope of log(work) against log(size)."""
+    xs = [math.log(size) for size in sizes]
+    ys = [math.log(work) for work in works]
+    mean_x = sum(xs) / len(xs)
+    mean_y = sum(ys) / len(ys)
+    covariance = sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys, strict=True))
+    variance = sum((x - mean_x) ** 2 for x in xs)
+    return covariance / variance
+
+
+def growth_exponent(unit: str, engine: str, sizes: list[int]) -> float:
+    """Growth exponent of tokenizing work on repeated unit."""
+    texts = [unit * (size // len(unit)) for size in sizes]
+    works = [
+        executed_lines(
+            partial(tokenize_inline, text, engine=engine), inline_tokenizer.__file__
+        )
+        for text in texts
+    ]
+    return fitted_exponent([len(text) for text in texts], works)
+
+
+@pytest.mark.parametrize("engine", INLINE_ENGINES)
+@pytest.mark.parametrize("unit", PATHOLOGICAL_UNITS.values(), ids=PATHOLOGICAL_UNITS)
+def test_pathological_input_scales_near_linearly(unit, engine):
+    exponent = growth_exponent(unit, engine, ENGINE_SIZES[engine])
+    assert exponent <= MAX_GROWTH_EXPONENT, (
+        f"{engine} engine work grows as size**{exponent:.2f} on {unit!r} * n"
+    )
+
+
+@pytest.mark.parametrize("units", DEEP_NESTING.values(), ids=DEEP_NESTING)
+def test_deep_nesting_scales_linearly(units):
+    opening, closing = units
+    sizes = ENGINE_SIZES["stack"]
+    texts = [
+        opening * depth + closing * depth
+        for depth in (size // (len(opening) + len(closing)) for size in sizes)
+    ]
+    works = [
+        executed_lines(partial(tokenize_inline, text), inline_tokenizer.__file__)
+        for text in texts
+    ]
+    exponent = fitted_exponent([len(text) for text in texts], works)
+    assert exponent <= MAX_NESTED_GROWTH_EXPONENT, (
+        f"stack engine work grows as size**{exponent:.2f} on nesting {opening!r}"
+    )
+
+
+def test_quadratic_work_detected():
+    """The measure sees quadratic work, here of a pair loop, as exponent 2."""
+
+    def pairs(n: int) -> None:
+        for _ in range(n):
+            for _ in range(n):
+                pass
+
+    sizes = [25, 50, 100, 200]
+    works = [executed_lines(partial(pairs, size), __file__) for size in sizes]
+    exponent = fitted_exponent(sizes, works)
+    assert exponent > 1.8
+    assert exponent > MAX_GROWTH_EXPONENT
@@ -1,4 +1,14 @@
-from akidocs_core.inline_tokenizer import tokenize_inline
+from itertools import product
+
+import pytest
+
+from akidocs_core.inline_tokenizer import (
+    INLINE_ENGINES,
+    coalesce_inline,
+    tokenize_inline,
+    tokenize_inline_recursive,
+    tokenize_inline_stack,
+)
 from akidocs_core.tokens import Bold, Code, InlineText, Italic
 
 BOLD = frozenset({Bold()})
@@ -142,3 +152,97 @@ def test_italic_containing_code_with_asterisks():
         InlineText(content="**", styles=ITALIC_CODE),
         InlineText(content=" end", styles=ITALIC),
     ]
+
+
+@pytest.mark.parametrize("engine", INLINE_ENGINES)
+def test_engine_selection(engine):
+    result = tokenize_inline("**bold *and italic* text**", engine=engine)
+    assert result == [
+        InlineText(content="bold ", styles=BOLD),
+        InlineText(content="and italic", styles=BOLD_ITALIC),
+        InlineText(content=" text", styles=BOLD),
+    ]
+
+
+def test_stack_engine_matches_recursive_engine():
+    """Every short string of delimiters, backticks and text tokenizes the same."""
+    for length in range(7):
+        for chars in product("*`a ", repeat=length):
+            text = "".join(chars)
+            assert tokenize_inline_stack(text) == tokenize_inline_recursive(text)
+
+
+@pytest.mark.parametrize(
+    "text",
+    ["**a`***`****a****", "*aa* **a********** ******", "`a`aa*****aa****` ******aa**"],
+)
+def test_stack_engine_matches_recursive_engine_where_section_end_matters(text):
+    """Closers found from the paragraph's end differ from those in sections."""
+    assert tokenize_inline_stack(text) == tokenize_inline_recursive(text)
+
+
+def test_stack_engine_matches_recursive_engine_inherited_styles():
+    text = "a **b `c` *d* e** ***f***"
+    assert tokenize_inline_stack(text, BOLD) == tokenize_inline_recursive(text, BOLD)
+
+
+def test_stack_engine_deep_nesting():
+    """Nesting deeper than the recursion limit still tokenizes."""
+    text = "*a **b " * 2000
+    result = tokenize_inline_stack(text)
+    assert "".join(token.content for token in result).count("a") == 2000
+
+
+def test_recursive_engine_unmatched_openers():
+    """Closers are looked up once per position, not again for every opener."""
+    text = "**a * " * 200
+    assert tokenize_inline_recursive(text) == tokenize_inline_stack(text)
+
+
+@pytest.mark.parametrize("engine", INLINE_ENGINES)
+def test_range_matches_slice(engine):
+    text = "*a **b `c` d** e* **f"
+    for start in range(len(text) + 1):
+        for end in range(start, len(text) + 1):
+            assert tokenize_inline(
+                text, engine=engine, start=start, end=end
+            ) == tokenize_inline(text[start:end], engine=engine)
+
+
+@pytest.mark.parametrize("engine", INLINE_ENGINES)
+def test_range_ignores_closers_outside(engine):
+    result = tokenize_inline("**bold** and *x", engine=engine, start=2, end=13)
+    assert result == [InlineText(content="bold** and ")]
+
+
+def test_coalesce_keeps_adjacent_same_style_runs():
+    # Joined into one write, their text could wrap differently
+    tokens = [
+        InlineText(content="*"),
+        InlineText(content="a "),
+        InlineText(content="b", styles=BOLD),
+        InlineText(content="c", styles=BOLD),
+    ]
+    assert coalesce_inline(tokens) == tokens
+
+
+def test_coalesce_drops_only_empty_plain_runs():
+    tokens = [
+        InlineText(content="a"),
+        InlineText(content=""),
+        InlineText(content="", styles=BOLD),
+        InlineText(content="b"),
+    ]
+    assert coalesce_inline(tokens) == [tokens[0], tokens[2], tokens[3]]
+
+
+def test_coalesce_keeps_text_and_leaves_input_unchanged():
+    text = "**a * b ** c* `d` ***e"
+    tokens = tokenize_inline(text)
+    original = list(tokens)
+    result = coalesce_inline(tokens)
+    assert "".join(token.content for token in result) == "".join(
+        token.content for token in tokens
+    )
+    assert all(token.content or token.styles for token in result)
+    assert tokens == original
@@ -0,0 +1,98 @@
+import io
+
+from akidocs_core import instrumentation, tokenizer
+from akidocs_core.inline_tokenizer import tokenize_inline
+from akidocs_core.instrumentation import Event, recording, set_sink
+from akidocs_core.renderer import render_pdf, write_pdf
+from akidocs_core.tokenizer import iter_tokens, tokenize
+
+TEXT = "# Title\n\nSome *italic* text\n\nMore ä"
+
+
+def test_no_sink_by_default():
+    assert instrumentation.sink is None
+
+
+def test_no_events_without_sink():
+    events = []
+    previous = set_sink(events.append)
+    set_sink(previous)
+    tokenize(TEXT)
+    assert events == []
+
+
+def test_set_sink_returns_previous():
+    first = [].append
+    assert set_sink(first) is None
+    assert set_sink(None) is first
+
+
+def test_recording_restores_previous_sink():
+    with recording():
+        pass
+    assert instrumentation.sink is None
+
+
+def test_tokenize_inline_event():
+    with recording() as events:
+        tokenize_inline("a *b* c", start=2)
+    assert len(events) == 1
+    assert events[0].name == "tokenize_inline"
+    assert events[0].counts == {"chars_in": 5, "inline_tokens": 2}
+    assert events[0].seconds >= 0
+
+
+def test_tokenize_event_after_nested_inline_events():
+    with recording() as events:
+        tokenize(TEXT)
+    assert [event.name for event in events] == ["tokenize_inline"] * 3 + ["tokenize"]
+    assert events[-1].counts == {
+        "chars_in": len(TEXT),
+        "bytes_in": len(TEXT) + 1,
+        "tokens": 3,
+        "inline_tokens": 5,
+    }
+
+
+def test_parallel_tokenize_reports_worker_events(monkeypatch):
+    text = TEXT * 50
+    monkeypatch.setattr(tokenizer, "PARALLEL_MIN_CHARS", 0)
+    monkeypatch.setattr(tokenizer, "PARALLEL_CHUNK_CHARS", 100)
+    with recording() as serial:
+        tokenize(text)
+    with recording() as parallel:
+        tokenize(text, jobs=2)
+    assert [(event.name, event.counts) for event in parallel] == [
+        (event.name, event.counts) for event in serial
+    ]
+
+
+def test_iter_tokens_event_once_exhausted():
+    with recording() as events:
+        tokens = list(iter_tokens(io.StringIO(TEXT)))
+    assert tokens == tokenize(TEXT)
+    assert events[-1].name == "iter_tokens"
+    assert events[-1].counts == {"tokens": 3, "inline_tokens": 5}
+
+
+def test_render_pdf_event():
+    tokens = tokenize(TEXT)
+    with recording() as events:
+        pdf = render_pdf(tokens)
+    assert pdf.startswith(b"%PDF")
+    assert events == [
+        Event(
+            "render_pdf",
+            events[0].seconds,
+            {"tokens": 3, "inline_tokens": 5, "pages": 1, "font_switches": 4},
+        )
+    ]
+
+
+def test_write_pdf_event_with_streamed_tokens():
+    stream = io.BytesIO()
+    with recording() as events:
+        write_pdf(iter_tokens(io.StringIO(TEXT)), stream)
+    assert stream.getvalue().startswith(b"%PDF")
+    assert [event.name for event in events][-2:] == ["iter_tokens", "write_pdf"]
+    assert events[-1].counts["tokens"] == 3
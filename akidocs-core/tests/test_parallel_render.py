@@ -0,0 +1,132 @@
+import dataclasses
+
+import pytest
+
+from akidocs_core import instrumentation, parallel_render
+from akidocs_core.parallel_render import (
+    _ChunkStart,
+    _estimate_line_feeds,
+    _fonts_used,
+    _render_chunk,
+    build_pdf_parallel,
+)
+from akidocs_core.renderer import _blocks, _build_pdf, _new_pdf, render_pdf, render_plan
+from akidocs_core.style_base import FontFile
+from akidocs_core.styles import GENERIC, STYLES
+from akidocs_core.tokenizer import tokenize
+from benchmarks.corpora import CORPORA
+from tests.helpers import without_dates
+
+# Every block kind, hard breaks, an empty header and a word wider than a line
+TAIL = (
+    "\n\n# Title with `code`\n\n## *Sub*\n\n### **Third**\n\n#### Four\n\n"
+    "##### Five\n\n###### Six ***both***\n\n#\n\n"
+    "Line  \nafter break with `code **not bold**` and " + "x" * 300 + " end"
+)
+
+
+def _serial_and_parallel(text, style, jobs=3):
+    tokens = tokenize(text)
+    serial = bytes(_build_pdf(tokens, style).output())
+    parallel = bytes(build_pdf_parallel(tokens, style, jobs).output())
+    return without_dates(serial), without_dates(parallel)
+
+
+@pytest.fixture
+def no_threshold(monkeypatch):
+    monkeypatch.setattr(parallel_render, "PARALLEL_MIN_CHARS", 0)
+
+
+@pytest.mark.parametrize("style_name", ["generic", "times", "regard"])
+def test_parallel_equals_serial(no_threshold, style_name):
+    serial, parallel = _serial_and_parallel(
+        CORPORA["prose"](15000) + TAIL, STYLES[style_name]
+    )
+    assert serial.count(b"/Type /Page\n") > 3
+    assert parallel == serial
+
+
+@pytest.mark.parametrize("corpus", ["emphasis", "unmatched", "headers"])
+def test_parallel_equals_serial_on_corpus(no_threshold, corpus):
+    serial, parallel = _serial_and_parallel(CORPORA[corpus](8000), GENERIC)
+    assert parallel == serial
+
+
+@pytest.mark.parametrize("corpus", list(CORPORA))
+@pytest.mark.parametrize("style_name", ["generic", "times", "regard"])
+def test_estimated_line_feeds_match_rendering(corpus, style_name):
+    style = STYLES[style_name]
+    blocks = [
+        (level, list(runs))
+        for level, runs in _blocks(tokenize(CORPORA[corpus](3000) + TAIL))
+    ]
+    plan = render_plan(style)
+    geometry = _new_pdf(plan)
+    start = _ChunkStart((1, geometry.t_margin), None, True)
+    rendered = _render_chunk(blocks, style, start, _fonts_used(blocks, plan))
+
+    estimated = [
+        _estimate_line_feeds(runs, plan.block(level), geometry)
+        for level, runs in blocks
+    ]
+    assert estimated == rendered.line_feeds
+
+
+def test_wrong_estimate_is_corrected(no_threshold, monkeypatch):
+    monkeypatch.setattr(parallel_render, "_estimate_line_feeds", lambda *args: 0)
+    join = parallel_render._join
+    joined = []
+
+    def counted_join(*args):
+        joined.append(args)
+        return join(*args)
+
+    monkeypatch.setattr(parallel_render, "_join", counted_join)
+    serial, parallel = _serial_and_parallel(CORPORA["prose"](15000), GENERIC)
+    assert parallel == serial
+    assert joined
+
+
+def test_chunks_not_lining_up_fall_back_to_serial(no_threshold, monkeypatch):
+    monkeypatch.setattr(parallel_render, "_lines_up", lambda starts, results: False)
+    serial, parallel = _serial_and_parallel(CORPORA["prose"](15000), GENERIC)
+    assert parallel == serial
+
+
+def test_short_document_renders_serially(monkeypatch):
+    def fail(*args):
+        raise AssertionError("rendered in parallel")
+
+    monkeypatch.setattr(parallel_render, "_render_chunk", fail)
+    serial, parallel = _serial_and_parallel(CORPORA["prose"](5000), GENERIC)
+    assert parallel == serial
+
+
+def test_font_files_render_serially(no_threshold, monkeypatch, font_path):
+    def fail(*args):
+        raise AssertionError("rendered in parallel")
+
+    monkeypatch.setattr(parallel_render, "_render_chunk", fail)
+    style = dataclasses.replace(
+        GENERIC, font_family="Test", font_files=(FontFile("Test", font_path),)
+    )
+    serial, parallel = _serial_and_parallel(CORPORA["prose"](15000), style)
+    assert parallel == serial
+
+
+def test_render_pdf_jobs(no_threshold):
+    tokens = tokenize(CORPORA["prose"](15000))
+    assert without_dates(render_pdf(tokens, GENERIC, jobs=2)) == without_dates(
+        render_pdf(tokens, GENERIC)
+    )
+
+
+def test_instrumented_parallel_render_omits_font_switches(no_threshold):
+    tokens = tokenize(CORPORA["emphasis"](15000))
+    with instrumentation.recording() as events:
+        render_pdf(tokens, GENERIC)
+        render_pdf(tokens, GENERIC, jobs=2)
+    serial, parallel = events
+    assert serial.counts["font_switches"] > 100
+    assert "font_switches" not in parallel.counts
+    assert parallel.counts["pages"] == serial.counts["pages"]
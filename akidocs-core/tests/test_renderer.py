@@ -1,7 +1,32 @@
+import dataclasses
+import io
+
 import pytest
+from fpdf import FPDF
 
-from akidocs_core.renderer import render_pdf
-from akidocs_core.tokens import Bold, Code, Header, InlineText, Italic, Paragraph
+from akidocs_core.renderer import (
+    PLAN_CACHE_SIZE,
+    _build_pdf,
+    _build_pdf_from_blocks,
+    _resolve_font,
+    compile_style,
+    render_pdf,
+    render_plan,
+    write_pdf,
+)
+from akidocs_core.style_base import FontFile, mm_to_pt
+from akidocs_core.styles import GENERIC, STYLES
+from akidocs_core.tokenizer import iter_tokens, tokenize
+from akidocs_core.tokens import (
+    Bold,
+    Code,
+    Header,
+    InlineStyles,
+    InlineText,
+    Italic,
+    Paragraph,
+)
+from tests.helpers import without_dates
 
 BOLD = frozenset({Bold()})
 ITALIC = frozenset({Italic()})
@@ -82,3 +107,205 @@ def test_render_handles_code_with_styles(style):
     ]
     result = render_pdf(tokens)
     assert_valid_pdf_bytes(result)
+
+
+def test_render_accepts_iterator():
+    tokens = iter([Paragraph(content=[InlineText(content="Hello")])])
+    result = render_pdf(tokens)
+    assert_valid_pdf_bytes(result)
+
+
+def test_write_pdf_to_path(tmp_path):
+    output_path = tmp_path / "out.pdf"
+    tokens = (
+        Header(level=1, content=[InlineText(content="Title")]),
+        Paragraph(content=[InlineText(content="Body text")]),
+    )
+    write_pdf(tokens, output_path)
+    assert output_path.read_bytes().startswith(b"%PDF")
+
+
+def test_write_pdf_to_stream():
+    stream = io.BytesIO()
+    write_pdf([Paragraph(content=[InlineText(content="Hello")])], stream)
+    assert stream.getvalue().startswith(b"%PDF")
+
+
+def test_write_pdf_from_iter_tokens(tmp_path):
+    input_path = tmp_path / "in.md"
+    output_path = tmp_path / "out.pdf"
+    input_path.write_text("# Hello\n\nWorld *and* **more**\n", encoding="utf-8")
+    with input_path.open(encoding="utf-8") as input_file:
+        write_pdf(iter_tokens(input_file), output_path)
+    assert output_path.read_bytes().startswith(b"%PDF")
+
+
+@pytest.mark.parametrize(
+    "styles, expected",
+    [
+        (frozenset(), ("Helvetica", "")),
+        (BOLD, ("Helvetica", "B")),
+        (BOLD_ITALIC, ("Helvetica", "BI")),
+        (BOLD_CODE, ("Courier", "B")),
+    ],
+)
+def test_resolve_font(styles, expected):
+    assert _resolve_font(styles, "", "Helvetica", "Courier", "B") == expected
+
+
+def test_resolve_font_merges_base_style():
+    assert _resolve_font(BOLD_ITALIC, "B", "Times", "Courier", "") == ("Times", "BI")
+
+
+def test_render_skips_unchanged_set_font(monkeypatch):
+    calls = []
+    original = FPDF.set_font
+
+    def set_font(self, *args, **kwargs):
+        calls.append(args)
+        original(self, *args, **kwargs)
+
+    monkeypatch.setattr(FPDF, "set_font", set_font)
+    tokens = [
+        Paragraph(content=[InlineText("a"), InlineText("b"), InlineText("c", BOLD)]),
+        Paragraph(content=[InlineText("d", BOLD), InlineText("e")]),
+    ]
+    render_pdf(tokens)
+    # Plain, bold, plain again
+    assert len(calls) == 3
+
+
+def test_render_writes_coalesced_runs(monkeypatch):
+    texts = []
+    original = FPDF.write
+
+    def write(self, h, text, *args, **kwargs):
+        texts.append(text)
+        return original(self, h, text, *args, **kwargs)
+
+    monkeypatch.setattr(FPDF, "write", write)
+    content = [InlineText("a"), InlineText("", BOLD), InlineText("b"), InlineText("")]
+    render_pdf([Paragraph(content=content)])
+    assert texts == ["a", "", "b"]
+
+
+@pytest.mark.parametrize("style", STYLES.values(), ids=STYLES)
+def test_coalescing_keeps_line_layout(style):
+    # Empty bold in the middle of a word that wraps, and empty code between
+    # plain runs
+    text = "word " * 14 + "abcdefgh****ijklmnop tail\n\n# a****b ``c\n\nx `` y"
+    tokens = tokenize(text)
+    uncoalesced = [
+        (
+            token.level if isinstance(token, Header) else None,
+            [(inline.content, inline.styles) for inline in token.content],
+        )
+        for token in tokens
+    ]
+    coalesced = _build_pdf(tokens, style)
+    expected = _build_pdf_from_blocks(uncoalesced, style)
+    assert [page.contents for page in coalesced.pages.values()] == [
+        page.contents for page in expected.pages.values()
+    ]
+
+
+def test_compile_style_precomputes_blocks():
+    plan = compile_style(GENERIC)
+    assert plan.margins == (25.0, 20.0, 25.0, 20.0)
+    assert sorted(plan.headers) == [1, 2, 3, 4, 5, 6]
+
+    paragraph = plan.block(None)
+    line_height = GENERIC.base_font_size * GENERIC.paragraph_line_height_factor
+    assert paragraph.line_height == line_height
+    assert paragraph.advance == line_height + GENERIC.paragraph_margin_after
+    assert paragraph.fonts[BOLD_ITALIC] == (
+        "Helvetica",
+        "BI",
+        mm_to_pt(GENERIC.base_font_size),
+    )
+
+    header = plan.block(2)
+    size_pt = mm_to_pt(GENERIC.header_font_sizes[2])
+    assert header.fonts[frozenset()] == ("Helvetica", "B", size_pt)
+    assert header.fonts[ITALIC_CODE] == ("Courier", "B", size_pt)
+    # Every combination of inline styles has a font
+    assert len(header.fonts) == 8
+    assert plan.font_files == {}
+
+
+def test_compile_style_font_files_fall_back_to_regular(tmp_path):
+    regular, italic = tmp_path / "regular.ttf", tmp_path / "italic.ttf"
+    style = dataclasses.replace(
+        GENERIC,
+        font_family="Body",
+        font_files=(FontFile("Body", regular), FontFile("body", italic, "I")),
+    )
+    assert compile_style(style).font_files == {
+        ("Body", ""): regular,
+        ("Body", "B"): regular,
+        ("Body", "I"): italic,
+        ("Body", "BI"): regular,
+    }
+
+
+def test_compile_style_header_size_falls_back_to_base():
+    style = dataclasses.replace(GENERIC, header_font_sizes={1: 10.0})
+    plan = compile_style(style)
+    assert plan.block(1).fonts[frozenset()][2] == mm_to_pt(10.0)
+    assert plan.block(6).fonts[frozenset()][2] == mm_to_pt(GENERIC.base_font_size)
+
+
+def test_render_header_above_level_6():
+    assert_valid_pdf_bytes(render_pdf([Header(level=7, content=[InlineText("x")])]))
+
+    style = dataclasses.replace(GENERIC, header_font_sizes={8: 10.0})
+    plan = compile_style(style)
+    assert plan.block(8).fonts[frozenset()] == ("Helvetica", "B", mm_to_pt(10.0))
+    assert plan.block(9) is plan.other_header
+    assert plan.block(9).fonts[frozenset()][2] == mm_to_pt(GENERIC.base_font_size)
+
+
+@pytest.mark.parametrize("level", [0, -1])
+def test_render_header_below_level_1(level):
+    # Rendered as a header at base size, like other levels without a size
+    content = [InlineText("x")]
+    pdf = render_pdf([Header(level=level, content=content)])
+    assert without_dates(pdf) == without_dates(
+        render_pdf([Header(level=9, content=content)])
+    )
+    assert without_dates(pdf) != without_dates(render_pdf([Paragraph(content)]))
+
+    style = dataclasses.replace(GENERIC, header_font_sizes={level: 10.0})
+    assert render_plan(style).block(level).fonts[frozenset()][2] == mm_to_pt(10.0)
+
+
+class Underline(InlineStyles):
+    pass
+
+
+def test_render_unknown_inline_style_ignored():
+    underlined = [InlineText("a", frozenset({Underline(), Bold()})), InlineText("b")]
+    bold = [InlineText("a", BOLD), InlineText("b")]
+    assert without_dates(render_pdf([Paragraph(underlined)])) == without_dates(
+        render_pdf([Paragraph(bold)])
+    )
+    assert without_dates(render_pdf([Header(2, underlined)])) == without_dates(
+        render_pdf([Header(2, bold)])
+    )
+
+
+def test_render_plan_cached_per_style():
+    assert render_plan(GENERIC) is render_plan(GENERIC)
+    # Styles with equal fields share a plan
+    assert render_plan(dataclasses.replace(GENERIC)) is render_plan(GENERIC)
+    resized = dataclasses.replace(GENERIC, header_font_sizes={1: 10.0})
+    assert render_plan(resized) is not render_plan(GENERIC)
+
+
+def test_render_plan_cache_is_bounded():
+    first = dataclasses.replace(GENERIC, name="first")
+    plan = render_plan(first)
+    for index in range(PLAN_CACHE_SIZE):
+        render_plan(dataclasses.replace(GENERIC, name=f"style {index}"))
+    assert render_plan(first) is not plan
+    assert render_plan(first) == plan
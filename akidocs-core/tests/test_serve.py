@@ -0,0 +1,182 @@
+import io
+import socket
+import threading
+import time
+from contextlib import contextmanager
+
+import pytest
+
+from akidocs_core import serve
+from akidocs_core.renderer import render_pdf
+from akidocs_core.serve import (
+    ConversionServer,
+    ServeClient,
+    ServeError,
+    read_frame,
+    render_markdown,
+    request_pdf,
+    write_frame,
+)
+from akidocs_core.styles import STYLES
+from akidocs_core.tokenizer import tokenize
+from tests.helpers import without_dates
+
+
+@contextmanager
+def running(server):
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield server
+    finally:
+        server.shutdown()
+        server.server_close()
+        thread.join()
+
+
+@pytest.fixture(scope="module")
+def server(tmp_path_factory):
+    socket_path = tmp_path_factory.mktemp("serve") / "aki.sock"
+    with running(ConversionServer(socket_path, max_workers=1)) as server:
+        yield server
+
+
+def test_frame_round_trip():
+    stream = io.BytesIO()
+    write_frame(stream, b"hello")
+    write_frame(stream, b"")
+    stream.seek(0)
+    assert read_frame(stream) == b"hello"
+    assert read_frame(stream) == b""
+    with pytest.raises(EOFError):
+        read_frame(stream)
+
+
+def test_read_frame_rejects_truncated_and_oversized():
+    with pytest.raises(ServeError):
+        read_frame(io.BytesIO(b"\x00\x00"))
+    with pytest.raises(ServeError):
+        read_frame(io.BytesIO(b"\x00\x00\x00\x05abc"))
+    with pytest.raises(ServeError, match="exceeds limit"):
+        read_frame(io.BytesIO(b"\x00\x00\x00\x05hello"), max_bytes=4)
+
+
+def test_write_frame_rejects_oversized():
+    stream = io.BytesIO()
+    with pytest.raises(ServeError, match="exceeds limit"):
+        write_frame(stream, b"hello", max_bytes=4)
+    assert stream.getvalue() == b""
+
+
+def test_oversized_pdf_gets_error(server, monkeypatch):
+    monkeypatch.setattr(serve, "MAX_FRAME_BYTES", 500)
+    with ServeClient(server.socket_path) as client:
+        with pytest.raises(ServeError, match=r"PDF of \d+ bytes exceeds limit of 500"):
+            client.convert("# Title")
+        monkeypatch.undo()
+        assert client.convert("# Title").startswith(b"%PDF")
+
+
+def test_oversized_request_refused_before_sending(server, monkeypatch):
+    monkeypatch.setattr(serve, "MAX_FRAME_BYTES", 500)
+    with ServeClient(server.socket_path) as client:
+        with pytest.raises(ServeError, match="exceeds limit of 500"):
+            client.convert("x" * 1000)
+        monkeypatch.undo()
+        assert client.convert("# Title").startswith(b"%PDF")
+
+
+def test_request_pdf_matches_local_render(server):
+    text = "# Title\n\nSome *styled* **text**"
+    pdf = request_pdf(text, "times", server.socket_path)
+    local = render_pdf(tokenize(text), STYLES["times"])
+    assert pdf.startswith(b"%PDF")
+    assert without_dates(pdf) == without_dates(local)
+    assert without_dates(render_markdown(text, "times")) == without_dates(local)
+
+
+def test_client_reuses_connection(server):
+    with ServeClient(server.socket_path) as client:
+        first = client.convert("# One")
+        second = client.convert("# Two", "regard")
+    assert first.startswith(b"%PDF")
+    assert second.startswith(b"%PDF")
+
+
+def test_unknown_style_keeps_connection_open(server):
+    with ServeClient(server.socket_path) as client:
+        with pytest.raises(ServeError, match="unknown style: nope"):
+            client.convert("# Title", "nope")
+        assert client.convert("# Title").startswith(b"%PDF")
+
+
+def test_malformed_request_gets_error(server):
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as raw:
+        raw.connect(str(server.socket_path))
+        stream = raw.makefile("rwb")
+        write_frame(stream, b"\xff")
+        write_frame(stream, b"text")
+        stream.flush()
+        assert read_frame(stream) == b"error"
+        assert b"utf-8" in read_frame(stream)
+
+
+def test_second_server_on_live_socket_is_refused(server):
+    with pytest.raises(ServeError, match="already listening"):
+        ConversionServer(server.socket_path)
+
+
+def test_stale_socket_file_is_replaced(tmp_path):
+    socket_path = tmp_path / "stale.sock"
+    stale = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    stale.bind(str(socket_path))
+    stale.close()
+
+    with ConversionServer(socket_path) as server:
+        assert server.socket_path.exists()
+    assert not socket_path.exists()
+
+
+def test_pool_replaced_after_worker_dies(tmp_path):
+    with running(ConversionServer(tmp_path / "aki.sock")) as server:
+        with ServeClient(server.socket_path) as client:
+            assert client.convert("# One").startswith(b"%PDF")
+            broken = server.executor
+            for process in list(broken._processes.values()):
+                process.kill()
+            # Same connection, and every request after, still converts
+            assert client.convert("# Two").startswith(b"%PDF")
+            assert client.convert("# Three").startswith(b"%PDF")
+        assert server.executor is not broken
+
+
+def test_idle_connection_is_closed(tmp_path):
+    server = ConversionServer(tmp_path / "aki.sock", connection_timeout=0.2)
+    with running(server):
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as raw:
+            raw.connect(str(server.socket_path))
+            raw.settimeout(5)
+            # Half a length prefix, then nothing
+            raw.sendall(b"\x00\x00")
+            assert raw.recv(1) == b""
+
+
+def test_connections_beyond_limit_are_refused(tmp_path):
+    server = ConversionServer(tmp_path / "aki.sock", max_connections=1)
+    with running(server):
+        with ServeClient(server.socket_path) as first:
+            assert first.convert("# One").startswith(b"%PDF")
+            with ServeClient(server.socket_path) as second:
+                with pytest.raises(ServeError, match="server busy, 1 connections"):
+                    second.convert("# Two")
+        # Slot is free once the first connection's thread is done
+        deadline = time.monotonic() + 5
+        while True:
+            try:
+                with ServeClient(server.socket_path) as client:
+                    assert client.convert("# Three").startswith(b"%PDF")
+                break
+            except ServeError:
+                if time.monotonic() > deadline:
+                    raise
+                time.sleep(0.05)
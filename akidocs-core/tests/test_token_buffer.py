@@ -0,0 +1,91 @@
+import io
+
+import pytest
+
+from akidocs_core.inline_tokenizer import coalesce_inline
+from akidocs_core.renderer import render_pdf
+from akidocs_core.styles import REGARD
+from akidocs_core.token_buffer import TokenBuffer, mask_styles, style_mask
+from akidocs_core.tokenizer import iter_tokens, tokenize, tokenize_to_buffer
+from akidocs_core.tokens import BOLD, CODE, ITALIC, Header, InlineText
+from tests.helpers import without_dates
+
+TEXT = (
+    "# Title with *style*\n\n"
+    "Plain **bold *both*** and `code` then ****.\n"
+    "Second line  \nafter break\n\n"
+    "## Sub\n\n"
+    "**a * b ** c* `d` ***e"
+)
+
+
+def test_style_mask_round_trip():
+    for styles in (frozenset(), frozenset({BOLD}), frozenset({ITALIC, CODE})):
+        assert mask_styles(style_mask(styles)) == styles
+    assert style_mask(frozenset({BOLD, ITALIC, CODE})) == 7
+
+
+def test_view_yields_equal_tokens():
+    tokens = tokenize(TEXT)
+    buffer = tokenize_to_buffer(TEXT)
+    assert len(buffer) == len(tokens)
+    assert list(buffer) == tokens
+    assert buffer[1] == tokens[1]
+    assert buffer[-1] == tokens[-1]
+    assert buffer[1:3] == tokens[1:3]
+
+
+def test_index_out_of_range():
+    with pytest.raises(IndexError):
+        tokenize_to_buffer("a")[1]
+
+
+@pytest.mark.parametrize("level", [0, -1, 256])
+def test_header_level_out_of_range_rejected(level):
+    buffer = TokenBuffer()
+    with pytest.raises(ValueError, match="header level must be 1 to 255"):
+        buffer.append(Header(level=level, content=[InlineText("x")]))
+    assert len(buffer) == 0
+
+
+def test_empty_text():
+    buffer = tokenize_to_buffer("")
+    assert len(buffer) == 0
+    assert list(buffer) == []
+
+
+def test_filled_from_iter_tokens():
+    assert list(TokenBuffer(iter_tokens(io.StringIO(TEXT)))) == tokenize(TEXT)
+
+
+def test_arrays_share_one_text():
+    buffer = tokenize_to_buffer("# A *b*\n\nc **d**")
+    assert buffer.text == "A bc d"
+    assert list(buffer.levels) == [1, 0]
+    assert list(buffer.run_starts) == [0, 2, 4]
+    assert list(buffer.offsets) == [0, 2, 3, 5, 6]
+    assert list(buffer.masks) == [0, 2, 0, 1]
+
+
+def test_append_after_reading_text():
+    buffer = tokenize_to_buffer("a")
+    assert buffer.text == "a"
+    buffer.extend(tokenize("*b*"))
+    assert buffer.text == "ab"
+    assert buffer[1].content == [InlineText("b", frozenset({ITALIC}))]
+
+
+def test_coalesced_runs_match_coalesce_inline():
+    tokens = tokenize(TEXT)
+    buffer = tokenize_to_buffer(TEXT)
+    for block, token in enumerate(tokens):
+        expected = [(run.content, run.styles) for run in coalesce_inline(token.content)]
+        assert list(buffer.coalesced_runs(block)) == expected
+
+
+def test_render_buffer_matches_tokens():
+    tokens = tokenize(TEXT * 20)
+    buffer = tokenize_to_buffer(TEXT * 20)
+    assert without_dates(render_pdf(buffer, REGARD)) == without_dates(
+        render_pdf(tokens, REGARD)
+    )
@@ -1,6 +1,10 @@
+import io
+
 import pytest
 
-from akidocs_core.tokenizer import tokenize
+from akidocs_core import tokenizer
+from akidocs_core.inline_cache import InlineCache, using
+from akidocs_core.tokenizer import _chunk_blocks, iter_tokens, tokenize
 from akidocs_core.tokens import Code, Header, InlineText, Italic, Paragraph
 
 ITALIC = frozenset({Italic()})
@@ -262,3 +266,91 @@ def test_paragraph_with_code_span():
         InlineText(content="print()", styles=CODE),
         InlineText(content=" to output"),
     ]
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        "",
+        "  \n\n  ",
+        "# Title\nParagraph text",
+        "Line one  \nLine two  \nLine three",
+        "First\r\n\r\nSecond *italic*\r\n## Header ##\r\n",
+        "text\n# Header\n\n\n####### Seven hashes\nand `code`",
+        "Lone\rreturn\n",
+    ],
+)
+def test_iter_tokens_matches_tokenize(text):
+    fileobj = io.StringIO(text, newline="")
+    assert list(iter_tokens(fileobj)) == tokenize(text)
+
+
+def test_iter_tokens_crlf_line_endings():
+    fileobj = io.StringIO("First paragraph\r\n\r\nSecond paragraph", newline="")
+    result = list(iter_tokens(fileobj))
+    assert len(result) == 2
+    assert result[0].content == [InlineText(content="First paragraph")]
+    assert result[1].content == [InlineText(content="Second paragraph")]
+
+
+def test_iter_tokens_yields_before_reading_rest():
+    def lines():
+        yield "# Title\n"
+        yield "Paragraph\n"
+        yield "\n"
+        raise AssertionError("read past first closed block")
+
+    tokens = iter_tokens(lines())
+    assert next(tokens) == Header(level=1, content=[InlineText(content="Title")])
+    assert next(tokens) == Paragraph(content=[InlineText(content="Paragraph")])
+
+
+def test_iter_tokens_from_file(tmp_path):
+    path = tmp_path / "test.md"
+    path.write_bytes(b"# Hello\r\n\r\nWorld\r\n")
+    with path.open(encoding="utf-8", newline="") as fileobj:
+        result = list(iter_tokens(fileobj))
+    assert result == tokenize("# Hello\r\n\r\nWorld\r\n")
+
+
+def test_chunk_blocks_keeps_order_and_size():
+    blocks = [(0, "a" * 3), (1, "b" * 3), (0, "c" * 3), (0, "d")]
+    assert list(_chunk_blocks(blocks, 5)) == [blocks[:2], blocks[2:]]
+    assert list(_chunk_blocks([], 5)) == []
+
+
+def test_parallel_tokenize_matches_serial(monkeypatch):
+    text = "# Title *a*\n\n" + "".join(
+        f"Paragraph {i} with **bold** and `code`\n\n## Header {i}\n" for i in range(200)
+    )
+    monkeypatch.setattr(tokenizer, "PARALLEL_MIN_CHARS", 0)
+    monkeypatch.setattr(tokenizer, "PARALLEL_CHUNK_CHARS", 500)
+    assert tokenize(text, jobs=2) == tokenize(text)
+
+
+def test_parallel_tokenize_uses_inline_cache(monkeypatch):
+    text = "".join(f"Same **text**\n\n## Header {i % 3}\n" for i in range(200))
+    monkeypatch.setattr(tokenizer, "PARALLEL_MIN_CHARS", 0)
+    monkeypatch.setattr(tokenizer, "PARALLEL_CHUNK_CHARS", 500)
+    serial, parallel = InlineCache(), InlineCache()
+    with using(serial):
+        expected = tokenize(text)
+    with using(parallel):
+        assert tokenize(text, jobs=2) == expected
+    # Workers send their entries and stats back
+    assert len(parallel) == len(serial) == 4
+    assert parallel.stats.hits + parallel.stats.misses == 400
+    # and start from the cache, so a second run only hits
+    misses = parallel.stats.misses
+    with using(parallel):
+        tokenize(text, jobs=2)
+    assert parallel.stats.misses == misses
+    assert parallel.stats.hits + parallel.stats.misses == 800
+
+
+def test_parallel_tokenize_stays_serial_below_threshold(monkeypatch):
+    def no_pool(*args, **kwargs):
+        raise AssertionError("started worker processes")
+
+    monkeypatch.setattr(tokenizer, "ProcessPoolExecutor", no_pool)
+    assert tokenize("# Title\n\nText", jobs=4) == tokenize("# Title\n\nText")
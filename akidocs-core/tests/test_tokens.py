@@ -0,0 +1,76 @@
+import dataclasses
+import pickle
+
+import pytest
+
+from akidocs_core.inline_tokenizer import tokenize_inline
+from akidocs_core.tokens import (
+    BOLD,
+    ITALIC,
+    Bold,
+    Code,
+    Header,
+    InlineText,
+    Italic,
+    Paragraph,
+    canonical_styles,
+    combine_styles,
+)
+
+
+def test_styles_are_singletons():
+    assert Bold() is Bold() is BOLD
+    assert Italic() is ITALIC
+    assert Bold() is not Italic()
+    assert pickle.loads(pickle.dumps(Code())) is Code()
+
+
+def test_styles_equality_and_hash():
+    assert Bold() == Bold()
+    assert Bold() != Italic()
+    assert hash(frozenset({Bold()})) == hash(frozenset({BOLD}))
+
+
+def test_canonical_styles_returns_shared_set():
+    first = canonical_styles(frozenset({Bold(), Italic()}))
+    second = canonical_styles(frozenset({Italic(), Bold()}))
+    assert first is second
+
+
+def test_combine_styles_is_canonical():
+    combined = combine_styles(frozenset({BOLD}), frozenset({ITALIC}))
+    assert combined == frozenset({BOLD, ITALIC})
+    assert combined is canonical_styles(frozenset({ITALIC, BOLD}))
+
+
+def test_tokenizer_shares_style_sets():
+    tokens = tokenize_inline("**a** and **b** and ***c*** `d` *e **f***")
+    by_value = {}
+    for token in tokens:
+        assert by_value.setdefault(token.styles, token.styles) is token.styles
+
+
+def test_tokens_have_no_instance_dict():
+    for token in (
+        InlineText("a"),
+        Header(1, [InlineText("a")]),
+        Paragraph([InlineText("a")]),
+    ):
+        assert not hasattr(token, "__dict__")
+
+
+def test_tokens_are_frozen():
+    inline = InlineText("a", frozenset({BOLD}))
+    for token, field in (
+        (inline, "content"),
+        (Header(1, [inline]), "level"),
+        (Paragraph([inline]), "content"),
+    ):
+        with pytest.raises(dataclasses.FrozenInstanceError):
+            setattr(token, field, None)
+    assert hash(inline) == hash(InlineText("a", frozenset({Bold()})))
+
+
+def test_inline_text_equality_unchanged():
+    assert InlineText("a") == InlineText(content="a", styles=frozenset())
+    assert InlineText("a", frozenset({Bold()})) != InlineText("a")
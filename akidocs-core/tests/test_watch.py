@@ -0,0 +1,100 @@
+import threading
+import time
+
+import pytest
+
+from akidocs_core.styles import GENERIC
+from akidocs_core.tokenizer import tokenize
+from akidocs_core.watch import IncrementalTokenizer, wait_for_change, watch
+
+DOCUMENT = "# Title\nIntro *text*\n\nSecond  \nparagraph\n\n\n## Header ##\n\n**Last**"
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        "",
+        "\n\n",
+        DOCUMENT,
+        DOCUMENT.replace("\n", "\r\n"),
+        "Line one\n   \nLine two\n# Header\ntext",
+    ],
+)
+def test_incremental_matches_tokenize(text):
+    assert IncrementalTokenizer().tokenize(text) == tokenize(text)
+
+
+def test_incremental_reuses_unchanged_chunks():
+    tokenizer = IncrementalTokenizer()
+    first = tokenizer.tokenize(DOCUMENT)
+    # Counts are of blocks, the first chunk holds a header and a paragraph
+    assert (tokenizer.tokenized, tokenizer.reused) == (5, 0)
+
+    edited = DOCUMENT.replace("Second", "Edited")
+    second = tokenizer.tokenize(edited)
+
+    assert second == tokenize(edited)
+    assert tokenizer.tokenized == 1
+    assert tokenizer.reused == 4
+    # Unchanged blocks are the very same token objects
+    assert second[0] is first[0]
+    assert second[-1] is first[-1]
+
+    tokenizer.tokenize(edited.replace("Intro", "Changed"))
+    assert (tokenizer.tokenized, tokenizer.reused) == (2, 3)
+
+
+def test_wait_for_change_debounces(tmp_path):
+    path = tmp_path / "in.md"
+    path.write_text("one")
+    state = (path.stat().st_mtime_ns, path.stat().st_size)
+    writes = iter(["two", "three!", "four!!!"])
+    sleeps = []
+
+    def fake_sleep(seconds):
+        sleeps.append(seconds)
+        # Burst of three saves, one per poll, then quiet
+        content = next(writes, None)
+        if content is not None:
+            path.write_text(content)
+
+    new_state = wait_for_change(
+        path, state, interval=0.1, debounce=0.3, sleep=fake_sleep
+    )
+
+    assert new_state == (path.stat().st_mtime_ns, path.stat().st_size)
+    assert path.read_text() == "four!!!"
+    # One poll per save, then three quiet polls of debounce
+    assert len(sleeps) == 6
+
+
+def test_watch_rebuilds_on_change(tmp_path, capsys):
+    input_path = tmp_path / "in.md"
+    output_path = tmp_path / "out.pdf"
+    input_path.write_text("# Hello")
+
+    def edit():
+        while not output_path.exists():
+            time.sleep(0.01)
+        output_path.unlink()
+        input_path.write_text("# Hello\n\nWorld")
+
+    editor = threading.Thread(target=edit)
+    editor.start()
+    watch(input_path, output_path, GENERIC, interval=0.01, debounce=0.02, max_builds=2)
+    editor.join()
+
+    assert output_path.exists()
+    out = capsys.readouterr().out
+    assert "(1 of 1 blocks re-tokenized)" in out
+    assert "(1 of 2 blocks re-tokenized)" in out
+
+
+def test_watch_reports_build_error_on_stderr(tmp_path, capsys):
+    input_path = tmp_path / "in.md"
+    input_path.write_bytes(b"# \xff")
+    watch(input_path, tmp_path / "out.pdf", GENERIC, max_builds=1)
+
+    captured = capsys.readouterr()
+    assert captured.err.startswith(f"Error: {input_path}: ")
+    assert "Error" not in captured.out